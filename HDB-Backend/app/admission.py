@@ -0,0 +1,173 @@
+"""
+HDB Admission Control
+Bounds how much recommendation work is accepted, and sheds the rest early.
+
+A job either starts (in_flight below the concurrency limit), waits in a
+bounded queue, or is rejected at once with an estimated Retry-After. The
+limit adapts with AIMD on observed job latency: it grows by about one
+per limit's worth of completions while jobs finish within the target, and
+halves (at most once per target interval) when they don't. Overload then
+turns into fast 503s instead of a growing executor queue and client-side
+timeouts.
+
+Runs on the event loop only, so no locking is needed.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Job was not admitted; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """AIMD concurrency limit with a bounded FIFO wait queue."""
+
+    BACKOFF = 0.5            # Multiplicative decrease factor
+    MAX_RETRY_AFTER = 120    # Seconds
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, max_queue: int = 16,
+                 target_latency: float = 10.0, queue_timeout: float = 30.0):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.max_queue = max(0, max_queue)
+        self.target_latency = target_latency
+        self.queue_timeout = queue_timeout
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+        self._latencies = deque(maxlen=256)
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Rough time until a slot frees up for a new arrival."""
+        avg = sum(self._latencies) / len(self._latencies) if self._latencies else self.target_latency
+        wait = (self.queued + 1) * avg / self.current_limit
+        return max(1, min(self.MAX_RETRY_AFTER, math.ceil(wait)))
+
+    # ============================================
+    # ACQUIRE / RELEASE
+    # ============================================
+
+    async def acquire(self):
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} queue is full ({self.queued} waiting)", self.retry_after())
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        try:
+            # asyncio.wait doesn't cancel the waiter on timeout, so a slot
+            # handed over at the last moment is never lost
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self.timed_out += 1
+            raise Overloaded(f"{self.name} queue wait exceeded {self.queue_timeout:.0f}s", self.retry_after())
+        self.admitted += 1
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # A slot was handed to us but we're leaving: pass it on
+            self.in_flight -= 1
+            self._wake()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, latency: float):
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        self._adjust(latency)
+        self._wake()
+
+    def _wake(self):
+        """Hand free slots to waiters in arrival order."""
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _adjust(self, latency: float):
+        if latency > self.target_latency:
+            now = time.monotonic()
+            # One decrease per target interval, so a burst of slow jobs
+            # that were all admitted together only counts once
+            if now - self._last_decrease >= self.target_latency and self.limit > self.min_limit:
+                self.limit = max(float(self.min_limit), self.limit * self.BACKOFF)
+                self._last_decrease = now
+                self.decreases += 1
+                print(f"Admission [{self.name}]: {latency:.1f}s > {self.target_latency:.1f}s target, "
+                      f"limit -> {self.current_limit}")
+        elif self.limit < self.max_limit:
+            before = self.current_limit
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            if self.current_limit > before:
+                self.increases += 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """async with controller.slot(): run one admitted job."""
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        avg = sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+        return {
+            'limit': self.current_limit,
+            'limit_raw': round(self.limit, 2),
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'queued_total': self.queued_total,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'target_latency': self.target_latency,
+            'avg_latency': round(avg, 4),
+            'retry_after': self.retry_after(),
+        }
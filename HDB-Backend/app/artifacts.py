@@ -0,0 +1,524 @@
+"""
+HDB Artifact Store
+Loads the model and data files as one immutable, versioned bundle.
+
+The API never reads artifacts from bare module globals. Each request takes
+the current ArtifactState once and uses it until it finishes, so a reload
+that swaps in a new bundle never changes data under an in-flight request.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from app.locations import LocationIndex
+from app.recommendation import DestinationIndex
+
+# ============================================
+# PATH CONFIGURATION
+# ============================================
+
+BASE_DIR = Path(__file__).parent.parent  # hdb-backend/
+
+# Model files (HYBRID)
+MODEL_PATH = BASE_DIR / "app" / "models" / "xgb_hybrid_base.joblib"
+TREND_PATH = BASE_DIR / "app" / "models" / "trend_multipliers.json"
+FEATURES_PATH = BASE_DIR / "app" / "models" / "hybrid_model_features.json"
+
+# Data files
+MAPPINGS_PATH = BASE_DIR / "app" / "data" / "mappings"
+AMENITIES_PATH = BASE_DIR / "app" / "data" / "amenities"
+DATA_PATH = BASE_DIR / "app" / "data"  # For HDB dataset
+HDB_DATASET_PATH = DATA_PATH / "Complete_HDB_resale_dataset_2015_to_2025.csv"
+
+# Files whose content defines the model version (small, hashed in full)
+MODEL_ARTIFACTS = [MODEL_PATH, TREND_PATH, FEATURES_PATH]
+
+# Model distance features and the amenity set each one is measured to
+AMENITY_DISTANCE_COLUMNS = {
+    'distance_to_nearest_primary_school_km': 'primary_schools',
+    'distance_to_nearest_high_value_school_km': 'high_value_schools',
+    'distance_to_nearest_mrt_km': 'mrt_stations',
+    'distance_to_nearest_hawker_km': 'hawker_centers',
+    'distance_to_nearest_mall_km': 'malls',
+    'distance_to_cbd_km': 'cbd',
+}
+
+EARTH_RADIUS_KM = 6371
+
+
+# ============================================
+# ARTIFACT STATE
+# ============================================
+
+@dataclass(frozen=True)
+class ArtifactState:
+    """Immutable bundle of everything a request needs to predict and recommend."""
+    version: str
+    loaded_at: str
+    model: Any
+    trend_multipliers: Dict[str, float]
+    model_features: Optional[Dict]
+    mappings: Dict[str, pd.DataFrame]
+    amenity_data: Dict[str, np.ndarray]
+    amenity_trees: Dict[str, Optional[BallTree]]
+    location_data: Dict
+    hdb_data: Optional[pd.DataFrame]
+    destination_index: Any = None  # DestinationIndex over location_data
+    location_index: Any = None     # LocationIndex over location_data, for /locations/search
+
+
+def _watched_files() -> List[Path]:
+    """All files that make up an artifact set."""
+    files = list(MODEL_ARTIFACTS)
+    files += sorted(MAPPINGS_PATH.glob('*.csv'))
+    files += sorted(AMENITIES_PATH.glob('*.csv'))
+    files.append(HDB_DATASET_PATH)
+    return files
+
+
+def artifact_fingerprint() -> str:
+    """Cheap change detector based on file sizes and modification times."""
+    parts = []
+    for path in _watched_files():
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+        else:
+            parts.append(f"{path.name}:missing")
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+# path -> ((size, mtime_ns), sha256 hex) so unchanged files are not re-read
+_content_digests: Dict[Path, tuple] = {}
+
+
+def _content_digest(path: Path) -> str:
+    """SHA-256 of a file's content, re-read only when its size or mtime changes."""
+    stat = path.stat()
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _content_digests.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    _content_digests[path] = (key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def compute_artifact_version() -> str:
+    """
+    Version string for the artifact set on disk.
+
+    Every file is hashed by content, so the version is stable across
+    restarts and image rebuilds and changes whenever any data changes, even
+    an edit that keeps the file size. Persistent caches key on this value.
+    Digests are memoised by size and mtime, so a reload only re-reads the
+    files that were touched.
+    """
+    digest = hashlib.sha256()
+    for path in _watched_files():
+        if not path.exists():
+            digest.update(f"{path.name}:missing".encode())
+        else:
+            digest.update(f"{path.name}:{_content_digest(path)}".encode())
+    return digest.hexdigest()[:12]
+
+
+# ============================================
+# LOADERS
+# ============================================
+
+def load_mappings():
+    """Load all mapping CSVs"""
+    print(f"Loading mappings from: {MAPPINGS_PATH}")
+    return {
+        'town': pd.read_csv(MAPPINGS_PATH / 'town_code_map.csv'),
+        'flat_type': pd.read_csv(MAPPINGS_PATH / 'flat_type_int_map.csv'),
+        'flat_model': pd.read_csv(MAPPINGS_PATH / 'flat_model_code_map.csv'),
+        'region': pd.read_csv(MAPPINGS_PATH / 'region_code_map.csv'),
+    }
+
+
+def load_amenity_data():
+    """Load all amenity datasets"""
+    print(f"Loading amenities from: {AMENITIES_PATH}")
+
+    def load_coords(filename):
+        filepath = AMENITIES_PATH / filename
+        if filepath.exists():
+            df = pd.read_csv(filepath)
+            coords = df[['latitude', 'longitude']].values
+            coords.flags.writeable = False
+            return coords
+        else:
+            print(f"  |!| File not found: {filename}")
+            return np.array([])
+
+    return {
+        'primary_schools': load_coords('Primary_school_dataset.csv'),
+        'high_value_schools': load_coords('Ballot_school.csv'),
+        'mrt_stations': load_coords('MRT_datasets.csv'),
+        'hawker_centers': load_coords('Hawker_Centers_datasets.csv'),
+        'malls': load_coords('Malls_datasets.csv'),
+        'cbd': load_coords('singapore_business_district.csv'),
+    }
+
+
+def load_location_data():
+    """Load schools and POIs for dropdown options"""
+    print(f"Loading location data from: {AMENITIES_PATH}")
+
+    data = {
+        'schools': [],
+        'pois': {},
+        'poi_categories': []
+    }
+
+    # Load primary schools
+    schools_path = AMENITIES_PATH / 'Primary_school_dataset.csv'
+    if schools_path.exists():
+        df = pd.read_csv(schools_path)
+        data['schools'] = df.to_dict('records')
+        print(f"  [OK] Loaded {len(data['schools'])} schools")
+
+    # Load POIs
+    poi_path = AMENITIES_PATH / 'singapore_poi.csv'
+    if poi_path.exists():
+        df = pd.read_csv(poi_path)
+        # Clean up Windows line endings if any
+        df.columns = df.columns.str.strip()
+        for col in df.columns:
+            if df[col].dtype == 'object':
+                df[col] = df[col].str.strip()
+
+        # Group by category
+        categories = df['category'].unique().tolist()
+        data['poi_categories'] = sorted([c for c in categories if c and c != 'category'])
+
+        for cat in data['poi_categories']:
+            cat_df = df[df['category'] == cat][['name', 'lat', 'lon']].drop_duplicates(subset=['name'])
+            data['pois'][cat] = cat_df.to_dict('records')
+
+        total_pois = sum(len(v) for v in data['pois'].values())
+        print(f"  [OK] Loaded {total_pois} POIs in {len(data['poi_categories'])} categories")
+
+    return data
+
+
+def parse_lease(lease_str):
+    """Parse "61 years 04 months" style remaining lease to fractional years."""
+    if pd.isna(lease_str):
+        return None
+    if isinstance(lease_str, (int, float)):
+        return float(lease_str)
+    match = re.match(r'(\d+)\s*years?(?:\s*(\d+)\s*months?)?', str(lease_str))
+    if match:
+        years = int(match.group(1))
+        months = int(match.group(2)) if match.group(2) else 0
+        return years + months / 12
+    return None
+
+
+def load_hdb_dataset(path: Path = HDB_DATASET_PATH) -> Optional[pd.DataFrame]:
+    """Load the HDB transaction dataset used for recommendations."""
+    if not path.exists():
+        print(f"|!| HDB dataset not found at {path}")
+        print(f"    Place your Complete_HDB_resale_dataset.csv in {DATA_PATH}")
+        return None
+
+    hdb_data = pd.read_csv(path)
+    # Parse remaining lease
+    if 'remaining_lease' in hdb_data.columns and hdb_data['remaining_lease'].dtype == 'object':
+        hdb_data['remaining_lease_years'] = hdb_data['remaining_lease'].apply(parse_lease)
+    else:
+        hdb_data['remaining_lease_years'] = hdb_data.get('remaining_lease', 99)
+
+    hdb_data['latitude'] = pd.to_numeric(hdb_data['latitude'], errors='coerce')
+    hdb_data['longitude'] = pd.to_numeric(hdb_data['longitude'], errors='coerce')
+    hdb_data['town'] = hdb_data['town'].str.upper().str.strip()
+    hdb_data['flat_type'] = hdb_data['flat_type'].str.upper().str.strip()
+    print(f"[OK] HDB dataset loaded: {len(hdb_data)} transactions")
+    return hdb_data
+
+
+def build_amenity_trees(amenity_data: Dict[str, np.ndarray]) -> Dict[str, Optional[BallTree]]:
+    """One haversine BallTree per amenity set, built once per artifact load."""
+    return {
+        name: BallTree(np.radians(coords), metric='haversine') if len(coords) else None
+        for name, coords in amenity_data.items()
+    }
+
+
+def nearest_distances(tree: Optional[BallTree], lats, lons) -> np.ndarray:
+    """Distance in km from each point to its nearest amenity (0 if the set is empty)."""
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    if tree is None or len(lats) == 0:
+        return np.zeros(len(lats))
+    distance, _ = tree.query(np.radians(np.column_stack([lats, lons])), k=1)
+    return distance[:, 0] * EARTH_RADIUS_KM
+
+
+def add_amenity_distances(hdb_data: pd.DataFrame, amenity_trees: Dict[str, Optional[BallTree]]):
+    """
+    Precompute the per-flat columns recommendations need, in place: the six
+    amenity distance features and the floor level parsed from storey_range.
+    Amenities and flats only change together on reload, so per-request
+    distance lookups become column reads.
+    """
+    start = time.time()
+    has_coords = hdb_data['latitude'].notna() & hdb_data['longitude'].notna()
+    lats = hdb_data.loc[has_coords, 'latitude'].to_numpy()
+    lons = hdb_data.loc[has_coords, 'longitude'].to_numpy()
+    for column, amenity in AMENITY_DISTANCE_COLUMNS.items():
+        values = np.full(len(hdb_data), np.nan)
+        values[has_coords.to_numpy()] = nearest_distances(amenity_trees.get(amenity), lats, lons)
+        hdb_data[column] = values
+
+    # "10 TO 12" -> 10, default mid-level when unparseable
+    floor_level = pd.to_numeric(hdb_data['storey_range'].astype(str).str.split(' TO ').str[0], errors='coerce')
+    hdb_data['floor_level'] = floor_level.fillna(5).astype(int)
+    print(f"[OK] Amenity distances precomputed for {int(has_coords.sum())} flats ({time.time() - start:.2f}s)")
+
+
+def load_artifact_state() -> ArtifactState:
+    """
+    Load a complete artifact set from disk.
+
+    Model, trend multipliers, mappings and amenities are required and any
+    failure propagates. Feature config, location data and the HDB dataset
+    are optional and degrade the same way the API always has.
+    """
+    version = compute_artifact_version()
+
+    # Load XGBoost model
+    try:
+        model = joblib.load(MODEL_PATH)
+        print(f"[OK] XGBoost model loaded: {MODEL_PATH}")
+    except Exception as e:
+        print(f"X Error loading model: {e}")
+        raise e
+
+    # Load trend multipliers (Prophet)
+    try:
+        with open(TREND_PATH) as f:
+            trend_multipliers = json.load(f)
+        print(f"[OK] Trend multipliers loaded: {len(trend_multipliers)} years")
+        print(f"  Years: {list(trend_multipliers.keys())}")
+    except Exception as e:
+        print(f"X Error loading trend multipliers: {e}")
+        raise e
+
+    # Load feature config (optional)
+    model_features = None
+    try:
+        if FEATURES_PATH.exists():
+            with open(FEATURES_PATH) as f:
+                model_features = json.load(f)
+            print(f"[OK] Feature config loaded")
+    except Exception as e:
+        print(f"|!| Feature config not loaded: {e}")
+
+    # Load mappings
+    try:
+        mappings = load_mappings()
+        print(f"[OK] Mappings loaded: {len(mappings['town'])} towns")
+    except Exception as e:
+        print(f"X Error loading mappings: {e}")
+        raise e
+
+    # Load amenity data
+    try:
+        amenity_data = load_amenity_data()
+        amenity_trees = build_amenity_trees(amenity_data)
+        print(f"[OK] Amenities loaded")
+    except Exception as e:
+        print(f"X Error loading amenities: {e}")
+        raise e
+
+    # Load location data for dropdowns
+    try:
+        location_data = load_location_data()
+        print(f"[OK] Location data loaded")
+    except Exception as e:
+        print(f"|!| Location data not loaded: {e}")
+        location_data = {'schools': [], 'pois': {}, 'poi_categories': []}
+
+    # Load HDB transaction data for recommendations
+    try:
+        hdb_data = load_hdb_dataset()
+        if hdb_data is not None:
+            add_amenity_distances(hdb_data, amenity_trees)
+    except Exception as e:
+        print(f"|!| HDB dataset not loaded: {e}")
+        hdb_data = None
+
+    return ArtifactState(
+        version=version,
+        loaded_at=datetime.now().isoformat(timespec='seconds'),
+        model=model,
+        trend_multipliers=trend_multipliers,
+        model_features=model_features,
+        mappings=mappings,
+        amenity_data=amenity_data,
+        amenity_trees=amenity_trees,
+        location_data=location_data,
+        hdb_data=hdb_data,
+        destination_index=DestinationIndex(location_data),
+        location_index=LocationIndex(location_data),
+    )
+
+
+# ============================================
+# ATOMIC SWAP + HOT RELOAD
+# ============================================
+
+class ArtifactManager:
+    """
+    Holds the current ArtifactState and replaces it atomically.
+
+    Readers call current() once per request and keep the returned object;
+    the swap is a single reference assignment, so readers never see a
+    half-loaded bundle and never need a lock.
+    """
+
+    def __init__(self, validate_fn: Callable[[ArtifactState], None] = None,
+                 prepare_fn: Callable[[ArtifactState], None] = None):
+        self._state: Optional[ArtifactState] = None
+        self._validate_fn = validate_fn
+        self._prepare_fn = prepare_fn
+        self._reload_lock = threading.Lock()
+        self._listeners: List[Callable[[ArtifactState, Optional[ArtifactState]], None]] = []
+        self._fingerprint: Optional[str] = None
+        self._failed_fingerprint: Optional[str] = None  # Files that last failed to load or validate
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watcher = threading.Event()
+        self.status = {
+            'reloading': False,
+            'reload_count': 0,
+            'last_reload': None,
+            'last_error': None,
+        }
+
+    def current(self) -> ArtifactState:
+        state = self._state
+        if state is None:
+            raise RuntimeError("Artifacts not loaded yet")
+        return state
+
+    @property
+    def loaded(self) -> bool:
+        return self._state is not None
+
+    def on_swap(self, listener: Callable[[ArtifactState, Optional[ArtifactState]], None]):
+        """Register a callback run after every swap as listener(new, old)."""
+        self._listeners.append(listener)
+
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Load a new artifact set, validate it and swap it in.
+
+        The old state keeps serving until validation passes. prepare_fn, if
+        given, configures the new state (e.g. model threads) before it is
+        validated, so nothing touches a state once it is live. If the loaded
+        version equals the current one the swap is skipped unless forced.
+        Concurrent reload calls are rejected rather than queued. A failed
+        reload records the files' fingerprint so the watcher waits for them
+        to change again instead of retrying every interval.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {'success': False, 'message': 'Reload already in progress'}
+
+        self.status['reloading'] = True
+        start = time.time()
+        fingerprint = None
+        try:
+            fingerprint = artifact_fingerprint()
+            new_state = load_artifact_state()
+            old_state = self._state
+
+            if old_state is not None and new_state.version == old_state.version and not force:
+                self._fingerprint = fingerprint
+                return {'success': True, 'swapped': False, 'version': old_state.version,
+                        'message': 'Artifacts unchanged'}
+
+            if self._prepare_fn:
+                self._prepare_fn(new_state)
+            if self._validate_fn:
+                self._validate_fn(new_state)
+
+            self._state = new_state
+            self._fingerprint = fingerprint
+            self._failed_fingerprint = None
+            self.status['reload_count'] += 1
+            self.status['last_reload'] = new_state.loaded_at
+            self.status['last_error'] = None
+
+            for listener in self._listeners:
+                try:
+                    listener(new_state, old_state)
+                except Exception as e:
+                    print(f"|!| Artifact swap listener failed: {e}")
+
+            print(f"[OK] Artifacts {new_state.version} active "
+                  f"(was {old_state.version if old_state else 'none'}, {time.time() - start:.1f}s)")
+            return {'success': True, 'swapped': True, 'version': new_state.version,
+                    'previous_version': old_state.version if old_state else None}
+        except Exception as e:
+            self.status['last_error'] = f"{type(e).__name__}: {e}"
+            self._failed_fingerprint = fingerprint
+            print(f"X Artifact reload failed, keeping current version: {e}")
+            if self._state is None:
+                raise
+            return {'success': False, 'version': self._state.version, 'error': self.status['last_error']}
+        finally:
+            self.status['reloading'] = False
+            self._reload_lock.release()
+
+    def start_watcher(self, interval_seconds: float):
+        """Poll artifact files and reload in the background when they change."""
+        if self._watcher is not None or interval_seconds <= 0:
+            return
+
+        def watch():
+            while not self._stop_watcher.wait(interval_seconds):
+                try:
+                    fingerprint = artifact_fingerprint()
+                    if fingerprint not in (self._fingerprint, self._failed_fingerprint):
+                        print("Artifact change detected, reloading...")
+                        self.reload()
+                except Exception as e:
+                    print(f"|!| Artifact watcher error: {e}")
+
+        self._stop_watcher.clear()
+        self._watcher = threading.Thread(target=watch, name="artifact-watcher", daemon=True)
+        self._watcher.start()
+        print(f"[OK] Artifact watcher polling every {interval_seconds:.0f}s")
+
+    def stop_watcher(self):
+        self._stop_watcher.set()
+        self._watcher = None
+
+    def info(self) -> Dict[str, Any]:
+        state = self._state
+        return {
+            'version': state.version if state else None,
+            'loaded_at': state.loaded_at if state else None,
+            'hdb_rows': len(state.hdb_data) if state is not None and state.hdb_data is not None else 0,
+            'watching': self._watcher is not None,
+            'waiting_for_fixed_artifacts': self._failed_fingerprint is not None,
+            **self.status,
+        }
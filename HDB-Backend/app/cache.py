@@ -0,0 +1,625 @@
+"""
+HDB Result Caches
+Caches for recommendation and prediction results behind one interface.
+
+Backends:
+- LRUCache:    in-process, thread-safe LRU bounded by entries, bytes and TTL.
+               Used by default, and as the stand-in for tests.
+- SQLiteCache: shared by every worker process on the host through one
+               SQLite file (on /dev/shm when available), so --workers N
+               share hits and a clear from any worker clears them all.
+- TieredCache: an L1 backend in front of a persistent on-disk SQLiteCache
+               (L2) that survives restarts and is warm-loaded on startup.
+
+create_cache() picks the backend from CACHE_BACKEND ("local" or "sqlite")
+and adds the disk L2 for persistent caches when DISK_CACHE_DIR is set.
+
+SingleFlight complements the caches: concurrent identical requests that
+all miss share one computation instead of each running their own.
+"""
+import asyncio
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached value in bytes (pickled size)."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 1024
+
+
+# Caches are inherited by forked process-pool workers. A lock held by
+# another thread at fork time would stay locked forever in the child, and
+# SQLite connections must not cross a fork, so both are reset there.
+_fork_sensitive = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for cache in list(_fork_sensitive):
+        cache._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class CacheBackend:
+    """
+    Interface shared by all cache backends.
+
+    Keys are strings, values any picklable object. get() returns default on
+    a miss; set() may silently drop values larger than the cache.
+    """
+
+    def _after_fork(self) -> None:
+        pass
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        raise NotImplementedError
+
+    def keys(self) -> List[str]:
+        raise NotImplementedError
+
+    def __contains__(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """
+    Least-recently-used cache with TTL and a byte-size bound.
+
+    A hit moves the entry to the most-recent end; inserts evict from the
+    least-recent end until both the entry and byte limits hold. Expired
+    entries are dropped lazily when read and eagerly when evicting.
+    """
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 3600.0,
+                 sizeof: Callable[[Any], int] = estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _fork_sensitive.add(self)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def _expired(self, expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and now >= expires_at
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[2], time.monotonic()):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return  # Larger than the whole cache; never worth storing
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Expired entries go first, then least-recently-used ones
+        if self.ttl_seconds:
+            for key in [k for k, (_, _, exp) in self._data.items() if self._expired(exp, now)]:
+                self._remove(key)
+                self.expirations += 1
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][0]
+            self._remove(key)
+            return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches predicate; returns the count removed."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            self._bytes = 0
+            return count
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry[2], time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'local',
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'memory_bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    LRU cache shared across processes through a SQLite database file.
+
+    Each named cache is a table in the same file. Entries store pickled
+    values with their size, expiry and last access time; inserts evict the
+    least recently accessed rows until the entry and byte limits hold.
+    Because every worker reads and writes the same rows, clear() and
+    invalidate() take effect cluster-wide on the host. Hit/miss counters
+    are per process.
+
+    Entry count and total size are kept in a totals row that triggers
+    update on every insert, update and delete, so an insert checks the
+    limits with one lookup instead of scanning the table.
+
+    Every operation is best-effort: a SQLite error (lock timeout, full
+    disk, corrupt row) is logged and counted, reads return default, False,
+    0 or empty, and writes are dropped, so a cache failure never fails a
+    request. stats() reports entries and memory_bytes as None then.
+    """
+
+    LOG_EVERY_ERRORS = 100  # After the first error, log one in this many
+
+    def __init__(self, path: Path, name: str, max_entries: int = 500,
+                 max_bytes: int = 64 * 1024 * 1024, ttl_seconds: Optional[float] = 3600.0):
+        self.path = Path(path)
+        self.name = name
+        self.table = f"cache_{name}"
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        _fork_sensitive.add(self)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL, last_access REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table} (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_totals ("
+                         "name TEXT PRIMARY KEY, entries INTEGER NOT NULL, bytes INTEGER NOT NULL)")
+            totals = "UPDATE cache_totals SET entries = entries + {0}, bytes = bytes + {1} WHERE name = '{2}'"
+            for event, change in (("INSERT", totals.format(1, "NEW.size", name)),
+                                  ("DELETE", totals.format(-1, "-OLD.size", name)),
+                                  ("UPDATE OF size", totals.format(0, "NEW.size - OLD.size", name))):
+                trigger = f"{self.table}_{event.split()[0].lower()}_totals"
+                conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {self.table} "
+                             f"BEGIN {change}; END")
+            # Resync once per start, in case the file predates the triggers
+            conn.execute(
+                f"INSERT OR REPLACE INTO cache_totals (name, entries, bytes) "
+                f"SELECT ?, COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}", (name,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _after_fork(self) -> None:
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _error(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        if self.errors == 1 or self.errors % self.LOG_EVERY_ERRORS == 0:
+            print(f"X Cache {self.name} {operation} failed ({self.errors} errors so far): {error}")
+
+    def _totals(self, conn: sqlite3.Connection) -> tuple:
+        row = conn.execute("SELECT entries, bytes FROM cache_totals WHERE name = ?", (self.name,)).fetchone()
+        return row if row is not None else (0, 0)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            if row[1] is not None and now >= row[1]:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return default
+            value = pickle.loads(row[0])
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        except Exception as e:
+            self._error("get", e)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self._error("set", e)
+            return
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"INSERT INTO {self.table} (key, value, size, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                    "size = excluded.size, expires_at = excluded.expires_at, last_access = excluded.last_access",
+                    (key, blob, len(blob), expires_at, now),
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            self._error("set", e)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        count, total = self._totals(conn)
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Over a limit: expired rows go first, then least recently used
+        expired = conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        self.expirations += max(expired, 0)
+        count, total = self._totals(conn)
+        victims = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, default)
+        try:
+            self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except Exception as e:
+            self._error("pop", e)
+        return value
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        try:
+            stale = [(k,) for k in self._keys() if predicate(k)]
+            self._conn().executemany(f"DELETE FROM {self.table} WHERE key = ?", stale)
+        except Exception as e:
+            self._error("invalidate", e)
+            return 0
+        return len(stale)
+
+    def clear(self) -> int:
+        try:
+            return max(self._conn().execute(f"DELETE FROM {self.table}").rowcount, 0)
+        except Exception as e:
+            self._error("clear", e)
+            return 0
+
+    def _keys(self) -> List[str]:
+        return [row[0] for row in self._conn().execute(f"SELECT key FROM {self.table}")]
+
+    def keys(self) -> List[str]:
+        try:
+            return self._keys()
+        except Exception as e:
+            self._error("keys", e)
+            return []
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            row = self._conn().execute(
+                f"SELECT 1 FROM {self.table} WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        except Exception as e:
+            self._error("contains", e)
+            return False
+        return row is not None
+
+    def __len__(self) -> int:
+        try:
+            return self._totals(self._conn())[0]
+        except Exception as e:
+            self._error("len", e)
+            return 0
+
+    def recent(self, limit: int) -> List[tuple]:
+        """Most recently used unexpired (key, value) pairs, newest first (empty on error)."""
+        try:
+            rows = self._conn().execute(
+                f"SELECT key, value FROM {self.table} WHERE expires_at IS NULL OR expires_at > ? "
+                "ORDER BY last_access DESC LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+            return [(key, pickle.loads(blob)) for key, blob in rows]
+        except Exception as e:
+            self._error("warm", e)
+            return []
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            count, total = self._totals(self._conn())
+        except Exception as e:
+            self._error("stats", e)
+            count, total = None, None
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'path': str(self.path),
+            'entries': count,
+            'max_entries': self.max_entries,
+            'memory_bytes': total,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'errors': self.errors,
+        }
+
+
+_MISSING = object()
+
+
+class TieredCache(CacheBackend):
+    """
+    Fast L1 cache backed by a slower shared or on-disk L2.
+
+    Reads try L1 then L2, promoting L2 hits into L1; writes go to both.
+    Keys carry the artifact version, and the version-change invalidation
+    that runs on every artifact swap (including startup) purges L2 rows
+    from older model bundles before warm() reloads L1.
+    """
+
+    def __init__(self, l1: CacheBackend, l2: SQLiteCache):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.l1.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.l1.set(key, value)
+        self.l2.set(key, value)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.l1.pop(key, _MISSING)
+        l2_value = self.l2.pop(key, _MISSING)
+        if value is _MISSING:
+            value = l2_value
+        return default if value is _MISSING else value
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        return max(self.l1.invalidate(predicate), self.l2.invalidate(predicate))
+
+    def clear(self) -> int:
+        return max(self.l1.clear(), self.l2.clear())
+
+    def warm(self, limit: int = None) -> int:
+        """Load the most recently used L2 entries into L1; returns the count loaded."""
+        limit = limit if limit is not None else getattr(self.l1, 'max_entries', 100)
+        entries = self.l2.recent(limit)
+        for key, value in reversed(entries):  # Oldest first so L1 LRU order matches
+            self.l1.set(key, value)
+        return len(entries)
+
+    def keys(self) -> List[str]:
+        return list(dict.fromkeys(self.l1.keys() + self.l2.keys()))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.l1 or key in self.l2
+
+    def __len__(self) -> int:
+        return len(self.l2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': 'tiered', 'l1': self.l1.stats(), 'l2': self.l2.stats()}
+
+
+def default_shared_cache_path() -> Path:
+    """Shared-memory filesystem when available, so the shared cache never touches disk."""
+    base = Path('/dev/shm') if Path('/dev/shm').is_dir() else Path(tempfile.gettempdir())
+    return base / 'hdb-api-cache.sqlite'
+
+
+def create_cache(name: str, max_entries: int, max_bytes: int,
+                 ttl_seconds: Optional[float], backend: str = None,
+                 persistent: bool = False, local_entries: int = 0) -> CacheBackend:
+    """
+    Build the cache backend selected by CACHE_BACKEND (default: local).
+
+    With the sqlite backend, local_entries > 0 keeps that many recently
+    used entries in a per-process LRU in front of the shared table, so
+    repeated reads of a large hot entry skip unpickling it. Those copies
+    live at most SHARED_CACHE_LOCAL_TTL seconds, which bounds how long a
+    clear() from another worker takes to reach this one.
+
+    persistent=True adds an on-disk L2 in DISK_CACHE_DIR when that is set.
+    The L2 is bounded by DISK_CACHE_MAX_MB per cache and DISK_CACHE_TTL.
+    """
+    backend = (backend or os.environ.get("CACHE_BACKEND", "local")).lower()
+    if backend == 'sqlite':
+        path = Path(os.environ.get("CACHE_PATH") or default_shared_cache_path())
+        cache = SQLiteCache(path, name, max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        if local_entries > 0:
+            local_ttl = float(os.environ.get("SHARED_CACHE_LOCAL_TTL", "30"))
+            cache = TieredCache(LRUCache(max_entries=local_entries, max_bytes=max_bytes,
+                                         ttl_seconds=min(local_ttl, ttl_seconds or local_ttl)), cache)
+    elif backend == 'local':
+        cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+    disk_dir = os.environ.get("DISK_CACHE_DIR")
+    if not persistent or not disk_dir:
+        return cache
+    disk_ttl = float(os.environ.get("DISK_CACHE_TTL", str(7 * 24 * 3600)))
+    l2 = SQLiteCache(
+        Path(disk_dir) / 'hdb-api-l2.sqlite', name,
+        max_entries=int(os.environ.get("DISK_CACHE_MAX_ENTRIES", "100000")),
+        max_bytes=int(float(os.environ.get("DISK_CACHE_MAX_MB", "1024")) * 1024 * 1024),
+        ttl_seconds=disk_ttl or None,
+    )
+    return TieredCache(cache, l2)
+
+
+# ============================================
+# REQUEST COALESCING
+# ============================================
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async computations onto one task.
+
+    The first caller for a key starts the computation as its own task;
+    callers arriving while it runs await the same task. Waiters are
+    shielded, so a disconnecting client never cancels the shared work.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self.leaders += 1
+
+            def done(t: asyncio.Future):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if not t.cancelled():
+                    t.exception()  # Mark retrieved even if every waiter went away
+
+            task.add_done_callback(done)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            'in_flight': len(self._inflight),
+            'computations': self.leaders,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,251 @@
+"""
+HDB Execution Engine
+Runs CPU-bound recommendation jobs on a thread pool or a process pool.
+
+Recommendation jobs are dominated by GIL-holding Python (row iteration,
+dict building, per-row pandas work), so extra threads mostly add
+contention. The process backend runs each job in its own interpreter.
+Workers are forked from the API process after the artifacts are loaded,
+so they start with the read-only ArtifactState already in memory,
+shared copy-on-write, and never pickle the model or datasets per job.
+
+Select with EXECUTION_BACKEND=thread|process (default thread) and size
+with EXECUTION_WORKERS. Within a job, exact-mode pricing batches (or town
+partitions on the sampled fallback) run on a per-process thread pool sized
+by PARTITION_WORKERS.
+
+Each endpoint class gets its own engine (a bulkhead lane) with its own
+pool and queue limit, so a burst of /recommend jobs fills the recommend
+lane and is rejected there instead of queueing ahead of /predict.
+"""
+import asyncio
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.artifacts import ArtifactState, load_artifact_state
+from app.threads import apply_model_threads, limit_native_threads
+
+# ============================================
+# PROCESS WORKER STATE
+# ============================================
+
+# Artifact states by version. The parent publishes a state here before
+# forking a pool, so children inherit it. The previous version is kept
+# so requests that started before a swap can still finish on it.
+_worker_states: Dict[str, ArtifactState] = {}
+MAX_PUBLISHED_VERSIONS = 2
+
+
+def publish_state(state: ArtifactState):
+    """Make a state available to process workers forked from now on."""
+    _worker_states[state.version] = state
+    while len(_worker_states) > MAX_PUBLISHED_VERSIONS:
+        del _worker_states[next(iter(_worker_states))]
+
+
+def worker_state(version: str) -> ArtifactState:
+    """Artifact state for a job inside a worker process."""
+    state = _worker_states.get(version)
+    if state is None:
+        # Spawned (not forked) workers start empty and load from disk once
+        state = load_artifact_state()
+        _worker_states[state.version] = state
+        if state.version != version:
+            raise RuntimeError(f"Artifact version {version} not available in worker (disk has {state.version})")
+    return state
+
+
+def _init_process_worker(model_threads: int = 1):
+    """Process pool initializer: apply the per-process share of the thread budget."""
+    limit_native_threads(model_threads)
+    for state in _worker_states.values():
+        apply_model_threads(state.model, model_threads)
+
+
+def call_with_state(fn: Callable, version: str, *args) -> Any:
+    """Runs in a worker process: resolve the state by version, then call fn(state, *args)."""
+    return fn(worker_state(version), *args)
+
+
+def _noop(_: int = 0) -> int:
+    return os.getpid()
+
+
+# ============================================
+# PARTITION POOL
+# ============================================
+
+# Thread pool for pricing batches or partitions inside a single job. Created lazily per
+# process: a forked worker must not reuse the parent's pool threads.
+_partition_pools: Dict[int, ThreadPoolExecutor] = {}
+_partition_lock = threading.Lock()
+
+
+def partition_executor(max_workers: int) -> Optional[ThreadPoolExecutor]:
+    """Per-process pool for pricing batches, or None when parallelism is off."""
+    if max_workers <= 1:
+        return None
+    pid = os.getpid()
+    pool = _partition_pools.get(pid)
+    if pool is None:
+        with _partition_lock:
+            pool = _partition_pools.get(pid)
+            if pool is None:
+                _partition_pools.clear()
+                pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="partition")
+                _partition_pools[pid] = pool
+    return pool
+
+
+# ============================================
+# EXECUTION ENGINE
+# ============================================
+
+class LaneFull(Exception):
+    """Raised when a lane's queue is at its limit; the job was not submitted."""
+
+    def __init__(self, lane: str, queued: int):
+        super().__init__(f"{lane} lane is full ({queued} jobs queued)")
+        self.lane = lane
+        self.queued = queued
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class ExecutionEngine:
+    """
+    Runs fn(state, *args) jobs on a configurable pool.
+
+    With the thread backend the state object is passed directly. With the
+    process backend only its version crosses the process boundary and the
+    worker looks up its inherited copy. swap() replaces the process pool
+    after an artifact reload; jobs already submitted finish on the old pool.
+
+    Jobs beyond max_workers wait in the pool's queue. With max_queue set,
+    run() raises LaneFull instead of queueing more than that many.
+    """
+
+    LATENCY_WINDOW = 1024  # Recent jobs kept for percentiles
+
+    def __init__(self, backend: str = "thread", max_workers: int = 4, model_threads: int = 1,
+                 name: str = "recommend", max_queue: Optional[int] = None):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown EXECUTION_BACKEND: {backend}")
+        self.name = name
+        self.backend = backend
+        self.max_workers = max_workers
+        self.model_threads = model_threads
+        self.max_queue = max_queue
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_queued_seen = 0
+        self.total_seconds = 0.0
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+
+    @property
+    def queued(self) -> int:
+        """Jobs submitted but waiting for a free worker."""
+        return max(0, self.in_flight - self.max_workers)
+
+    def _create_pool(self) -> Executor:
+        if self.backend == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=mp.get_context(method),
+            initializer=_init_process_worker,
+            initargs=(self.model_threads,),
+        )
+        # Fork workers now so the first requests don't pay the startup cost
+        list(pool.map(_noop, range(self.max_workers)))
+        return pool
+
+    def start(self, state: ArtifactState):
+        publish_state(state)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+                print(f"[OK] {self.name} lane: {self.backend} pool with {self.max_workers} workers")
+
+    def swap(self, new_state: ArtifactState, old_state: Optional[ArtifactState] = None):
+        """Artifact swap listener: process workers must be re-forked to see new state."""
+        publish_state(new_state)
+        if self.backend != "process":
+            return
+        with self._pool_lock:
+            old_pool, self._pool = self._pool, self._create_pool()
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)
+        print(f"[OK] Process pool re-forked for artifacts {new_state.version}")
+
+    async def run(self, fn: Callable, state: ArtifactState, *args) -> Any:
+        """Run fn(state, *args) on the pool and await its result."""
+        if self._pool is None:
+            self.start(state)
+        if self.max_queue is not None and self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise LaneFull(self.name, self.queued)
+        loop = asyncio.get_event_loop()
+        self.submitted += 1
+        self.in_flight += 1
+        self.max_queued_seen = max(self.max_queued_seen, self.queued)
+        start = time.perf_counter()
+        try:
+            if self.backend == "process":
+                result = await loop.run_in_executor(self._pool, call_with_state, fn, state.version, *args)
+            else:
+                result = await loop.run_in_executor(self._pool, fn, state, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.total_seconds += elapsed
+            self._latencies.append(elapsed)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        latencies = list(self._latencies)
+        return {
+            'lane': self.name,
+            'backend': self.backend,
+            'workers': self.max_workers,
+            'model_threads': self.model_threads,
+            'max_queue': self.max_queue,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'in_flight': self.in_flight,
+            'running': min(self.in_flight, self.max_workers),
+            'queued': self.queued,
+            'max_queued_seen': self.max_queued_seen,
+            'avg_seconds': round(self.total_seconds / finished, 4) if finished else 0.0,
+            'p50_seconds': round(_percentile(latencies, 0.50), 4),
+            'p99_seconds': round(_percentile(latencies, 0.99), 4),
+        }
@@ -0,0 +1,345 @@
+"""
+HDB Filter Facets
+Live match counts for the recommendation filters.
+
+A FacetIndex is built once per artifact version over hdb_data:
+- one packed bitmap per value of each categorical filter (town, flat
+  type, flat model, storey range),
+- a range index (values sorted once, with their row positions) per
+  numeric filter, so a range becomes a row mask via two binary searches,
+- a small integer code per row for each facet (its value or bucket).
+
+Flat model counts use the same case-insensitive substring match as
+/recommend, so "Model A" also counts Model A2 flats.
+
+Each facet is counted with every filter except its own, so the counts
+show what choosing another value would give. Rather than one pass per
+facet, a query counts how many active filters each row fails: rows failing
+none count for every facet, rows failing exactly one count only for that
+filter's facet, and the rest are never touched. One bincount of the facet
+codes over those rows gives all of a facet's counts.
+
+The filters and budget semantics match the hard filters in
+generate_candidate_set. With price tables for the target year the budget
+also checks the predicted price, so the total equals the exact candidate
+count /recommend would return.
+
+The same rows failing exactly one filter drive relaxations(): for a
+search with no matches, the smallest change to any single filter that
+brings back matches, computed from those rows alone.
+"""
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.recommendation import DISTANCE_COLUMNS, historical_price_band, target_price_factor
+
+# Bucket edges for the range facets: [edge, next edge), the last one open-ended
+BUDGET_BUCKETS = [0, 300_000, 400_000, 500_000, 600_000, 700_000, 800_000, 900_000, 1_000_000, 1_200_000]
+FLOOR_AREA_BUCKETS = [0, 50, 60, 70, 80, 90, 100, 110, 120, 140]
+LEASE_BUCKETS = [0, 40, 50, 60, 70, 80, 90]
+
+# Relaxations aim to bring back at least this many flats
+RELAXATION_TARGET = 10
+
+CATEGORICAL_FACETS = {
+    'towns': 'town',
+    'flatTypes': 'flat_type',
+    'flatModels': 'flat_model',
+    'storeyRanges': 'storey_range',
+}
+
+
+def bucket_codes(values: np.ndarray, edges: List[float]) -> np.ndarray:
+    """Bucket number per value; -1 for NaN or below the first edge."""
+    codes = np.searchsorted(edges, values, side='right') - 1
+    codes[np.isnan(values)] = -1
+    return codes
+
+
+def _bucket_list(edges: List[float], counts: np.ndarray) -> List[Dict[str, Any]]:
+    highs = edges[1:] + [None]
+    return [{'min': low, 'max': high, 'count': int(count)} for low, high, count in zip(edges, highs, counts)]
+
+
+class RangeIndex:
+    """Values sorted once, so any closed range maps to a slice of row positions."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        self.size = len(values)
+        self.order = np.argsort(values, kind='stable')  # NaN sorts last
+        self.sorted = values[self.order]
+
+    def mask(self, low: float = -np.inf, high: float = np.inf) -> np.ndarray:
+        """Row mask of low <= value <= high (NaN never matches)."""
+        start = np.searchsorted(self.sorted, low, side='left')
+        stop = np.searchsorted(self.sorted, high, side='right')
+        if stop - start <= self.size // 2:
+            rows = np.zeros(self.size, dtype=bool)
+            rows[self.order[start:stop]] = True
+        else:
+            # Wide range: clear the rows outside it instead
+            rows = np.ones(self.size, dtype=bool)
+            rows[self.order[:start]] = False
+            rows[self.order[stop:]] = False
+        return rows
+
+
+class FacetIndex:
+    """Bitmaps, range indexes and facet codes over hdb_data."""
+
+    def __init__(self, hdb_data: pd.DataFrame, price_tables: Dict[int, pd.Series] = None):
+        self.size = len(hdb_data)
+        # Rows without coordinates are dropped by the hard filters
+        self.base = hdb_data[['latitude', 'longitude']].notna().all(axis=1).to_numpy()
+
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.labels: Dict[str, List[str]] = {}
+        for facet, column in CATEGORICAL_FACETS.items():
+            codes, uniques = pd.factorize(hdb_data[column])
+            self.codes[facet], self.labels[facet] = codes, [str(value) for value in uniques]
+            self.bitmaps[facet] = {
+                str(value): np.packbits(codes == code) for code, value in enumerate(uniques)
+            }
+        # /recommend matches flat models as case-insensitive substrings, so
+        # choosing model i also selects every model j with model_matches[i, j]
+        models = [label.lower() for label in self.labels['flatModels']]
+        self.model_matches = np.array([[model in other for other in models] for model in models], dtype=np.int64)
+
+        self.ranges = {
+            'resale_price': RangeIndex(hdb_data['resale_price'].to_numpy(float)),
+            'floor_area_sqm': RangeIndex(hdb_data['floor_area_sqm'].to_numpy(float)),
+            'remaining_lease_years': RangeIndex(hdb_data['remaining_lease_years'].to_numpy(float)),
+        }
+        for column in DISTANCE_COLUMNS:
+            if column in hdb_data:
+                # The distance filters treat a missing distance as 999 km
+                self.ranges[column] = RangeIndex(hdb_data[column].fillna(999).to_numpy(float))
+
+        # Predicted prices by target year, in hdb_data row order
+        self.prices: Dict[int, np.ndarray] = {}
+        self.predicted: Dict[int, RangeIndex] = {}
+        for year, table in (price_tables or {}).items():
+            prices = np.full(self.size, np.nan)
+            # Rounded to the dollar, as the candidate pipeline does before its budget check
+            prices[hdb_data.index.get_indexer(table.index)] = np.round(table.to_numpy(float), 0)
+            self.prices[year] = prices
+            self.predicted[year] = RangeIndex(prices)
+        self._resale_price = hdb_data['resale_price'].to_numpy(float)
+
+        self.buckets = {
+            'floorArea': (FLOOR_AREA_BUCKETS,
+                          bucket_codes(hdb_data['floor_area_sqm'].to_numpy(float), FLOOR_AREA_BUCKETS)),
+            'leaseRange': (LEASE_BUCKETS,
+                           bucket_codes(hdb_data['remaining_lease_years'].to_numpy(float), LEASE_BUCKETS)),
+        }
+        # Budget buckets depend on the target year; built on first use
+        self._budget_codes: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _budget_bucket_codes(self, year: int) -> np.ndarray:
+        codes = self._budget_codes.get(year)
+        if codes is None:
+            if year in self.prices:
+                prices = self.prices[year]
+            else:
+                # No price table: bucket on historical price grown to the target year
+                prices = self._resale_price * target_price_factor(year)
+            codes = bucket_codes(prices, BUDGET_BUCKETS)
+            with self._lock:
+                self._budget_codes[year] = codes
+        return codes
+
+    def _any_of(self, facet: str, values) -> np.ndarray:
+        packed = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for value in values:
+            bitmap = self.bitmaps[facet].get(value)
+            if bitmap is not None:
+                packed |= bitmap
+        return np.unpackbits(packed, count=self.size).view(bool)
+
+    def _filter_masks(self, filters: Dict) -> Dict[str, np.ndarray]:
+        """One row mask per active filter, keyed by the facet it belongs to."""
+        masks = {}
+        for facet in ('towns', 'flatTypes', 'storeyRanges'):
+            if filters.get(facet):
+                masks[facet] = self._any_of(facet, filters[facet])
+        patterns = [m.lower() for m in filters.get('flatModels') or []]
+        if patterns:
+            masks['flatModels'] = self._any_of('flatModels', [
+                value for value in self.labels['flatModels'] if any(p in value.lower() for p in patterns)
+            ])
+
+        year = int(filters.get('targetYear', 2026))
+        budget = filters.get('budget')
+        if budget:
+            low, high = historical_price_band(budget[0], budget[1], target_price_factor(year))
+            mask = self.ranges['resale_price'].mask(low, high)
+            if year in self.predicted:
+                mask &= self.predicted[year].mask(budget[0], budget[1])
+            masks['budget'] = mask
+        if filters.get('floorArea'):
+            masks['floorArea'] = self.ranges['floor_area_sqm'].mask(*filters['floorArea'])
+        if filters.get('leaseRange'):
+            masks['leaseRange'] = self.ranges['remaining_lease_years'].mask(*filters['leaseRange'])
+
+        max_distances = filters.get('maxDistances') or {}
+        for column, short in DISTANCE_COLUMNS.items():
+            if short and max_distances.get(short) and column in self.ranges:
+                masks[f'maxDistances.{short}'] = self.ranges[column].mask(high=max_distances[short])
+        return masks
+
+    def _near_rows(self, filters: Dict) -> tuple:
+        """Rows passing every filter, and per active filter the rows failing only that one."""
+        masks = self._filter_masks(filters)
+        failed = np.zeros(self.size, dtype=np.uint8)
+        for mask in masks.values():
+            failed += ~mask
+        # Only rows failing at most one filter can count anywhere
+        rows = np.flatnonzero(self.base & (failed <= 1))
+        failed = failed[rows]
+        matching = rows[failed == 0]
+        near = {facet: rows[(failed == 1) & ~mask[rows]] for facet, mask in masks.items()}
+        return matching, near
+
+    def counts(self, filters: Dict) -> Dict[str, Any]:
+        """
+        Total matches for the filters, plus per-value and per-bucket counts
+        for each facet with that facet's own filter left out.
+
+        filters uses the /recommend user_input keys; missing or empty keys
+        don't filter.
+        """
+        matching, near = self._near_rows(filters)
+
+        def count_codes(facet: str, codes: np.ndarray, size: int) -> np.ndarray:
+            counted = np.concatenate([matching, near[facet]]) if facet in near else matching
+            # Shift by one so code -1 (no bucket) lands in a slot that is dropped
+            return np.bincount(codes[counted] + 1, minlength=size + 1)[1:]
+
+        facets = {}
+        for facet, labels in self.labels.items():
+            counts = count_codes(facet, self.codes[facet], len(labels))
+            if facet == 'flatModels':
+                counts = self.model_matches @ counts
+            facets[facet] = {labels[i]: int(counts[i]) for i in np.argsort(labels) if counts[i]}
+
+        year = int(filters.get('targetYear', 2026))
+        for facet, (edges, codes) in (('budget', (BUDGET_BUCKETS, self._budget_bucket_codes(year))),
+                                      *self.buckets.items()):
+            facets[facet] = _bucket_list(edges, count_codes(facet, codes, len(edges)))
+
+        return {
+            'total': len(matching),
+            'predicted_budget': year in self.predicted,
+            'facets': facets,
+        }
+
+    # ============================================
+    # RELAXATIONS
+    # ============================================
+
+    def relaxations(self, filters: Dict, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Single-filter changes that would return flats, most matches first.
+
+        Categorical filters suggest the one extra value (town, flat type...)
+        that adds the most flats. Range filters suggest the smallest
+        widening, rounded to a friendly step, that brings back
+        RELAXATION_TARGET flats (or all of them if fewer are within reach).
+        Each suggestion carries the new filter value as 'change' and its
+        exact match count. Only rows failing just that filter can match
+        after a single change, so this costs about one counts() call.
+        """
+        _, near = self._near_rows(filters)
+        suggestions = []
+        for facet, rows in near.items():
+            if len(rows) == 0:
+                continue
+            if facet in self.labels:
+                suggestions.append(self._extra_value(facet, rows, filters))
+            elif facet == 'budget':
+                suggestions.extend(self._widen_budget(rows, filters))
+            elif facet in ('floorArea', 'leaseRange'):
+                column = 'floor_area_sqm' if facet == 'floorArea' else 'remaining_lease_years'
+                suggestions.extend(self._widen_range(facet, self.ranges[column].values[rows], filters[facet], 1))
+            else:
+                short = facet.split('.', 1)[1]
+                column = next(c for c, s in DISTANCE_COLUMNS.items() if s == short)
+                suggestions.append(self._widen_distance(short, self.ranges[column].values[rows], filters))
+        suggestions.sort(key=lambda s: -s['matches'])
+        return suggestions[:limit]
+
+    def _extra_value(self, facet: str, rows: np.ndarray, filters: Dict) -> Dict[str, Any]:
+        labels = self.labels[facet]
+        counts = np.bincount(self.codes[facet][rows] + 1, minlength=len(labels) + 1)[1:]
+        if facet == 'flatModels':
+            counts = self.model_matches @ counts
+        best = int(np.argmax(counts))
+        return {
+            'filter': facet,
+            'change': {facet: list(filters[facet]) + [labels[best]]},
+            'matches': int(counts[best]),
+            'description': f"Add {labels[best]} to {facet}",
+        }
+
+    @staticmethod
+    def _reach(needed: np.ndarray, step: float, up: bool) -> Optional[tuple]:
+        """Bound that admits RELAXATION_TARGET of the needed values, and how many it admits."""
+        if len(needed) == 0:
+            return None
+        ordered = np.sort(needed) if up else -np.sort(-needed)
+        target = ordered[min(RELAXATION_TARGET, len(ordered)) - 1]
+        bound = math.ceil(target / step) * step if up else math.floor(target / step) * step
+        admitted = int((needed <= bound).sum()) if up else int((needed >= bound).sum())
+        return bound, admitted
+
+    def _widen_range(self, facet: str, values: np.ndarray, current: List[float], step: float) -> List[Dict]:
+        low, high = current
+        suggestions = []
+        above = self._reach(values[values > high], step, up=True)
+        if above:
+            suggestions.append({'filter': facet, 'change': {facet: [low, above[0]]}, 'matches': above[1],
+                                'description': f"Raise the {facet} maximum to {above[0]:g}"})
+        below = self._reach(values[values < low], step, up=False)
+        if below:
+            suggestions.append({'filter': facet, 'change': {facet: [below[0], high]}, 'matches': below[1],
+                                'description': f"Lower the {facet} minimum to {below[0]:g}"})
+        return suggestions
+
+    def _widen_distance(self, short: str, values: np.ndarray, filters: Dict) -> Dict[str, Any]:
+        limit, admitted = self._reach(values, 0.1, up=True)
+        limit = round(limit, 1)
+        max_distances = {**filters['maxDistances'], short: limit}
+        return {'filter': f'maxDistances.{short}', 'change': {'maxDistances': max_distances}, 'matches': admitted,
+                'description': f"Allow up to {limit:g} km to the nearest {short}"}
+
+    def _widen_budget(self, rows: np.ndarray, filters: Dict) -> List[Dict]:
+        """
+        Budget needed per row: the historical price band (0.8x / 1.2x of the
+        price grown to the target year) and, with a price table, the
+        predicted price must both fit.
+        """
+        year = int(filters.get('targetYear', 2026))
+        low, high = filters['budget']
+        grown = self._resale_price[rows] * target_price_factor(year)
+        need_max, need_min = grown / 1.2, grown / 0.8
+        if year in self.prices:
+            predicted = self.prices[year][rows]
+            need_max, need_min = np.fmax(need_max, predicted), np.fmin(need_min, predicted)
+        suggestions = []
+        # Raising the maximum helps rows whose minimum requirement the current min already meets
+        above = self._reach(need_max[(need_max > high) & (need_min >= low)], 10_000, up=True)
+        if above:
+            suggestions.append({'filter': 'budget', 'change': {'budget': [low, above[0]]}, 'matches': above[1],
+                                'description': f"Raise the maximum budget to ${above[0]:,.0f}"})
+        below = self._reach(need_min[(need_min < low) & (need_max <= high)], 10_000, up=False)
+        if below:
+            suggestions.append({'filter': 'budget', 'change': {'budget': [below[0], high]}, 'matches': below[1],
+                                'description': f"Lower the minimum budget to ${below[0]:,.0f}"})
+        return suggestions
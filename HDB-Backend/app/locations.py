@@ -0,0 +1,136 @@
+"""
+HDB Location Search
+Autocomplete over POI names, primary schools and work areas.
+
+A LocationIndex is built once per artifact set. Names are normalized to
+lowercase alphanumeric tokens, and every token suffix of a name is a key
+in one sorted list ("cbd raffles place", "raffles place", "place" for
+"CBD (Raffles Place)"). The names with a word starting with the query are
+then one contiguous range of keys, found with two binary searches, and
+ranking plus the category and distance filters run vectorized over that
+range only. A multi-word query matches consecutive words.
+"""
+import bisect
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.recommendation import WORK_LOCATION_COORDS, haversine_array, name_tokens
+
+# Categories for the entries that aren't POIs
+SCHOOL_CATEGORY = 'primary_school'
+WORK_AREA_CATEGORY = 'work_area'
+
+# Sorts after every key character ([a-z0-9 ]), so prefix + KEY_END bounds the range
+KEY_END = '~'
+
+
+class LocationIndex:
+    """Sorted token-suffix index over location names, for prefix search."""
+
+    def __init__(self, location_data: Dict = None):
+        location_data = location_data or {}
+        names, categories, lats, lons = [], [], [], []
+
+        def add(name, category, lat, lon):
+            if not name or not isinstance(name, str):
+                return
+            try:
+                lat, lon = float(lat), float(lon)
+            except (TypeError, ValueError):
+                return
+            if np.isfinite(lat) and np.isfinite(lon) and name_tokens(name):
+                names.append(name)
+                categories.append(category)
+                lats.append(lat)
+                lons.append(lon)
+
+        for name, (lat, lon) in WORK_LOCATION_COORDS.items():
+            add(name, WORK_AREA_CATEGORY, lat, lon)
+        for school in location_data.get('schools') or []:
+            add(school.get('school_name', school.get('name', '')), SCHOOL_CATEGORY,
+                school.get('latitude', school.get('lat')), school.get('longitude', school.get('lon')))
+        for category, pois in (location_data.get('pois') or {}).items():
+            for poi in pois:
+                add(poi.get('name', ''), category, poi.get('lat'), poi.get('lon'))
+
+        self.names = names
+        self.category_names = sorted(set(categories))
+        codes = {category: i for i, category in enumerate(self.category_names)}
+        self.categories = np.array([codes[c] for c in categories], dtype=np.int32)
+        self.lats = np.array(lats, dtype=float)
+        self.lons = np.array(lons, dtype=float)
+        self.name_lengths = np.array([len(name) for name in names], dtype=np.int32)
+        # Alphabetical rank of each name, the last ranking tie-break
+        self.name_ranks = np.empty(len(names), dtype=np.int32)
+        self.name_ranks[sorted(range(len(names)), key=lambda i: names[i].lower())] = np.arange(len(names))
+
+        keys, entries, word_positions = [], [], []
+        for i, name in enumerate(names):
+            tokens = name_tokens(name)
+            for j in range(len(tokens)):
+                keys.append(' '.join(tokens[j:]))
+                entries.append(i)
+                word_positions.append(j)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys = [keys[k] for k in order]
+        self._entries = np.array(entries, dtype=np.int32)[order]
+        self._word_positions = np.array(word_positions, dtype=np.int32)[order]
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 10, categories: Optional[List[str]] = None,
+               lat: float = None, lon: float = None, radius_km: float = None) -> List[Dict[str, Any]]:
+        """
+        Up to limit locations with a word starting with the query.
+
+        Names that start with the query rank first. With lat/lon, nearer
+        locations rank next (and radius_km drops the ones further away);
+        otherwise shorter names, then alphabetical. categories keeps only
+        those categories (POI categories, 'primary_school', 'work_area').
+        """
+        prefix = ' '.join(name_tokens(query))
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + KEY_END, lo)
+        entries, positions = self._entries[lo:hi], self._word_positions[lo:hi]
+
+        # A name can match at several words; keep its earliest match
+        order = np.lexsort((positions, entries))
+        entries, positions = entries[order], positions[order]
+        first = np.ones(len(entries), dtype=bool)
+        first[1:] = entries[1:] != entries[:-1]
+        entries, starts_name = entries[first], positions[first] == 0
+
+        keep = np.ones(len(entries), dtype=bool)
+        if categories:
+            codes = [self.category_names.index(c) for c in categories if c in self.category_names]
+            keep &= np.isin(self.categories[entries], codes)
+        distances = None
+        if lat is not None and lon is not None:
+            distances = haversine_array(self.lats[entries], self.lons[entries], lat, lon)
+            if radius_km is not None:
+                keep &= distances <= radius_km
+            distances = distances[keep]
+        entries, starts_name = entries[keep], starts_name[keep]
+
+        if distances is not None:
+            ranked = np.lexsort((self.name_ranks[entries], distances, ~starts_name))
+        else:
+            ranked = np.lexsort((self.name_ranks[entries], self.name_lengths[entries], ~starts_name))
+        results = []
+        for k in ranked[:limit]:
+            i = entries[k]
+            result = {
+                'name': self.names[i],
+                'category': self.category_names[self.categories[i]],
+                'lat': float(self.lats[i]),
+                'lon': float(self.lons[i]),
+            }
+            if distances is not None:
+                result['distance_km'] = round(float(distances[k]), 3)
+            results.append(result)
+        return results
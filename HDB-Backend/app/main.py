@@ -7,33 +7,110 @@ Run (single worker): uvicorn app.main:app --reload --port 8000
 Run (production):    uvicorn app.main:app --workers 4 --port 8000
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any, Annotated
 import joblib
 import pandas as pd
 import numpy as np
-from sklearn.neighbors import BallTree
 from pathlib import Path
 from datetime import datetime
 import json
 import httpx
 import asyncio
+import time
 from concurrent.futures import ThreadPoolExecutor
-from functools import lru_cache
+from functools import lru_cache, partial
 import hashlib
+import base64
+import zlib
+import threading
+from collections import OrderedDict
 
 # Import recommendation module
-from app.recommendation import generate_recommendations, parse_destinations
-
-# Thread pool for CPU-bound tasks (allows concurrent processing)
-# Adjust based on expected concurrent users and CPU cores
+from app.recommendation import (
+    generate_candidate_set, score_candidates, skyline_candidates, ranking_page, rerank, parse_destinations,
+    candidate_frame, request_fingerprint, candidate_fingerprint, canonical_filters, filters_subsume,
+    refine_candidate_set, PREDICT_BATCH_ROWS, FREQUENCY_WEIGHTS,
+)
+from app.artifacts import ArtifactManager, ArtifactState, AMENITY_DISTANCE_COLUMNS, nearest_distances
+from app.cache import create_cache, TieredCache, SingleFlight
+from app.execution import ExecutionEngine, LaneFull, partition_executor
+from app.admission import AdmissionController, Overloaded
+from app.facets import FacetIndex
+from app.threads import plan_thread_budget, apply_model_threads, limit_native_threads, set_native_thread_env
+
+# Thread budget: every pool below, plus XGBoost's and BLAS's native thread
+# pools, is sized from one CPU count (cpu_count, affinity and cgroup quota)
+# so they don't multiply into cores x workers x OpenMP threads under load.
 import os
-CPU_CORES = os.cpu_count() or 4
-THREAD_WORKERS = min(32, CPU_CORES * 4)  # Up to 32 workers
+EXECUTION_BACKEND = os.environ.get("EXECUTION_BACKEND", "thread").lower()
+THREAD_BUDGET = plan_thread_budget(EXECUTION_BACKEND)
+set_native_thread_env(THREAD_BUDGET.blas_threads)
+CPU_CORES = THREAD_BUDGET.cpus
+
+# General thread pool for blocking work off the event loop (reloads, I/O)
+THREAD_WORKERS = THREAD_BUDGET.io_workers
 executor = ThreadPoolExecutor(max_workers=THREAD_WORKERS)
 
+# Recommendation jobs run on their own engine: a thread pool by default, or
+# a process pool of forked workers (EXECUTION_BACKEND=process) because the
+# work is GIL-bound Python. Process workers default to one per core.
+EXECUTION_WORKERS = THREAD_BUDGET.recommend_workers
+
+# Bulkhead lanes: /recommend and /predict each get their own pool and
+# queue limit, so a /recommend burst is rejected in its own lane instead
+# of queueing ahead of cheap predictions. /predict always uses threads.
+RECOMMEND_MAX_QUEUE = int(os.environ.get("RECOMMEND_MAX_QUEUE", EXECUTION_WORKERS * 4))
+PREDICT_WORKERS = THREAD_BUDGET.predict_workers
+PREDICT_MAX_QUEUE = int(os.environ.get("PREDICT_MAX_QUEUE", PREDICT_WORKERS * 32))
+recommendation_engine = ExecutionEngine(EXECUTION_BACKEND, EXECUTION_WORKERS, THREAD_BUDGET.model_threads,
+                                        name="recommend", max_queue=RECOMMEND_MAX_QUEUE)
+predict_engine = ExecutionEngine("thread", PREDICT_WORKERS, THREAD_BUDGET.model_threads,
+                                 name="predict", max_queue=PREDICT_MAX_QUEUE)
+
+# Admission control in front of the recommend lane: an AIMD concurrency
+# limit (up to the lane's workers) that backs off when jobs run slower than
+# RECOMMEND_TARGET_LATENCY, plus a bounded wait queue. Beyond that, 503.
+recommendation_admission = AdmissionController(
+    "recommend",
+    max_limit=int(os.environ.get("RECOMMEND_MAX_INFLIGHT", EXECUTION_WORKERS)),
+    min_limit=int(os.environ.get("RECOMMEND_MIN_INFLIGHT", 1)),
+    max_queue=RECOMMEND_MAX_QUEUE,
+    target_latency=float(os.environ.get("RECOMMEND_TARGET_LATENCY", 10.0)),
+    queue_timeout=float(os.environ.get("RECOMMEND_QUEUE_TIMEOUT", 30.0)),
+)
+
+# Time budget for pricing candidates when the client sends no deadlineMs.
+# Pricing stops at the deadline and the best ranking so far is returned
+# (flagged exact=False); clients may ask for up to RECOMMEND_MAX_DEADLINE.
+RECOMMEND_DEFAULT_DEADLINE = float(os.environ.get("RECOMMEND_DEFAULT_DEADLINE", 8.0))
+RECOMMEND_MAX_DEADLINE = float(os.environ.get("RECOMMEND_MAX_DEADLINE", 60.0))
+
+# /recommend/batch: most profiles per call. Profiles sharing hard filters
+# share one candidate set; at most BATCH_CONCURRENCY sets are built at once.
+BATCH_MAX_PROFILES = int(os.environ.get("BATCH_MAX_PROFILES", 50))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", EXECUTION_WORKERS))
+
+# Scatter-gather inside one job: filtered rows are split by town and priced
+# on this many threads (XGBoost inference releases the GIL). 1 disables it.
+PARTITION_WORKERS = THREAD_BUDGET.partition_workers
+
+# /recommend/stream reports progress from inside the job, which needs a
+# shared-memory callback, so streamed jobs always run on threads: the
+# recommend lane itself on the thread backend, else a small stream lane.
+# Provisional rankings are re-scored at most every STREAM_PROVISIONAL_INTERVAL;
+# streamed jobs price in STREAM_BATCH_ROWS batches so progress arrives often.
+STREAM_PROVISIONAL_INTERVAL = float(os.environ.get("STREAM_PROVISIONAL_INTERVAL", 0.25))
+STREAM_BATCH_ROWS = int(os.environ.get("STREAM_BATCH_ROWS", 2048))
+if EXECUTION_BACKEND == "thread":
+    stream_engine = recommendation_engine
+else:
+    stream_engine = ExecutionEngine("thread", max(2, CPU_CORES), THREAD_BUDGET.model_threads,
+                                    name="stream", max_queue=RECOMMEND_MAX_QUEUE)
+
 # ============================================
 # APP SETUP
 # ============================================
@@ -53,32 +130,162 @@ app.add_middleware(
 )
 
 # ============================================
-# PATH CONFIGURATION
+# ARTIFACTS
 # ============================================
 
-BASE_DIR = Path(__file__).parent.parent  # hdb-backend/
+# Model and data artifacts live in one immutable ArtifactState. Handlers
+# take artifacts.current() once and pass it down, so a hot reload never
+# changes the model or data under an in-flight request.
+artifacts = ArtifactManager(validate_fn=lambda state: validate_artifact_state(state),
+                            prepare_fn=lambda state: _apply_thread_budget(state))
 
-# Model files (HYBRID)
-MODEL_PATH = BASE_DIR / "app" / "models" / "xgb_hybrid_base.joblib"
-TREND_PATH = BASE_DIR / "app" / "models" / "trend_multipliers.json"
-FEATURES_PATH = BASE_DIR / "app" / "models" / "hybrid_model_features.json"
-
-# Data files
-MAPPINGS_PATH = BASE_DIR / "app" / "data" / "mappings"
-AMENITIES_PATH = BASE_DIR / "app" / "data" / "amenities"
-DATA_PATH = BASE_DIR / "app" / "data"  # For HDB dataset
+# Seconds between artifact file checks (0 disables the watcher)
+ARTIFACT_WATCH_INTERVAL = float(os.environ.get("ARTIFACT_WATCH_INTERVAL", "0"))
+# Shared secret for /admin endpoints (sent as X-Admin-Token). Without it the
+# admin endpoints only answer requests from this host.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
 
 # ============================================
-# GLOBAL RESOURCES
+# CACHES
 # ============================================
 
-model = None
-trend_multipliers = None
-model_features = None
-mappings = None
-amenity_data = None
-location_data = None  # Schools and POIs for dropdowns
-hdb_data = None  # Real HDB transaction dataset
+# All caches go through create_cache(): CACHE_BACKEND=local keeps them in
+# process, CACHE_BACKEND=sqlite shares them between every worker on the host.
+# Setting DISK_CACHE_DIR adds a persistent on-disk L2 to the candidate and
+# prediction caches so a deploy or worker recycle does not start cold.
+
+# Two-tier recommendation cache, both true LRUs bounded by entries, memory
+# and age. Keys are "<artifact version>:<fingerprint>".
+#   Tier 1 (_candidate_cache): priced candidate sets, keyed only on the hard
+#     filters. This is the expensive part (filters, distances, inference).
+#   Tier 2 (_recommendation_cache): ranked results, keyed on the full request
+#     including resolved destinations and weights. A request that only
+#     changes destinations misses tier 2 but re-scores a tier 1 hit.
+_cache_max_size = int(os.environ.get("RECOMMEND_CACHE_MAX_ENTRIES", "500"))
+_cache_max_bytes = int(float(os.environ.get("RECOMMEND_CACHE_MAX_MB", "128")) * 1024 * 1024)
+_cache_ttl = float(os.environ.get("RECOMMEND_CACHE_TTL", "3600"))
+# With CACHE_BACKEND=sqlite the most recent results (full rankings) also stay
+# in this process, so /recommend/page doesn't unpickle the ranking per page.
+_recommendation_cache = create_cache("recommendations", _cache_max_size, _cache_max_bytes, _cache_ttl,
+                                     local_entries=int(os.environ.get("RECOMMEND_CACHE_LOCAL_ENTRIES", "32")))
+
+# Candidate sets are cached from inside the recommendation job. On the
+# process backend that is a forked worker, where a local cache would be a
+# private copy the API process (cache-stats, clear-cache, invalidation on
+# swap) never sees, so the candidate tier is always shared there.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "local").lower()
+CANDIDATE_CACHE_BACKEND = "sqlite" if EXECUTION_BACKEND == "process" else CACHE_BACKEND
+if CANDIDATE_CACHE_BACKEND != CACHE_BACKEND:
+    print(f"WARNING: EXECUTION_BACKEND=process needs a shared candidate cache, "
+          f"using sqlite instead of CACHE_BACKEND={CACHE_BACKEND}")
+_candidate_cache = create_cache(
+    "candidates",
+    int(os.environ.get("CANDIDATE_CACHE_MAX_ENTRIES", "100")),
+    int(float(os.environ.get("CANDIDATE_CACHE_MAX_MB", "256")) * 1024 * 1024),
+    _cache_ttl,
+    backend=CANDIDATE_CACHE_BACKEND,
+    persistent=True,
+)
+
+# Single-flat predictions, keyed on the request body and artifact version
+_prediction_cache = create_cache(
+    "predictions",
+    int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", "5000")),
+    int(float(os.environ.get("PREDICTION_CACHE_MAX_MB", "32")) * 1024 * 1024),
+    _cache_ttl,
+    persistent=True,
+)
+
+# Filters of the complete (exact) candidate sets this process has cached,
+# most recent last. A request whose hard filters are narrower than one of
+# them (tighter budget, fewer towns, lower maxDistances...) is answered by
+# refining that set's columns instead of filtering and pricing from scratch.
+# The index is a per-process dict, so refinement is only enabled on the
+# thread backend: forked workers would each keep their own copy, which
+# /recommend/clear-cache can't reach. CANDIDATE_REFINEMENT=0 turns it off.
+CANDIDATE_REFINEMENT = (os.environ.get("CANDIDATE_REFINEMENT", "1") == "1"
+                        and EXECUTION_BACKEND == "thread")
+CANDIDATE_INDEX_MAX = int(os.environ.get("CANDIDATE_INDEX_MAX_ENTRIES", "256"))
+_candidate_index: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (filters, rows)
+_candidate_index_lock = threading.Lock()
+_candidate_index_stats = {'refined': 0, 'misses': 0, 'stale': 0}
+
+# Concurrent identical /recommend calls that miss the cache share one run
+_recommendation_flights = SingleFlight()
+
+def _get_prediction_cache_key(kind: str, request: BaseModel, state: ArtifactState) -> str:
+    """Generate a cache key from a prediction request body and artifact version."""
+    body = json.dumps(request.dict(), sort_keys=True, separators=(',', ':'))
+    return f"{state.version}:{kind}:{hashlib.sha256(body.encode()).hexdigest()[:32]}"
+
+def _invalidate_stale_cache(new_state: ArtifactState, old_state: Optional[ArtifactState]):
+    """Drop cached results computed with a previous artifact version."""
+    prefix = f"{new_state.version}:"
+    stale = sum(
+        cache.invalidate(lambda key: not key.startswith(prefix))
+        for cache in (_recommendation_cache, _candidate_cache, _prediction_cache)
+    )
+    with _candidate_index_lock:
+        for key in [key for key in _candidate_index if not key.startswith(prefix)]:
+            del _candidate_index[key]
+    if stale:
+        print(f"[OK] Invalidated {stale} cached entries from old artifacts")
+
+def _warm_persistent_caches(new_state: ArtifactState, old_state: Optional[ArtifactState]):
+    """Preload recent on-disk entries for the active version into memory."""
+    for name, cache in (("candidate", _candidate_cache), ("prediction", _prediction_cache)):
+        if isinstance(cache, TieredCache):
+            loaded = cache.warm()
+            print(f"[OK] Warmed {loaded} {name} cache entries from disk")
+
+def _apply_thread_budget(new_state: ArtifactState):
+    """Cap XGBoost and BLAS threads for a freshly loaded model, before it is validated or swapped in."""
+    apply_model_threads(new_state.model, THREAD_BUDGET.model_threads)
+    limit_native_threads(THREAD_BUDGET.blas_threads)
+
+# Predicted price of every dataset flat for each target year. A prediction
+# depends only on the flat and the year, so it is computed once per
+# artifact version in batched model calls and exact-mode requests look it
+# up. Built before the process pool re-forks so workers inherit it.
+RECOMMEND_YEARS = range(2025, 2031)
+_price_tables = (None, {})  # (artifact version, {year: prices by hdb_data index})
+
+def _build_price_tables(new_state: ArtifactState, old_state: Optional[ArtifactState]):
+    global _price_tables
+    if new_state.hdb_data is None:
+        _price_tables = (None, {})
+        return
+    start = time.time()
+    rows = new_state.hdb_data.dropna(subset=['latitude', 'longitude'])
+    tables = {
+        year: pd.Series(predict_prices_for_recommendation(rows, year, new_state), index=rows.index)
+        for year in RECOMMEND_YEARS
+    }
+    _price_tables = (new_state.version, tables)
+    print(f"[OK] Price tables: {len(rows)} flats x {len(tables)} years ({time.time() - start:.1f}s)")
+
+# Bitmaps and range indexes over hdb_data for /recommend/facets. Built
+# after the price tables so budget counts can use predicted prices.
+_facet_index = (None, None)  # (artifact version, FacetIndex)
+
+def _build_facet_index(new_state: ArtifactState, old_state: Optional[ArtifactState]):
+    global _facet_index
+    if new_state.hdb_data is None:
+        _facet_index = (None, None)
+        return
+    start = time.time()
+    version, tables = _price_tables
+    index = FacetIndex(new_state.hdb_data, tables if version == new_state.version else None)
+    _facet_index = (new_state.version, index)
+    print(f"[OK] Facet index: {index.size} flats ({time.time() - start:.1f}s)")
+
+artifacts.on_swap(_invalidate_stale_cache)
+artifacts.on_swap(_warm_persistent_caches)
+artifacts.on_swap(_build_price_tables)
+artifacts.on_swap(_build_facet_index)
+artifacts.on_swap(recommendation_engine.swap)
+
 
 # Town to Region mapping (CCR=0, RCR=1, OCR=2)
 TOWN_TO_REGION = {
@@ -109,107 +316,67 @@ def clean_nan_values(obj):
         return obj
     return obj
 
-def get_nearest_distance(lat, lon, amenity_coords):
-    """Calculate distance to nearest amenity using BallTree + Haversine"""
-    if len(amenity_coords) == 0:
-        return 0.0
-    hdb_radians = np.radians([[lat, lon]])
-    amenity_radians = np.radians(amenity_coords)
-    tree = BallTree(amenity_radians, metric='haversine')
-    distance, _ = tree.query(hdb_radians, k=1)
-    return distance[0][0] * 6371
+def get_nearest_distance(lat, lon, amenity_tree):
+    """Calculate distance to nearest amenity using the prebuilt BallTree + Haversine"""
+    return float(nearest_distances(amenity_tree, lat, lon)[0])
 
 
-def calculate_all_distances(lat: float, lon: float) -> dict:
+def calculate_all_distances(lat: float, lon: float, state: ArtifactState = None) -> dict:
     """Calculate distances from coordinates to all amenity types"""
+    amenity_trees = (state or artifacts.current()).amenity_trees
     return {
-        'distance_to_nearest_primary_school_km': get_nearest_distance(lat, lon, amenity_data['primary_schools']),
-        'distance_to_nearest_high_value_school_km': get_nearest_distance(lat, lon, amenity_data['high_value_schools']),
-        'distance_to_nearest_mrt_km': get_nearest_distance(lat, lon, amenity_data['mrt_stations']),
-        'distance_to_nearest_hawker_km': get_nearest_distance(lat, lon, amenity_data['hawker_centers']),
-        'distance_to_nearest_mall_km': get_nearest_distance(lat, lon, amenity_data['malls']),
-        'distance_to_cbd_km': get_nearest_distance(lat, lon, amenity_data['cbd'])
+        column: get_nearest_distance(lat, lon, amenity_trees.get(amenity))
+        for column, amenity in AMENITY_DISTANCE_COLUMNS.items()
     }
 
 
-def get_trend_multiplier(year: int) -> float:
-    """Get Prophet trend multiplier for a given year"""
-    return trend_multipliers.get(str(year), trend_multipliers.get(str(2030), 1.0))
-
-
-def load_mappings():
-    """Load all mapping CSVs"""
-    print(f"Loading mappings from: {MAPPINGS_PATH}")
+def calculate_distances_batch(lats, lons, state: ArtifactState = None) -> Dict[str, np.ndarray]:
+    """calculate_all_distances for many points: one nearest-neighbour query per amenity type."""
+    amenity_trees = (state or artifacts.current()).amenity_trees
     return {
-        'town': pd.read_csv(MAPPINGS_PATH / 'town_code_map.csv'),
-        'flat_type': pd.read_csv(MAPPINGS_PATH / 'flat_type_int_map.csv'),
-        'flat_model': pd.read_csv(MAPPINGS_PATH / 'flat_model_code_map.csv'),
-        'region': pd.read_csv(MAPPINGS_PATH / 'region_code_map.csv'),
+        column: nearest_distances(amenity_trees.get(amenity), lats, lons)
+        for column, amenity in AMENITY_DISTANCE_COLUMNS.items()
     }
 
+def get_trend_multiplier(year: int, state: ArtifactState = None) -> float:
+    """Get Prophet trend multiplier for a given year"""
+    trend_multipliers = (state or artifacts.current()).trend_multipliers
+    return trend_multipliers.get(str(year), trend_multipliers.get(str(2030), 1.0))
 
-def load_amenity_data():
-    """Load all amenity datasets"""
-    print(f"Loading amenities from: {AMENITIES_PATH}")
-    
-    def load_coords(filename):
-        filepath = AMENITIES_PATH / filename
-        if filepath.exists():
-            df = pd.read_csv(filepath)
-            return df[['latitude', 'longitude']].values
-        else:
-            print(f"  |!| File not found: {filename}")
-            return np.array([])
-    
-    return {
-        'primary_schools': load_coords('Primary_school_dataset.csv'),
-        'high_value_schools': load_coords('Ballot_school.csv'),
-        'mrt_stations': load_coords('MRT_datasets.csv'),
-        'hawker_centers': load_coords('Hawker_Centers_datasets.csv'),
-        'malls': load_coords('Malls_datasets.csv'),
-        'cbd': load_coords('singapore_business_district.csv'),
-    }
 
+# Fixed inputs used to smoke-test a freshly loaded artifact set before it
+# is swapped in. Prices outside the plausible band fail the reload.
+SMOKE_PREDICTIONS = [
+    dict(town='BUKIT MERAH', flat_type='4 ROOM', flat_model='Model A', floor_area_sqm=100.0,
+         floor_level=10, lease_commence_year=1990, year=2025, lat=1.2819, lon=103.8239),
+    dict(town='PUNGGOL', flat_type='5 ROOM', flat_model='Improved', floor_area_sqm=112.0,
+         floor_level=7, lease_commence_year=2012, year=2027, lat=1.3984, lon=103.9072),
+    dict(town='JURONG WEST', flat_type='3 ROOM', flat_model='New Generation', floor_area_sqm=67.0,
+         floor_level=4, lease_commence_year=1985, year=2030, lat=1.3404, lon=103.7090),
+]
+SMOKE_PRICE_BOUNDS = (50_000, 5_000_000)
 
-def load_location_data():
-    """Load schools and POIs for dropdown options"""
-    print(f"Loading location data from: {AMENITIES_PATH}")
-    
-    data = {
-        'schools': [],
-        'pois': {},
-        'poi_categories': []
-    }
-    
-    # Load primary schools
-    schools_path = AMENITIES_PATH / 'Primary_school_dataset.csv'
-    if schools_path.exists():
-        df = pd.read_csv(schools_path)
-        data['schools'] = df.to_dict('records')
-        print(f"  [OK] Loaded {len(data['schools'])} schools")
-    
-    # Load POIs
-    poi_path = AMENITIES_PATH / 'singapore_poi.csv'
-    if poi_path.exists():
-        df = pd.read_csv(poi_path)
-        # Clean up Windows line endings if any
-        df.columns = df.columns.str.strip()
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                df[col] = df[col].str.strip()
-        
-        # Group by category
-        categories = df['category'].unique().tolist()
-        data['poi_categories'] = sorted([c for c in categories if c and c != 'category'])
-        
-        for cat in data['poi_categories']:
-            cat_df = df[df['category'] == cat][['name', 'lat', 'lon']].drop_duplicates(subset=['name'])
-            data['pois'][cat] = cat_df.to_dict('records')
-        
-        total_pois = sum(len(v) for v in data['pois'].values())
-        print(f"  [OK] Loaded {total_pois} POIs in {len(data['poi_categories'])} categories")
+
+def validate_artifact_state(state: ArtifactState):
+    """
+    Run smoke predictions against a candidate artifact set; raise if any look wrong.
     
-    return data
+    A set without the resale dataset (missing or unreadable CSV) is only
+    accepted if the active set has none either, so a broken data refresh
+    can't silently switch recommendations to synthetic flats.
+    """
+    if state.hdb_data is None or len(state.hdb_data) == 0:
+        if artifacts.loaded and artifacts.current().hdb_data is not None:
+            raise ValueError("HDB dataset missing or unreadable; active version has one")
+    for year in ('2025', '2030'):
+        if year not in state.trend_multipliers:
+            raise ValueError(f"Trend multipliers missing year {year}")
+    for case in SMOKE_PREDICTIONS:
+        distances = calculate_all_distances(case['lat'], case['lon'], state=state)
+        price = predict_price_for_recommendation(**case, distances=distances, state=state)
+        if not np.isfinite(price) or not SMOKE_PRICE_BOUNDS[0] <= price <= SMOKE_PRICE_BOUNDS[1]:
+            raise ValueError(f"Smoke prediction for {case['town']} {case['flat_type']} out of bounds: {price}")
+    print(f"[OK] Artifacts {state.version} passed {len(SMOKE_PREDICTIONS)} smoke predictions")
 
 
 # ============================================
@@ -218,107 +385,36 @@ def load_location_data():
 
 @app.on_event("startup")
 async def load_resources():
-    global model, trend_multipliers, model_features, mappings, amenity_data, location_data, hdb_data
-    
     print("=" * 60)
     print("HDB Price Prediction API - HYBRID MODEL")
     print("=" * 60)
     
-    # Load XGBoost model
-    try:
-        model = joblib.load(MODEL_PATH)
-        print(f"[OK] XGBoost model loaded: {MODEL_PATH}")
-    except Exception as e:
-        print(f"X Error loading model: {e}")
-        raise e
-    
-    # Load trend multipliers (Prophet)
-    try:
-        with open(TREND_PATH) as f:
-            trend_multipliers = json.load(f)
-        print(f"[OK] Trend multipliers loaded: {len(trend_multipliers)} years")
-        print(f"  Years: {list(trend_multipliers.keys())}")
-    except Exception as e:
-        print(f"X Error loading trend multipliers: {e}")
-        raise e
-    
-    # Load feature config (optional)
-    try:
-        if FEATURES_PATH.exists():
-            with open(FEATURES_PATH) as f:
-                model_features = json.load(f)
-            print(f"[OK] Feature config loaded")
-    except Exception as e:
-        print(f"|!| Feature config not loaded: {e}")
-    
-    # Load mappings
-    try:
-        mappings = load_mappings()
-        print(f"[OK] Mappings loaded: {len(mappings['town'])} towns")
-    except Exception as e:
-        print(f"X Error loading mappings: {e}")
-        raise e
-    
-    # Load amenity data
-    try:
-        amenity_data = load_amenity_data()
-        print(f"[OK] Amenities loaded")
-    except Exception as e:
-        print(f"X Error loading amenities: {e}")
-        raise e
-    
-    # Load location data for dropdowns
-    try:
-        location_data = load_location_data()
-        print(f"[OK] Location data loaded")
-    except Exception as e:
-        print(f"|!| Location data not loaded: {e}")
-        location_data = {'schools': [], 'pois': {}, 'poi_categories': []}
-    
-    # Load HDB transaction data for recommendations
-    try:
-        hdb_dataset_path = DATA_PATH / "Complete_HDB_resale_dataset_2015_to_2025.csv"
-        if hdb_dataset_path.exists():
-            hdb_data = pd.read_csv(hdb_dataset_path)
-            # Parse remaining lease
-            if 'remaining_lease' in hdb_data.columns and hdb_data['remaining_lease'].dtype == 'object':
-                import re
-                def parse_lease(lease_str):
-                    if pd.isna(lease_str):
-                        return None
-                    if isinstance(lease_str, (int, float)):
-                        return float(lease_str)
-                    match = re.match(r'(\d+)\s*years?(?:\s*(\d+)\s*months?)?', str(lease_str))
-                    if match:
-                        years = int(match.group(1))
-                        months = int(match.group(2)) if match.group(2) else 0
-                        return years + months / 12
-                    return None
-                hdb_data['remaining_lease_years'] = hdb_data['remaining_lease'].apply(parse_lease)
-            else:
-                hdb_data['remaining_lease_years'] = hdb_data.get('remaining_lease', 99)
-            
-            hdb_data['latitude'] = pd.to_numeric(hdb_data['latitude'], errors='coerce')
-            hdb_data['longitude'] = pd.to_numeric(hdb_data['longitude'], errors='coerce')
-            hdb_data['town'] = hdb_data['town'].str.upper().str.strip()
-            hdb_data['flat_type'] = hdb_data['flat_type'].str.upper().str.strip()
-            print(f"[OK] HDB dataset loaded: {len(hdb_data)} transactions")
-        else:
-            print(f"|!| HDB dataset not found at {hdb_dataset_path}")
-            print(f"    Place your Complete_HDB_resale_dataset.csv in {DATA_PATH}")
-            hdb_data = None
-    except Exception as e:
-        print(f"|!| HDB dataset not loaded: {e}")
-        hdb_data = None
+    artifacts.reload()
+    artifacts.start_watcher(ARTIFACT_WATCH_INTERVAL)
+    recommendation_engine.start(artifacts.current())
+    predict_engine.start(artifacts.current())
+    stream_engine.start(artifacts.current())
     
     print("=" * 60)
     print("[OK] All resources loaded - HYBRID MODEL READY")
-    print(f"[OK] CPU cores detected: {CPU_CORES}")
-    print(f"[OK] Thread pool: {THREAD_WORKERS} workers for concurrent requests")
+    print(f"[OK] Artifact version: {artifacts.current().version}")
+    print(f"[OK] CPU cores available: {CPU_CORES} (from {THREAD_BUDGET.cpu_source})")
+    print(f"[OK] Thread pool: {THREAD_WORKERS} workers for blocking work")
+    print(f"[OK] Recommend lane: {EXECUTION_BACKEND} x {EXECUTION_WORKERS}, queue {RECOMMEND_MAX_QUEUE}")
+    print(f"[OK] Predict lane: thread x {PREDICT_WORKERS}, queue {PREDICT_MAX_QUEUE}")
+    print(f"[OK] Partition workers: {PARTITION_WORKERS}, model threads: {THREAD_BUDGET.model_threads}")
     print(f"[OK] Cache size: {_cache_max_size} entries")
     print("=" * 60)
 
 
+@app.on_event("shutdown")
+async def stop_artifact_watcher():
+    artifacts.stop_watcher()
+    recommendation_engine.shutdown()
+    predict_engine.shutdown()
+    stream_engine.shutdown()
+
+
 # ============================================
 # REQUEST/RESPONSE MODELS
 # ============================================
@@ -407,15 +503,29 @@ async def root():
 
 @app.get("/health")
 async def health():
+    state = artifacts.current() if artifacts.loaded else None
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
-        "trend_multipliers_loaded": trend_multipliers is not None,
-        "mappings_loaded": mappings is not None,
-        "amenities_loaded": amenity_data is not None
+        "model_loaded": state is not None and state.model is not None,
+        "trend_multipliers_loaded": state is not None and state.trend_multipliers is not None,
+        "mappings_loaded": state is not None and state.mappings is not None,
+        "amenities_loaded": state is not None and state.amenity_data is not None,
+        "artifact_version": state.version if state else None
     }
 
 
+async def _run_in_lane(engine: ExecutionEngine, fn, state: ArtifactState, *args):
+    """Run a job on an endpoint's lane; a full lane is a 503, not an unbounded wait."""
+    try:
+        return await engine.run(fn, state, *args)
+    except LaneFull as e:
+        print(f"X {e}")
+        stats = engine.stats()
+        retry_after = max(1, round(stats['avg_seconds'] * (stats['queued'] + 1) / engine.max_workers))
+        raise HTTPException(status_code=503, detail=f"Server busy: {e}",
+                            headers={"Retry-After": str(retry_after)})
+
+
 @app.post("/predict", response_model=PredictionResponse)
 async def predict(request: PredictionRequest):
     """
@@ -423,6 +533,16 @@ async def predict(request: PredictionRequest):
     
     Formula: Final Price = XGBoost_base × Prophet_trend
     """
+    state = artifacts.current()
+    cache_key = _get_prediction_cache_key("predict", request, state)
+    cached = _prediction_cache.get(cache_key)
+    if cached is not None:
+        return PredictionResponse(**cached)
+    return await _run_in_lane(predict_engine, _predict_sync, state, request, cache_key)
+
+
+def _predict_sync(state: ArtifactState, request: PredictionRequest, cache_key: str) -> PredictionResponse:
+    """Single-flat prediction - runs on the predict lane."""
     try:
         # Step 1: Validate coordinates
         if request.latitude is None or request.longitude is None:
@@ -435,7 +555,7 @@ async def predict(request: PredictionRequest):
         coords = {'latitude': lat, 'longitude': lon, 'address': f"{request.block} {request.street}"}
         
         # Step 2: Calculate distances
-        distances = calculate_all_distances(lat, lon)
+        distances = calculate_all_distances(lat, lon, state=state)
         
         # Step 3: Get codes from mappings
         town = request.town.upper()
@@ -443,6 +563,7 @@ async def predict(request: PredictionRequest):
         flat_model = request.flat_model
         
         # Town code
+        mappings = state.mappings
         town_df = mappings['town']
         town_row = town_df[town_df['town'] == town]
         if town_row.empty:
@@ -496,13 +617,13 @@ async def predict(request: PredictionRequest):
         }])
         
         # Step 6: Get base prediction from XGBoost
-        base_price = float(model.predict(model_input)[0])
+        base_price = float(state.model.predict(model_input)[0])
         
         # Step 7: Apply trend multiplier from Prophet
-        trend = get_trend_multiplier(request.year)
+        trend = get_trend_multiplier(request.year, state=state)
         final_price = base_price * trend
         
-        return PredictionResponse(
+        response = PredictionResponse(
             success=True,
             predicted_price=round(final_price, 2),
             formatted_price=f"${final_price:,.0f}",
@@ -512,6 +633,8 @@ async def predict(request: PredictionRequest):
             distances={k: round(v, 4) for k, v in distances.items()},
             remaining_lease=remaining_lease
         )
+        _prediction_cache.set(cache_key, response.dict())
+        return response
         
     except Exception as e:
         print(f"X Prediction error: {e}")
@@ -529,6 +652,17 @@ async def predict_multi_year(request: MultiYearPredictionRequest):
     - Lease decay (XGBoost base decreases)
     - Market growth (Prophet trend increases)
     """
+    state = artifacts.current()
+    cache_key = _get_prediction_cache_key("multi-year", request, state)
+    cached = _prediction_cache.get(cache_key)
+    if cached is not None:
+        return MultiYearPredictionResponse(**cached)
+    return await _run_in_lane(predict_engine, _predict_multi_year_sync, state, request, cache_key)
+
+
+def _predict_multi_year_sync(state: ArtifactState, request: MultiYearPredictionRequest,
+                             cache_key: str) -> MultiYearPredictionResponse:
+    """Multi-year prediction - runs on the predict lane."""
     try:
         # Validate coordinates
         if request.latitude is None or request.longitude is None:
@@ -541,13 +675,14 @@ async def predict_multi_year(request: MultiYearPredictionRequest):
         coords = {'latitude': lat, 'longitude': lon, 'address': f"{request.block} {request.street}"}
         
         # Calculate distances (once)
-        distances = calculate_all_distances(lat, lon)
+        distances = calculate_all_distances(lat, lon, state=state)
         
         # Get codes
         town = request.town.upper()
         flat_type = request.flat_type.upper()
         flat_model = request.flat_model
         
+        mappings = state.mappings
         town_df = mappings['town']
         town_row = town_df[town_df['town'] == town]
         if town_row.empty:
@@ -602,8 +737,8 @@ async def predict_multi_year(request: MultiYearPredictionRequest):
             }])
             
             # Get base + trend
-            base_price = float(model.predict(model_input)[0])
-            trend = get_trend_multiplier(year)
+            base_price = float(state.model.predict(model_input)[0])
+            trend = get_trend_multiplier(year, state=state)
             final_price = base_price * trend
             
             # Calculate YoY change
@@ -622,12 +757,14 @@ async def predict_multi_year(request: MultiYearPredictionRequest):
                 yoy_change=yoy_change
             ))
         
-        return MultiYearPredictionResponse(
+        response = MultiYearPredictionResponse(
             success=True,
             predictions=predictions,
             coordinates=coords,
             distances={k: round(v, 4) for k, v in distances.items()}
         )
+        _prediction_cache.set(cache_key, response.dict())
+        return response
         
     except Exception as e:
         print(f"X Multi-year prediction error: {e}")
@@ -639,6 +776,7 @@ async def predict_multi_year(request: MultiYearPredictionRequest):
 @app.get("/options/towns")
 async def get_towns():
     """Get list of available towns"""
+    mappings = artifacts.current().mappings
     if mappings:
         return {"towns": sorted(mappings['town']['town'].tolist())}
     return {"towns": []}
@@ -647,6 +785,7 @@ async def get_towns():
 @app.get("/options/flat_types")
 async def get_flat_types():
     """Get list of available flat types"""
+    mappings = artifacts.current().mappings
     if mappings:
         return {"flat_types": mappings['flat_type']['flat_type'].tolist()}
     return {"flat_types": []}
@@ -655,6 +794,7 @@ async def get_flat_types():
 @app.get("/options/flat_models")
 async def get_flat_models():
     """Get list of available flat models"""
+    mappings = artifacts.current().mappings
     if mappings:
         return {"flat_models": mappings['flat_model']['flat_model_grouped'].tolist()}
     return {"flat_models": []}
@@ -663,7 +803,7 @@ async def get_flat_models():
 @app.get("/trend-multipliers")
 async def get_trend_multipliers():
     """Get all trend multipliers (for debugging/display)"""
-    return {"trend_multipliers": trend_multipliers}
+    return {"trend_multipliers": artifacts.current().trend_multipliers}
 
 
 # ============================================
@@ -673,6 +813,7 @@ async def get_trend_multipliers():
 @app.get("/locations/schools")
 async def get_schools():
     """Get list of all primary schools with coordinates"""
+    location_data = artifacts.current().location_data
     if location_data and location_data.get('schools'):
         schools = [
             {
@@ -689,6 +830,7 @@ async def get_schools():
 @app.get("/locations/poi-categories")
 async def get_poi_categories():
     """Get list of available POI categories"""
+    location_data = artifacts.current().location_data
     if location_data and location_data.get('poi_categories'):
         # Return user-friendly category names
         category_labels = {
@@ -737,6 +879,7 @@ async def get_poi_categories():
 @app.get("/locations/pois/{category}")
 async def get_pois_by_category(category: str):
     """Get list of POIs for a specific category"""
+    location_data = artifacts.current().location_data
     if location_data and location_data.get('pois'):
         pois = location_data['pois'].get(category, [])
         cleaned_pois = clean_nan_values(pois)
@@ -779,6 +922,35 @@ async def get_work_areas():
     return {"work_areas": sorted(work_areas, key=lambda x: x['name'])}
 
 
+@app.get("/locations/search")
+async def search_locations(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+    category: Optional[List[str]] = Query(default=None),
+    lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    lon: Optional[float] = Query(default=None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(default=None, gt=0)
+):
+    """
+    Autocomplete over POIs, primary schools and work areas.
+    
+    Matches names with a word starting with q (several words match
+    consecutive words). Optional filters: category (repeatable; POI
+    categories, 'primary_school', 'work_area') and lat/lon, which ranks
+    nearer matches first and, with radius_km, drops further ones.
+    """
+    if radius_km is not None and (lat is None or lon is None):
+        raise HTTPException(status_code=400, detail="radius_km needs lat and lon")
+    index = artifacts.current().location_index
+    start = time.perf_counter()
+    results = index.search(q, limit, category, lat, lon, radius_km) if index is not None else []
+    return {
+        "query": q,
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+
 # ============================================
 # RECOMMENDATION MODELS
 # ============================================
@@ -815,6 +987,21 @@ class Destinations(BaseModel):
     parentsHomes: List[ParentHome] = []
     otherDestinations: List[OtherDestination] = []
 
+class ScoreWeights(BaseModel):
+    """Relative weights of the five scores; rescaled to sum to 1."""
+    travel: Optional[float] = Field(default=None, ge=0)
+    value: Optional[float] = Field(default=None, ge=0)
+    budget: Optional[float] = Field(default=None, ge=0)
+    amenity: Optional[float] = Field(default=None, ge=0)
+    space: Optional[float] = Field(default=None, ge=0)
+
+class AmenityWeights(BaseModel):
+    """Relative weights inside the amenity score; rescaled to sum to 1."""
+    mrt: Optional[float] = Field(default=None, ge=0)
+    school: Optional[float] = Field(default=None, ge=0)
+    mall: Optional[float] = Field(default=None, ge=0)
+    hawker: Optional[float] = Field(default=None, ge=0)
+
 class RecommendationRequest(BaseModel):
     """Request model matching the React frontend format."""
     targetYear: int = Field(default=2026, ge=2025, le=2030)
@@ -827,14 +1014,70 @@ class RecommendationRequest(BaseModel):
     leaseRange: List[float] = Field(default=[30, 65])
     maxDistances: MaxDistances = MaxDistances()
     destinations: Destinations = Destinations()
+    deadlineMs: Optional[int] = Field(default=None, ge=100)  # Time budget for this request
+    # Optional overrides of SCORE_WEIGHTS / AMENITY_WEIGHTS / FREQUENCY_WEIGHTS
+    weights: Optional[ScoreWeights] = None
+    amenityWeights: Optional[AmenityWeights] = None
+    frequencyWeights: Optional[Dict[str, Annotated[float, Field(ge=0)]]] = None  # frequency label -> weight
+    # "ranked": top 10 by weighted score. "pareto": every flat no other flat
+    # beats on price, travel, amenity and space at once (cheapest first)
+    mode: str = Field(default="ranked", pattern="^(ranked|pareto)$")
+    # Attach each returned flat's 2025-2030 predicted prices ('trajectory')
+    trajectory: bool = False
+
+    @field_validator('frequencyWeights')
+    @classmethod
+    def known_frequencies(cls, weights):
+        unknown = sorted(set(weights or {}) - set(FREQUENCY_WEIGHTS))
+        if unknown:
+            raise ValueError(f"Unknown frequency labels {unknown}; expected any of {list(FREQUENCY_WEIGHTS)}")
+        return weights
+
+class FacetRequest(BaseModel):
+    """Partial recommendation filters; anything left out doesn't filter."""
+    targetYear: int = Field(default=2026, ge=2025, le=2030)
+    budget: Optional[List[float]] = Field(default=None, min_length=2, max_length=2)  # [min, max]
+    towns: List[str] = []
+    flatTypes: List[str] = []
+    flatModels: List[str] = []
+    floorArea: Optional[List[float]] = Field(default=None, min_length=2, max_length=2)
+    storeyRanges: List[str] = []
+    leaseRange: Optional[List[float]] = Field(default=None, min_length=2, max_length=2)
+    maxDistances: MaxDistances = MaxDistances()
 
 class RecommendationResponse(BaseModel):
     success: bool
     total_candidates: int = 0
     recommendations: List[Dict[str, Any]] = []
+    exact: bool = True   # False if sampled or cut off by the deadline
+    evaluated: int = 0   # Rows priced
+    filtered: int = 0    # Rows passing the hard filters
+    next_cursor: Optional[str] = None  # Pass to /recommend/page for the next results
+    suggestions: List[Dict[str, Any]] = []  # Single-filter relaxations when nothing matched
+    skyline_size: Optional[int] = None  # mode=pareto: flats on the Pareto front
     message: Optional[str] = None
     error: Optional[str] = None
 
+class RecommendationPageResponse(BaseModel):
+    success: bool
+    total_candidates: int = 0
+    offset: int = 0      # Rank of the first recommendation (0-based)
+    recommendations: List[Dict[str, Any]] = []
+    exact: bool = True
+    recomputed: bool = False  # Ranking had expired from the cache and was rebuilt
+    next_cursor: Optional[str] = None
+
+
+class BatchRecommendationRequest(BaseModel):
+    """Several household profiles, each a full /recommend request."""
+    profiles: List[RecommendationRequest] = Field(min_length=1, max_length=BATCH_MAX_PROFILES)
+
+class BatchRecommendationResponse(BaseModel):
+    success: bool
+    results: List[RecommendationResponse] = []  # One per profile, in request order
+    candidate_sets: int = 0  # Distinct hard-filter groups among the profiles
+    cache_hits: int = 0      # Profiles answered from the recommendation cache
+    error: Optional[str] = None
 
 # ============================================
 # RECOMMENDATION HELPER
@@ -850,12 +1093,16 @@ def predict_price_for_recommendation(
     year: int,
     lat: float,
     lon: float,
-    distances: dict
+    distances: dict,
+    state: ArtifactState = None
 ) -> float:
     """
     Predict price using hybrid model for recommendation scoring.
     This wraps the existing prediction logic for use in recommendations.
     """
+    state = state or artifacts.current()
+    mappings = state.mappings
+    
     # Get codes from mappings
     town_df = mappings['town']
     town_row = town_df[town_df['town'] == town.upper()]
@@ -905,48 +1152,395 @@ def predict_price_for_recommendation(
     }])
     
     # Get base prediction
-    base_price = float(model.predict(model_input)[0])
+    base_price = float(state.model.predict(model_input)[0])
     
     # Apply trend multiplier
-    trend = get_trend_multiplier(year)
+    trend = get_trend_multiplier(year, state=state)
     final_price = base_price * trend
     
     return final_price
 
 
+def predict_prices_for_recommendation(rows: pd.DataFrame, year, state: ArtifactState = None) -> np.ndarray:
+    """
+    Batched predict_price_for_recommendation: one model call for many flats.
+    
+    rows needs town, flat_type, flat_model, floor_area_sqm, floor_level,
+    lease_commence_year and the amenity distance columns. year is one year
+    for all rows or an array with a year per row. Codes are mapped
+    column-wise with the same fallbacks as the single-flat version; rows
+    with an unknown town or flat type get NaN.
+    """
+    state = state or artifacts.current()
+    mappings = state.mappings
+    if len(rows) == 0:
+        return np.array([])
+    
+    # Codes are looked up once per distinct value, then mapped over the column
+    def map_unique(values: pd.Series, lookup) -> pd.Series:
+        return values.map({value: lookup(value) for value in pd.unique(values)})
+    
+    town_map = dict(zip(mappings['town']['town'], mappings['town']['town_code']))
+    flat_type_map = dict(zip(mappings['flat_type']['flat_type'], mappings['flat_type']['flat_type_int']))
+    town_codes = map_unique(rows['town'], lambda t: town_map.get(str(t).upper()))
+    flat_type_ints = map_unique(rows['flat_type'], lambda t: flat_type_map.get(str(t).upper()))
+    regions = map_unique(rows['town'], lambda t: TOWN_TO_REGION.get(str(t).upper(), 2))
+    
+    flat_model_df = mappings['flat_model']
+    exact_codes = dict(zip(flat_model_df['flat_model_grouped'], flat_model_df['flat_model_code']))
+    upper_codes = dict(zip(flat_model_df['flat_model_grouped'].str.upper(), flat_model_df['flat_model_code']))
+    default_code = exact_codes.get('OTHER', flat_model_df['flat_model_code'].iloc[0])
+    
+    def flat_model_code(model):
+        model = 'Model A' if pd.isna(model) else str(model)
+        if model in exact_codes:
+            return exact_codes[model]
+        return upper_codes.get(model.upper(), default_code)
+    flat_model_codes = map_unique(rows['flat_model'], flat_model_code)
+    
+    lease_commence = rows['lease_commence_year'].fillna(1990).astype(int).to_numpy()
+    years = np.broadcast_to(np.asarray(year, dtype=int), len(rows))
+    
+    # Same feature order as the single-flat input frame
+    model_input = pd.DataFrame({
+        'floor_area_sqm': rows['floor_area_sqm'].to_numpy(),
+        'lease_commence_year': lease_commence,
+        'floor_level': rows['floor_level'].to_numpy(),
+        **{column: rows[column].to_numpy() for column in (
+            'distance_to_nearest_primary_school_km',
+            'distance_to_nearest_high_value_school_km',
+            'distance_to_nearest_mrt_km',
+            'distance_to_nearest_hawker_km',
+            'distance_to_nearest_mall_km',
+            'distance_to_cbd_km',
+        )},
+        'month_num': 1,
+        'quarter': 1,
+        'region_code': regions.to_numpy(),
+        'flat_type_int': flat_type_ints.fillna(0).to_numpy(),
+        'flat_model_code': flat_model_codes.to_numpy(),
+        'town_code': town_codes.fillna(0).to_numpy(),
+        'remaining_lease': 99 - (years - lease_commence)
+    })
+    model_input = model_input.astype({
+        'flat_type_int': mappings['flat_type']['flat_type_int'].dtype,
+        'flat_model_code': flat_model_df['flat_model_code'].dtype,
+        'town_code': mappings['town']['town_code'].dtype,
+    })
+    
+    distinct_years, year_index = np.unique(years, return_inverse=True)
+    trends = np.array([get_trend_multiplier(int(y), state=state) for y in distinct_years])
+    prices = state.model.predict(model_input).astype(float) * trends[year_index]
+    # Unknown town / flat type raise in the single-flat version; here they drop out
+    prices[(town_codes.isna() | flat_type_ints.isna()).to_numpy()] = np.nan
+    return prices
+
+
+def _dataset_rows(rows: pd.DataFrame, hdb_data: Optional[pd.DataFrame]) -> bool:
+    """True if rows are rows of hdb_data under their own index labels (not e.g. synthetic flats)."""
+    if hdb_data is None or not rows.index.isin(hdb_data.index).all():
+        return False
+    source = hdb_data.loc[rows.index, ['latitude', 'longitude', 'floor_area_sqm']].to_numpy(float)
+    return np.array_equal(source, rows[['latitude', 'longitude', 'floor_area_sqm']].to_numpy(float), equal_nan=True)
+
+def candidate_prices(rows: pd.DataFrame, year: int, state: ArtifactState = None) -> np.ndarray:
+    """
+    Exact-mode batch pricing: price table lookup, or batched inference if no
+    table. Tables are indexed by hdb_data row, so rows that aren't dataset
+    rows (synthetic candidates) are always priced by the model.
+    """
+    state = state or artifacts.current()
+    version, tables = _price_tables
+    table = tables.get(year) if version == state.version else None
+    if table is None or not _dataset_rows(rows, state.hdb_data):
+        return predict_prices_for_recommendation(rows, year, state)
+    return table.reindex(rows.index).to_numpy()
+
+
+def price_trajectories(candidates: pd.DataFrame, years=RECOMMEND_YEARS, state: ArtifactState = None) -> np.ndarray:
+    """
+    Predicted price of each candidate flat in each year (len(candidates) x
+    len(years)), from one model call over the flats x years feature matrix.
+    Same features as candidate pricing, so the target year matches
+    predicted_price.
+    """
+    years = np.asarray(list(years), dtype=int)
+    if len(candidates) == 0:
+        return np.empty((0, len(years)))
+    rows = candidates.loc[candidates.index.repeat(len(years))].reset_index(drop=True)
+    floor_level = pd.to_numeric(rows['storey_range'].astype(str).str.split(' TO ').str[0], errors='coerce')
+    rows['floor_level'] = floor_level.fillna(5).astype(int)
+    prices = predict_prices_for_recommendation(rows, np.tile(years, len(candidates)), state)
+    return prices.reshape(len(candidates), len(years))
+
+def _attach_trajectories(result: dict, candidates, state: ArtifactState):
+    """Add a 2025-2030 'trajectory' to each returned recommendation, in one batch."""
+    recommendations = result['recommendations']
+    if not recommendations:
+        return
+    frame = candidates if isinstance(candidates, pd.DataFrame) else candidate_frame(candidates)
+    ids = [rec['id'] for rec in recommendations]
+    rows = frame.set_index('id').loc[ids].reset_index()
+    start = time.perf_counter()
+    prices = price_trajectories(rows, RECOMMEND_YEARS, state)
+    for rec, trajectory in zip(recommendations, prices):
+        points, prev = [], None
+        for year, price in zip(RECOMMEND_YEARS, trajectory):
+            points.append({
+                'year': year,
+                'predictedPrice': int(round(price / 1000) * 1000) if np.isfinite(price) else None,
+                'yoyChange': round((price - prev) / prev * 100, 2) if prev else None
+            })
+            prev = price if np.isfinite(price) else None
+        rec['trajectory'] = points
+    print(f"[OK] Trajectories: {len(recommendations)} flats x {len(RECOMMEND_YEARS)} years "
+          f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
 # ============================================
 # RECOMMENDATION ENDPOINT
 # ============================================
 
-# Simple cache for recommendations (LRU with max entries)
-_recommendation_cache = {}
-_cache_max_size = 500  # Increased for more concurrent users
-
-def _get_cache_key(user_input: dict) -> str:
-    """Generate a cache key from user input."""
-    # Create a hashable representation
-    key_parts = [
-        str(user_input.get('targetYear')),
-        str(user_input.get('budget')),
-        str(sorted(user_input.get('towns', []))),
-        str(sorted(user_input.get('flatTypes', []))),
-        str(user_input.get('floorArea')),
-        str(user_input.get('leaseRange')),
-    ]
-    key_str = '|'.join(key_parts)
-    return hashlib.md5(key_str.encode()).hexdigest()
-
-def _run_recommendations(user_input: dict) -> dict:
-    """CPU-bound recommendation task - runs in thread pool."""
-    return generate_recommendations(
-        user_input=user_input,
-        calculate_distances_fn=calculate_all_distances,
-        predict_price_fn=predict_price_for_recommendation,
-        mappings=mappings,
-        location_data=location_data,
-        hdb_data=hdb_data,
-        top_n=10
+def _get_cache_key(user_input: dict, destinations: list, state: ArtifactState) -> str:
+    """Generate a cache key from the full normalized request and artifact version."""
+    return f"{state.version}:{request_fingerprint(user_input, destinations)}"
+
+def _get_candidate_cache_key(user_input: dict, state: ArtifactState) -> str:
+    """Generate a cache key from the hard-filter inputs and artifact version."""
+    return f"{state.version}:{candidate_fingerprint(user_input)}"
+
+
+def _index_candidate_set(cache_key: str, filters: dict, candidate_set: dict):
+    """Remember a complete cached candidate set as a refinement source."""
+    if not CANDIDATE_REFINEMENT or not candidate_set['exact']:
+        return
+    with _candidate_index_lock:
+        _candidate_index.pop(cache_key, None)
+        _candidate_index[cache_key] = (filters, len(candidate_set['candidates']))
+        while len(_candidate_index) > CANDIDATE_INDEX_MAX:
+            _candidate_index.popitem(last=False)
+
+def _refine_cached_candidates(user_input: dict, filters: dict, state: ArtifactState) -> Optional[dict]:
+    """Derive the candidate set from the smallest cached superset, if any."""
+    if not CANDIDATE_REFINEMENT:
+        return None
+    prefix = f"{state.version}:"
+    with _candidate_index_lock:
+        supersets = sorted(
+            (rows, key) for key, (cached_filters, rows) in _candidate_index.items()
+            if key.startswith(prefix) and filters_subsume(cached_filters, filters)
+        )
+    for rows, key in supersets:
+        cached = _candidate_cache.get(key)
+        if not isinstance(cached, dict):
+            # Evicted from the cache since it was indexed
+            with _candidate_index_lock:
+                _candidate_index.pop(key, None)
+            _candidate_index_stats['stale'] += 1
+            continue
+        start = time.perf_counter()
+        refined = refine_candidate_set(cached, user_input, state.hdb_data)
+        _candidate_index_stats['refined'] += 1
+        print(f"[OK] Refined cached candidate set: {rows} -> {len(refined['candidates'])} candidates "
+              f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return refined
+    _candidate_index_stats['misses'] += 1
+    return None
+
+def _replay_progress(candidate_set: dict, progress_fn):
+    """Report a ready-made candidate set to progress_fn as if it had just been priced."""
+    if progress_fn is not None:
+        progress_fn('filtered', {'filtered': candidate_set['filtered']})
+        progress_fn('priced', {'evaluated': candidate_set['evaluated'], 'candidates': candidate_set['candidates']})
+
+def _get_candidates(user_input: dict, state: ArtifactState, destinations: list = None,
+                    deadline: float = None, progress_fn=None) -> dict:
+    """
+    Tier 1: priced candidate set for the request's hard filters.
+    
+    progress_fn gets the same 'filtered' and 'priced' stages whether the
+    set is cached, refined or generated; generated sets are priced in
+    STREAM_BATCH_ROWS batches when it is given.
+    """
+    cache_key = _get_candidate_cache_key(user_input, state)
+    candidate_set = _candidate_cache.get(cache_key)
+    if isinstance(candidate_set, dict):
+        print(f"[OK] Candidate cache hit! Re-scoring {len(candidate_set['candidates'])} cached candidates")
+        _replay_progress(candidate_set, progress_fn)
+        return candidate_set
+    filters = canonical_filters(user_input)
+    candidate_set = _refine_cached_candidates(user_input, filters, state)
+    if candidate_set is not None:
+        _candidate_cache.set(cache_key, candidate_set)
+        _index_candidate_set(cache_key, filters, candidate_set)
+        _replay_progress(candidate_set, progress_fn)
+        return candidate_set
+    candidate_set = generate_candidate_set(
+        user_input,
+        partial(calculate_all_distances, state=state),
+        partial(predict_price_for_recommendation, state=state),
+        state.mappings,
+        hdb_data=state.hdb_data,
+        deadline=deadline,
+        executor=partition_executor(PARTITION_WORKERS),
+        destinations=destinations,
+        predict_batch_fn=partial(candidate_prices, state=state),
+        progress_fn=progress_fn,
+        distance_batch_fn=partial(calculate_distances_batch, state=state),
+        batch_rows=STREAM_BATCH_ROWS if progress_fn is not None else PREDICT_BATCH_ROWS
     )
+    # A set cut off by the deadline was priced best-first for these
+    # destinations, so it can't stand in for other requests
+    if not candidate_set['timed_out']:
+        _candidate_cache.set(cache_key, candidate_set)
+        _index_candidate_set(cache_key, filters, candidate_set)
+    return candidate_set
+
+def _score_candidate_set(candidates, destinations: list, user_input: dict, keep_ranking: bool = False) -> dict:
+    """Top 10 by weighted score, or the Pareto skyline in mode=pareto."""
+    if user_input.get('mode') == 'pareto':
+        return skyline_candidates(candidates, destinations, user_input)
+    return score_candidates(candidates, destinations, user_input, top_n=10, keep_ranking=keep_ranking)
+
+def _run_recommendations(state: ArtifactState, user_input: dict, destinations: list = None,
+                         deadline: float = None, progress_fn=None) -> dict:
+    """CPU-bound recommendation task - runs on the recommendation engine's pool."""
+    if destinations is None:
+        destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+    candidate_set = _get_candidates(user_input, state, destinations, deadline, progress_fn)
+    result = _score_candidate_set(candidate_set['candidates'], destinations, user_input, keep_ranking=True)
+    if user_input.get('trajectory'):
+        _attach_trajectories(result, candidate_set['candidates'], state)
+    result.update({
+        'exact': candidate_set['exact'],
+        'timed_out': candidate_set['timed_out'],
+        'evaluated': candidate_set['evaluated'],
+        'filtered': candidate_set['filtered']
+    })
+    return result
+
+def _recommendation_deadline(request: RecommendationRequest) -> float:
+    """Absolute deadline for a request. Counts from arrival, so time queued for admission is included."""
+    deadline_seconds = min(RECOMMEND_MAX_DEADLINE,
+                           request.deadlineMs / 1000 if request.deadlineMs else RECOMMEND_DEFAULT_DEADLINE)
+    return time.time() + deadline_seconds
+
+def _recommendation_input(request: RecommendationRequest) -> dict:
+    """Convert request to dict for recommendation engine."""
+    return {
+        'targetYear': request.targetYear,
+        'budget': request.budget,
+        'towns': [t.upper() for t in request.towns],
+        'flatTypes': [ft.upper() for ft in request.flatTypes],
+        'flatModels': request.flatModels,
+        'floorArea': request.floorArea,
+        'storeyRanges': request.storeyRanges,
+        'leaseRange': request.leaseRange,
+        'maxDistances': {
+            'mrt': request.maxDistances.mrt,
+            'school': request.maxDistances.school,
+            'mall': request.maxDistances.mall,
+            'hawker': request.maxDistances.hawker
+        },
+        'workLocations': [w.dict() for w in request.destinations.workLocations],
+        'schoolLocations': [s.dict() for s in request.destinations.schoolLocations],
+        'parentsHomes': [p.dict() for p in request.destinations.parentsHomes],
+        'otherDestinations': [o.dict() for o in request.destinations.otherDestinations],
+        'scoreWeights': request.weights.dict(exclude_none=True) if request.weights else None,
+        'amenityWeights': request.amenityWeights.dict(exclude_none=True) if request.amenityWeights else None,
+        'frequencyWeights': request.frequencyWeights or None,
+        'mode': request.mode,
+        'trajectory': request.trajectory
+    }
+
+def _base_ranking_input(user_input: dict) -> dict:
+    """The default-weight, ranked-mode request whose cached ranking rerank() reuses."""
+    return {**user_input, 'scoreWeights': None, 'amenityWeights': None, 'frequencyWeights': None,
+            'mode': 'ranked'}
+
+CURSOR_KINDS = ('recommend', 'rerank')
+
+def encode_cursor(request: RecommendationRequest, offset: int, kind: str = 'recommend') -> str:
+    """
+    Opaque page cursor. It carries the whole request rather than a cache
+    key, so a page can still be served after the cached ranking expires.
+    kind says how the pages were ranked: 'recommend' slices the cached
+    /recommend ranking, 'rerank' re-runs rerank() on the cached candidates.
+    """
+    body = {'q': request.dict(), 'o': offset}
+    if kind != 'recommend':
+        body['k'] = kind
+    body = json.dumps(body, separators=(',', ':'))
+    return base64.urlsafe_b64encode(zlib.compress(body.encode())).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """(RecommendationRequest, offset, kind) from encode_cursor; ValueError if malformed."""
+    try:
+        body = json.loads(zlib.decompress(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))))
+        kind = body.get('k', 'recommend')
+        if kind not in CURSOR_KINDS:
+            raise ValueError(f"unknown cursor kind {kind!r}")
+        return RecommendationRequest(**body['q']), int(body['o']), kind
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+def _next_cursor(result: dict, request: Optional[RecommendationRequest], offset: int) -> Optional[str]:
+    ranking = result.get('ranking')
+    if request is None or ranking is None or offset >= len(ranking):
+        return None
+    return encode_cursor(request, offset)
+
+def _relaxation_suggestions(request: RecommendationRequest, state: ArtifactState) -> List[Dict[str, Any]]:
+    """
+    Filter relaxations for an empty result, from the facet index of the
+    artifact version that served the request (empty if it isn't loaded).
+    """
+    version, index = _facet_index
+    if index is None or version != state.version:
+        return []
+    start = time.perf_counter()
+    suggestions = index.relaxations(_recommendation_input(request))
+    print(f"[OK] {len(suggestions)} relaxation suggestions in {(time.perf_counter() - start) * 1000:.1f}ms")
+    return suggestions
+
+def _recommendation_response(result: dict, request: RecommendationRequest = None,
+                             state: ArtifactState = None) -> RecommendationResponse:
+    suggestions = []
+    if request is not None and state is not None and result['total_candidates'] == 0:
+        suggestions = _relaxation_suggestions(request, state)
+    return RecommendationResponse(
+        success=True,
+        total_candidates=result['total_candidates'],
+        exact=result.get('exact', True),
+        evaluated=result.get('evaluated', result['total_candidates']),
+        filtered=result.get('filtered', result['total_candidates']),
+        recommendations=result['recommendations'],
+        next_cursor=_next_cursor(result, request, len(result['recommendations'])),
+        suggestions=suggestions,
+        skyline_size=result.get('skyline_size'),
+        message=result.get('message')
+    )
+
+async def _compute_recommendations(state: ArtifactState, user_input: dict, destinations: list,
+                                   deadline: float, cache_key: str) -> dict:
+    """Admission, lane and single-flight path shared by /recommend and /recommend/page."""
+    async def compute():
+        # Only admitted jobs reach the pool; the rest fail fast with Retry-After
+        try:
+            async with recommendation_admission.slot():
+                # Run CPU-bound task in thread or process pool (non-blocking for other requests)
+                computed = await _run_in_lane(recommendation_engine, _run_recommendations,
+                                              state, user_input, destinations, deadline)
+        except Overloaded as e:
+            print(f"X Recommendation rejected: {e}")
+            raise HTTPException(status_code=503, detail=f"Server busy: {e}",
+                                headers={"Retry-After": str(e.retry_after)})
+        if not computed['timed_out']:
+            _recommendation_cache.set(cache_key, computed)
+        return computed
+    
+    # Identical requests already in flight await that run instead
+    return await _recommendation_flights.do(cache_key, compute)
 
 @app.post("/recommend", response_model=RecommendationResponse)
 async def get_recommendations(request: RecommendationRequest):
@@ -960,30 +1554,12 @@ async def get_recommendations(request: RecommendationRequest):
     - Amenity Access (15%): Proximity to MRT, schools, malls
     - Space Adequacy (5%): Floor area vs preference
     
-    Supports concurrent requests via thread pool executor.
+    Supports concurrent requests via the recommendation execution engine.
     """
+    state = artifacts.current()
+    deadline = _recommendation_deadline(request)
     try:
-        # Convert request to dict for recommendation engine
-        user_input = {
-            'targetYear': request.targetYear,
-            'budget': request.budget,
-            'towns': [t.upper() for t in request.towns],
-            'flatTypes': [ft.upper() for ft in request.flatTypes],
-            'flatModels': request.flatModels,
-            'floorArea': request.floorArea,
-            'storeyRanges': request.storeyRanges,
-            'leaseRange': request.leaseRange,
-            'maxDistances': {
-                'mrt': request.maxDistances.mrt,
-                'school': request.maxDistances.school,
-                'mall': request.maxDistances.mall,
-                'hawker': request.maxDistances.hawker
-            },
-            'workLocations': [w.dict() for w in request.destinations.workLocations],
-            'schoolLocations': [s.dict() for s in request.destinations.schoolLocations],
-            'parentsHomes': [p.dict() for p in request.destinations.parentsHomes],
-            'otherDestinations': [o.dict() for o in request.destinations.otherDestinations]
-        }
+        user_input = _recommendation_input(request)
         
         print(f"\n{'='*60}")
         print(f"RECOMMENDATION REQUEST")
@@ -994,34 +1570,27 @@ async def get_recommendations(request: RecommendationRequest):
         print(f"Flat Types: {request.flatTypes if request.flatTypes else 'Any'}")
         print(f"Destinations: {len(user_input['workLocations'])} work, {len(user_input['parentsHomes'])} parents")
         
+        # Resolve destinations up front: their coordinates are part of the cache key
+        destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+        
         # Check cache first
-        cache_key = _get_cache_key(user_input)
-        if cache_key in _recommendation_cache:
+        cache_key = _get_cache_key(user_input, destinations, state)
+        result = _recommendation_cache.get(cache_key)
+        if result is not None:
             print(f"[OK] Cache hit! Returning cached results")
-            result = _recommendation_cache[cache_key]
         else:
-            # Run CPU-bound task in thread pool (non-blocking for other requests)
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(executor, _run_recommendations, user_input)
-            
-            # Cache the result (with size limit)
-            if len(_recommendation_cache) >= _cache_max_size:
-                # Remove oldest entry
-                oldest_key = next(iter(_recommendation_cache))
-                del _recommendation_cache[oldest_key]
-            _recommendation_cache[cache_key] = result
+            result = await _compute_recommendations(state, user_input, destinations, deadline, cache_key)
         
         print(f"[OK] Found {result['total_candidates']} candidates")
+        if result.get('timed_out'):
+            print(f"[OK] Deadline reached: partial ranking from {result['evaluated']}/{result['filtered']} rows")
         print(f"[OK] Returning top {len(result['recommendations'])} recommendations")
         print(f"{'='*60}\n")
         
-        return RecommendationResponse(
-            success=True,
-            total_candidates=result['total_candidates'],
-            recommendations=result['recommendations'],
-            message=result.get('message')
-        )
+        return _recommendation_response(result, request, state)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"X Recommendation error: {e}")
         import traceback
@@ -1032,12 +1601,368 @@ async def get_recommendations(request: RecommendationRequest):
         )
 
 
+@app.get("/recommend/page", response_model=RecommendationPageResponse)
+async def get_recommendation_page(cursor: str, limit: int = Query(default=10, ge=1, le=100)):
+    """
+    Next page of a /recommend ranking.
+    
+    /recommend keeps the full ranked list in the result cache and returns
+    next_cursor with its first page. Pages are slices of that list, so
+    "show more" costs only the page size. If the ranking has expired (or
+    the artifacts were reloaded), the original request is recomputed from
+    the cursor and the page is served from the new ranking.
+    
+    Cursors from /recommend/rerank page through the re-ranked order
+    instead: rerank() is re-run on the cached default-weight ranking.
+    """
+    try:
+        request, offset, kind = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    state = artifacts.current()
+    if kind == 'rerank':
+        base, result, recomputed = await _rerank_request(state, request, offset + limit)
+        return RecommendationPageResponse(
+            success=True,
+            total_candidates=result['total_candidates'],
+            offset=offset,
+            recommendations=result['recommendations'][offset:offset + limit],
+            exact=base.get('exact', True),
+            recomputed=recomputed,
+            next_cursor=_rerank_cursor(result, request, offset + limit)
+        )
+    
+    user_input = _recommendation_input(request)
+    destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+    cache_key = _get_cache_key(user_input, destinations, state)
+    result = _recommendation_cache.get(cache_key)
+    recomputed = result is None
+    if recomputed:
+        print(f"[OK] Ranking for page cursor expired, recomputing")
+        result = await _compute_recommendations(state, user_input, destinations,
+                                                _recommendation_deadline(request), cache_key)
+    
+    ranking = result.get('ranking')
+    recommendations = ranking_page(ranking, offset, limit) if ranking is not None else []
+    return RecommendationPageResponse(
+        success=True,
+        total_candidates=result['total_candidates'],
+        offset=offset,
+        recommendations=recommendations,
+        exact=result.get('exact', True),
+        recomputed=recomputed,
+        next_cursor=_next_cursor(result, request, offset + limit)
+    )
+
+
+@app.post("/recommend/facets")
+async def get_recommendation_facets(request: FacetRequest):
+    """
+    Match counts for the current filters, for live counts in the filter form.
+    
+    Returns the total number of flats passing the filters and, per facet
+    (towns, flatTypes, flatModels, storeyRanges, budget, floorArea and
+    leaseRange buckets), how many would match for each value with the
+    facet's own filter left out. Counted from precomputed bitmaps, so it is
+    cheap enough to call on every edit.
+    """
+    state = artifacts.current()
+    version, index = _facet_index
+    if index is None or version != state.version:
+        raise HTTPException(status_code=503, detail="Facet index not loaded")
+    filters = request.dict()
+    filters['towns'] = [t.upper().strip() for t in request.towns]
+    filters['flatTypes'] = [ft.upper().strip() for ft in request.flatTypes]
+    start = time.perf_counter()
+    result = index.counts(filters)
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return {"success": True, **result}
+
+
+async def _rerank_request(state: ArtifactState, request: RecommendationRequest, top_n: int) -> tuple:
+    """
+    (base, result, recomputed): the cached default-weight ranking of the
+    request (computed once if missing) and rerank() of it with the
+    request's overrides and mode, keeping the first top_n.
+    """
+    user_input = _recommendation_input(request)
+    destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+    base_input = _base_ranking_input(user_input)
+    base_key = _get_cache_key(base_input, destinations, state)
+    base = _recommendation_cache.get(base_key)
+    recomputed = base is None
+    if recomputed:
+        base = await _compute_recommendations(state, base_input, destinations,
+                                              _recommendation_deadline(request), base_key)
+    
+    start = time.perf_counter()
+    ranking = base.get('ranking')
+    result = rerank(ranking, destinations, user_input, top_n=top_n) if ranking is not None else base
+    print(f"[OK] Re-ranked {result['total_candidates']} candidates in {(time.perf_counter() - start) * 1000:.2f}ms")
+    return base, result, recomputed
+
+def _rerank_cursor(result: dict, request: RecommendationRequest, offset: int) -> Optional[str]:
+    # In pareto mode only the skyline is paged, not every candidate
+    total = result.get('skyline_size', result['total_candidates'])
+    return encode_cursor(request, offset, kind='rerank') if total > offset else None
+
+@app.post("/recommend/rerank", response_model=RecommendationResponse)
+async def rerank_recommendations(request: RecommendationRequest, limit: int = Query(default=10, ge=1, le=100)):
+    """
+    Re-rank a request's candidates with its weight overrides.
+    
+    Meant for weight sliders: the candidates and their component scores
+    come from the cached default-weight ranking of the same request (the
+    one /recommend computes), so only the weighted sum and top N are
+    recomputed. If that ranking isn't cached yet it is computed once.
+    mode='pareto' returns the skyline over the re-weighted scores. The
+    next_cursor pages through this re-ranked order via /recommend/page.
+    """
+    state = artifacts.current()
+    base, result, _ = await _rerank_request(state, request, limit)
+    return RecommendationResponse(
+        success=True,
+        total_candidates=result['total_candidates'],
+        exact=base.get('exact', True),
+        evaluated=base.get('evaluated', result['total_candidates']),
+        filtered=base.get('filtered', result['total_candidates']),
+        recommendations=result['recommendations'][:limit],
+        next_cursor=_rerank_cursor(result, request, limit),
+        skyline_size=result.get('skyline_size'),
+        message=result.get('message')
+    )
+
+
+
+# ============================================
+# BATCH RECOMMENDATIONS
+# ============================================
+
+def _run_recommendation_group(state: ArtifactState, profiles: list, deadline: float = None) -> list:
+    """
+    Lane job for profiles that share hard filters: one candidate set,
+    scored once per profile. profiles is a list of (user_input, destinations).
+    """
+    user_input, destinations = profiles[0]
+    candidate_set = _get_candidates(user_input, state, destinations, deadline)
+    results = []
+    for user_input, destinations in profiles:
+        result = _score_candidate_set(candidate_set['candidates'], destinations, user_input, keep_ranking=True)
+        if user_input.get('trajectory'):
+            _attach_trajectories(result, candidate_set['candidates'], state)
+        result.update({
+            'exact': candidate_set['exact'],
+            'timed_out': candidate_set['timed_out'],
+            'evaluated': candidate_set['evaluated'],
+            'filtered': candidate_set['filtered']
+        })
+        results.append(result)
+    return results
+
+@app.post("/recommend/batch", response_model=BatchRecommendationResponse)
+async def batch_recommendations(request: BatchRecommendationRequest):
+    """
+    Recommendations for many profiles in one call.
+    
+    Profiles are grouped by their hard filters (budget, towns, flat types,
+    area, lease, distance limits, year); each group's candidate set is
+    filtered and priced once, as one admitted job, and every profile in
+    the group is scored over it with its own destinations and weights.
+    Results come back per profile, in request order, and are cached like
+    /recommend results, so next_cursor pages work as usual.
+    
+    A group that can't be admitted (server busy) or fails only marks its
+    own profiles with success=false.
+    """
+    state = artifacts.current()
+    started = time.perf_counter()
+    results: List[Optional[RecommendationResponse]] = [None] * len(request.profiles)
+    # candidate key -> {result key -> (user_input, destinations, positions)}
+    groups: Dict[str, Dict[str, tuple]] = {}
+    deadlines: Dict[str, float] = {}
+    cache_hits = 0
+    
+    for i, profile in enumerate(request.profiles):
+        user_input = _recommendation_input(profile)
+        destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+        cache_key = _get_cache_key(user_input, destinations, state)
+        cached = _recommendation_cache.get(cache_key)
+        if cached is not None:
+            results[i] = _recommendation_response(cached, profile, state)
+            cache_hits += 1
+            continue
+        group_key = _get_candidate_cache_key(user_input, state)
+        group = groups.setdefault(group_key, {})
+        # Identical profiles in one batch are scored once
+        group.setdefault(cache_key, (user_input, destinations, []))[2].append(i)
+        deadlines[group_key] = min(deadlines.get(group_key, math.inf), _recommendation_deadline(profile))
+    
+    limiter = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    
+    async def compute(group_key: str, group: Dict[str, tuple]):
+        members = list(group.items())
+        try:
+            async with limiter, recommendation_admission.slot():
+                computed = await recommendation_engine.run(
+                    _run_recommendation_group, state,
+                    [(user_input, destinations) for _, (user_input, destinations, _) in members],
+                    deadlines[group_key])
+        except Exception as e:
+            reason = f"Server busy: {e}" if isinstance(e, (Overloaded, LaneFull)) else f"Recommendation failed: {e}"
+            print(f"X Batch group of {len(members)} profiles failed: {e}")
+            for _, (_, _, positions) in members:
+                for i in positions:
+                    results[i] = RecommendationResponse(success=False, error=reason)
+            return
+        for (cache_key, (_, _, positions)), result in zip(members, computed):
+            if not result['timed_out']:
+                _recommendation_cache.set(cache_key, result)
+            for i in positions:
+                results[i] = _recommendation_response(result, request.profiles[i], state)
+    
+    await asyncio.gather(*(compute(key, group) for key, group in groups.items()))
+    print(f"[OK] Batch of {len(request.profiles)} profiles: {len(groups)} candidate sets, "
+          f"{cache_hits} cache hits, {time.perf_counter() - started:.2f}s")
+    return BatchRecommendationResponse(
+        success=True,
+        results=results,
+        candidate_sets=len(groups),
+        cache_hits=cache_hits
+    )
+
+# ============================================
+# STREAMING RECOMMENDATIONS
+# ============================================
+
+def _stream_event(event: str, payload: dict, sse: bool) -> str:
+    """One NDJSON line, or one Server-Sent Event when the client asked for text/event-stream."""
+    encode = partial(json.dumps, default=lambda v: v.item() if isinstance(v, np.generic) else str(v))
+    if sse:
+        return f"event: {event}\ndata: {encode(clean_nan_values(payload))}\n\n"
+    return encode(clean_nan_values({'event': event, **payload})) + "\n"
+
+def _stream_progress(emit, destinations: list, user_input: dict):
+    """
+    progress_fn for generate_candidate_set that forwards events to emit().
+    
+    Every priced batch or partition is a 'progress' event. The candidates
+    so far are re-scored into a 'provisional' top 10 on the first one and
+    then at most every STREAM_PROVISIONAL_INTERVAL. Value scores are relative
+    to the candidates seen, so provisional ranks can still move.
+    """
+    last_provisional = [0.0]
+    
+    def progress(stage: str, info: dict):
+        if stage == 'filtered':
+            emit('filtered', {'filtered': info['filtered']})
+            return
+        candidates = info['candidates']
+        emit('progress', {'evaluated': info['evaluated'], 'candidates': len(candidates)})
+        now = time.perf_counter()
+        if now - last_provisional[0] >= STREAM_PROVISIONAL_INTERVAL:
+            last_provisional[0] = now
+            ranked = _score_candidate_set(candidates, destinations, user_input)
+            emit('provisional', {
+                'evaluated': info['evaluated'],
+                'total_candidates': ranked['total_candidates'],
+                'recommendations': ranked['recommendations']
+            })
+    return progress
+
+@app.post("/recommend/stream")
+async def stream_recommendations(request: RecommendationRequest, accept: Optional[str] = Header(default=None)):
+    """
+    Same request and ranking as /recommend, streamed as it is computed.
+    
+    Events, in order: 'filtered' (rows passing the hard filters), then
+    'progress' and 'provisional' (top 10 over the candidates priced so far)
+    as pricing batches complete, then 'final' with the /recommend response
+    body. A failure is an 'error' event. Cached and refined candidate sets
+    send the same sequence, with a single 'progress'; a cached result sends
+    'filtered' and 'progress' from its counts, then 'final'.
+    
+    Newline-delimited JSON by default; Server-Sent Events with
+    Accept: text/event-stream.
+    """
+    state = artifacts.current()
+    deadline = _recommendation_deadline(request)
+    user_input = _recommendation_input(request)
+    destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+    cache_key = _get_cache_key(user_input, destinations, state)
+    sse = accept is not None and "text/event-stream" in accept
+    
+    async def events():
+        started = time.perf_counter()
+        cached = _recommendation_cache.get(cache_key)
+        if cached is not None:
+            yield _stream_event('filtered', {'filtered': cached.get('filtered', cached['total_candidates'])}, sse)
+            yield _stream_event('progress', {'evaluated': cached.get('evaluated', cached['total_candidates']),
+                                             'candidates': cached['total_candidates']}, sse)
+            yield _stream_event('final', _recommendation_response(cached, request, state).dict(), sse)
+            return
+        
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue()
+        
+        def emit(event: str, payload: dict):
+            # Called on the worker thread
+            loop.call_soon_threadsafe(queue.put_nowait, (event, payload))
+        
+        async def job():
+            async with recommendation_admission.slot():
+                computed = await stream_engine.run(
+                    _run_recommendations, state, user_input, destinations, deadline,
+                    _stream_progress(emit, destinations, user_input))
+            if not computed['timed_out']:
+                _recommendation_cache.set(cache_key, computed)
+            return computed
+        
+        # The job runs to completion (and fills the cache) even if the client goes away
+        task = asyncio.ensure_future(job())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        while not task.done():
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield _stream_event(*getter.result(), sse)
+            else:
+                getter.cancel()
+        # Events emitted before the job returned are already queued
+        while not queue.empty():
+            yield _stream_event(*queue.get_nowait(), sse)
+        
+        try:
+            result = task.result()
+        except (Overloaded, LaneFull) as e:
+            retry_after = e.retry_after if isinstance(e, Overloaded) else 1
+            print(f"X Streamed recommendation rejected: {e}")
+            yield _stream_event('error', {'status': 503, 'error': f"Server busy: {e}",
+                                          'retry_after': retry_after}, sse)
+            return
+        except Exception as e:
+            print(f"X Streamed recommendation error: {e}")
+            yield _stream_event('error', {'status': 500, 'error': f"Recommendation failed: {str(e)}"}, sse)
+            return
+        print(f"[OK] Streamed {len(result['recommendations'])} recommendations "
+              f"in {time.perf_counter() - started:.2f}s")
+        yield _stream_event('final', _recommendation_response(result, request, state).dict(), sse)
+    
+    return StreamingResponse(events(), media_type="text/event-stream" if sse else "application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.post("/recommend/clear-cache")
 async def clear_recommendation_cache():
-    """Clear the recommendation cache."""
-    global _recommendation_cache
-    count = len(_recommendation_cache)
-    _recommendation_cache = {}
+    """
+    Clear the recommendation and prediction caches.
+    
+    With CACHE_BACKEND=sqlite the caches are shared, so this clears them
+    for every worker on the host, not just the one handling the call.
+    """
+    count = _recommendation_cache.clear() + _candidate_cache.clear() + _prediction_cache.clear()
+    with _candidate_index_lock:
+        _candidate_index.clear()
     return {"success": True, "message": f"Cleared {count} cached entries"}
 
 
@@ -1048,11 +1973,84 @@ async def health_check():
         "status": "healthy",
         "cpu_cores": CPU_CORES,
         "thread_workers": THREAD_WORKERS,
+        "recommendation_engine": recommendation_engine.stats(),
         "cache_size": len(_recommendation_cache),
-        "cache_max": _cache_max_size
+        "cache_max": _cache_max_size,
+        "cache": _recommendation_cache.stats(),
+        "candidate_cache": _candidate_cache.stats()
+    }
+
+
+@app.get("/recommend/cache-stats")
+async def get_recommendation_cache_stats():
+    """Hit ratio, evictions and memory use of both recommendation cache tiers."""
+    return {
+        "results": _recommendation_cache.stats(),
+        "candidates": _candidate_cache.stats(),
+        "candidate_refinement": {'enabled': CANDIDATE_REFINEMENT, 'indexed': len(_candidate_index),
+                                 **_candidate_index_stats},
+        "predictions": _prediction_cache.stats(),
+        "single_flight": _recommendation_flights.stats()
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Execution and cache metrics for this worker process."""
+    return {
+        "artifact_version": artifacts.current().version,
+        "execution": {
+            "thread_budget": THREAD_BUDGET.to_dict(),
+            "lanes": {
+                "recommend": recommendation_engine.stats(),
+                "predict": predict_engine.stats(),
+                **({"stream": stream_engine.stats()} if stream_engine is not recommendation_engine else {})
+            },
+            "admission": {
+                "recommend": recommendation_admission.stats()
+            }
+        },
+        "caches": await get_recommendation_cache_stats()
     }
 
 
+# ============================================
+# ADMIN ENDPOINTS
+# ============================================
+
+def _check_admin_token(request: Request, token: Optional[str]):
+    if ADMIN_TOKEN:
+        if token != ADMIN_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are local-only without ADMIN_TOKEN")
+
+
+@app.post("/admin/reload")
+async def reload_artifacts(request: Request, force: bool = False, wait: bool = False,
+                           x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Load model and data artifacts from disk and swap them in without downtime.
+    
+    The new set is loaded in the background and validated with smoke
+    predictions; requests keep using the current version until the swap.
+    Pass wait=true to block until the reload finishes.
+    """
+    _check_admin_token(request, x_admin_token)
+    loop = asyncio.get_event_loop()
+    reload_job = loop.run_in_executor(executor, partial(artifacts.reload, force=force))
+    if wait:
+        return await reload_job
+    return {"success": True, "message": "Reload started", "version": artifacts.current().version}
+
+
+@app.get("/admin/artifacts")
+async def get_artifact_status(request: Request, x_admin_token: Optional[str] = Header(default=None)):
+    """Current artifact version and reload status."""
+    _check_admin_token(request, x_admin_token)
+    return artifacts.info()
+
+
 # ============================================
 # RUN SERVER
 # ============================================
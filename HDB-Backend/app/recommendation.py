@@ -14,7 +14,11 @@ import pandas as pd
 from math import radians, cos, sin, asin, sqrt
 from typing import List, Dict, Optional, Tuple, Any, Callable
 from dataclasses import dataclass
-import random
+from concurrent.futures import Executor
+import hashlib
+import json
+import re
+import time
 
 # ============================================================================
 # CONFIGURATION
@@ -53,6 +57,62 @@ AMENITY_WEIGHTS = {
 
 MAX_TRAVEL_DISTANCE_KM = 20.0
 
+
+def _override_weights(defaults: Dict[str, float], overrides: Optional[Dict], normalize: bool) -> Dict[str, float]:
+    weights = dict(defaults)
+    weights.update({k: float(v) for k, v in (overrides or {}).items() if k in defaults and v is not None})
+    total = sum(weights.values())
+    if total <= 0:
+        return dict(defaults)
+    return {k: v / total for k, v in weights.items()} if normalize and overrides else weights
+
+
+def request_weights(user_input: Dict) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+    """
+    Score, amenity and frequency weights for a request: the defaults above
+    with the request's scoreWeights / amenityWeights / frequencyWeights
+    overrides applied. Overridden score and amenity weights are rescaled to
+    sum to 1 so scores stay on a 0-100 scale.
+    """
+    frequency = dict(FREQUENCY_WEIGHTS)
+    frequency.update({k: float(v) for k, v in (user_input.get('frequencyWeights') or {}).items() if v is not None})
+    return (_override_weights(SCORE_WEIGHTS, user_input.get('scoreWeights'), normalize=True),
+            _override_weights(AMENITY_WEIGHTS, user_input.get('amenityWeights'), normalize=True),
+            frequency)
+
+# Hard-filter values for filters a request leaves out. Candidate generation,
+# canonical_filters (cache keys) and refinement all read these, so a request
+# is keyed, refined and generated with the same filters.
+FILTER_DEFAULTS = {
+    'targetYear': 2026,
+    'budget': [0, float('inf')],
+    'floorArea': [0, 200],
+    'leaseRange': [0, 99],
+}
+
+# Candidate pipeline limits
+MAX_CANDIDATES_TO_PROCESS = 2000  # Rows priced per request before sampling kicks in
+MIN_PARTITION_ROWS = 200          # Below this, partitioning by town costs more than it saves
+DEADLINE_RESERVE_SECONDS = 0.25   # Left for scoring and the response when pricing stops at a deadline
+PREDICT_BATCH_ROWS = 32768        # Rows per pricing batch in exact mode
+
+# Amenity distance features (long names match the model) and their short keys
+DISTANCE_COLUMNS = {
+    'distance_to_nearest_mrt_km': 'mrt',
+    'distance_to_nearest_primary_school_km': 'school',
+    'distance_to_nearest_mall_km': 'mall',
+    'distance_to_nearest_hawker_km': 'hawker',
+    'distance_to_nearest_high_value_school_km': None,
+    'distance_to_cbd_km': None,
+}
+
+# Columnar candidate set: one row per priced flat
+CANDIDATE_COLUMNS = [
+    'id', 'town', 'flat_type', 'flat_model', 'block', 'street_name', 'floor_area_sqm',
+    'storey_range', 'lease_commence_year', 'remaining_lease', 'latitude', 'longitude',
+    'historical_price', 'predicted_price', *DISTANCE_COLUMNS
+]
+
 # Work location coordinates
 WORK_LOCATION_COORDS = {
     "CBD (Raffles Place)": (1.2840, 103.8515),
@@ -131,6 +191,14 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return 6371 * 2 * asin(sqrt(a))
 
 
+def haversine_array(lats: np.ndarray, lons: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    """Great-circle distance in km from many points to one point."""
+    lats, lons = np.radians(lats), np.radians(lons)
+    lat, lon = radians(lat), radians(lon)
+    a = np.sin((lat - lats) / 2) ** 2 + np.cos(lats) * cos(lat) * np.sin((lon - lons) / 2) ** 2
+    return 6371 * 2 * np.arcsin(np.sqrt(a))
+
+
 # ============================================================================
 # SCORING FUNCTIONS
 # ============================================================================
@@ -163,6 +231,26 @@ def calculate_travel_score(flat_lat: float, flat_lon: float, destinations: List[
     return round(score, 1)
 
 
+def travel_scores(lats: np.ndarray, lons: np.ndarray, destinations: List[Dict],
+                  frequency_weights: Dict[str, float] = None) -> np.ndarray:
+    """Vectorized calculate_travel_score for many flats."""
+    frequency_weights = frequency_weights or FREQUENCY_WEIGHTS
+    total_weighted_distance = np.zeros(len(lats))
+    total_weight = 0
+    for dest in destinations or []:
+        if dest.get('lat') is None or dest.get('lon') is None:
+            continue
+        weight = frequency_weights.get(dest.get('frequency', 'weekly'), 1.0)
+        total_weighted_distance += haversine_array(lats, lons, dest['lat'], dest['lon']) * weight
+        total_weight += weight
+    
+    if total_weight == 0:
+        return np.full(len(lats), 50.0)
+    
+    weighted_avg = total_weighted_distance / total_weight
+    return np.round(np.maximum(0, 100 - (weighted_avg / MAX_TRAVEL_DISTANCE_KM * 100)), 1)
+
+
 def calculate_value_score(price_per_sqm: float, all_ppsm: np.ndarray) -> float:
     """Calculate value efficiency score (25% weight)."""
     if len(all_ppsm) <= 1:
@@ -229,31 +317,79 @@ def calculate_final_score(travel: float, value: float, budget: float,
 
 
 # ============================================================================
-# DESTINATION PARSER
+# DESTINATION INDEX
 # ============================================================================
 
-def parse_destinations(user_input: Dict, location_data: Dict = None) -> List[Dict]:
-    """Parse user destinations to standardized format with coordinates."""
-    destinations = []
+def name_tokens(text: str) -> Tuple[str, ...]:
+    """Lowercase alphanumeric tokens: 'Kallang/Whampoa' -> ('kallang', 'whampoa')."""
+    return tuple(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+class DestinationIndex:
+    """
+    Lookup tables parse_destinations resolves names against, built once per
+    artifact set instead of per request.
+    
+    Schools and POIs are keyed by upper-cased name (later entries win, as
+    before). Towns keep the original case-insensitive substring rule: a
+    town matches a location that contains its name ("Blk 123 Ang Mo Kio
+    Ave 3", "Bedokville"), or, for parents' homes, a location that is part
+    of its name ("Jurong", "o kio"). When several towns match, the first
+    in TOWN_DATA order wins. Every substring of every town name is indexed
+    up front, so the partial case is one dict lookup.
+    """
     
-    # Build school lookup dict
-    school_coords = {}
-    if location_data and location_data.get('schools'):
-        for s in location_data['schools']:
-            name = s.get('school_name', s.get('name', ''))
-            lat = s.get('latitude', s.get('lat'))
-            lon = s.get('longitude', s.get('lon'))
+    def __init__(self, location_data: Dict = None):
+        location_data = location_data or {}
+        self.school_coords: Dict[str, Tuple[float, float]] = {}
+        for school in location_data.get('schools') or []:
+            name = school.get('school_name', school.get('name', ''))
+            lat = school.get('latitude', school.get('lat'))
+            lon = school.get('longitude', school.get('lon'))
             if name and isinstance(name, str) and lat and lon:
-                school_coords[name.upper()] = (lat, lon)
+                self.school_coords[name.upper()] = (lat, lon)
+        
+        self.poi_coords: Dict[str, Tuple[float, float]] = {}
+        for pois in (location_data.get('pois') or {}).values():
+            for poi in pois:
+                name = poi.get('name', '')
+                if name and isinstance(name, str) and poi.get('lat') and poi.get('lon'):
+                    self.poi_coords[name.upper()] = (poi['lat'], poi['lon'])
+        
+        self._town_names = [(town.lower(), town) for town in TOWN_DATA]
+        # Substring of a town name -> first town (TOWN_DATA order) containing it
+        self._town_fragments: Dict[str, str] = {}
+        for name, town in self._town_names:
+            for i in range(len(name)):
+                for j in range(i + 1, len(name) + 1):
+                    self._town_fragments.setdefault(name[i:j], town)
+    
+    def town_coords(self, location: str, partial: bool = False) -> Optional[Tuple[float, float]]:
+        """Centre of the town named in location (or, with partial, whose name contains location)."""
+        text = location.lower()
+        contains_text = self._town_fragments.get(text) if partial else None
+        for name, town in self._town_names:
+            if name in text or town == contains_text:
+                return TOWN_DATA[town]['lat'], TOWN_DATA[town]['lon']
+        return None
+
+
+# ============================================================================
+# DESTINATION PARSER
+# ============================================================================
+
+def parse_destinations(user_input: Dict, location_data: Dict = None,
+                       index: DestinationIndex = None) -> List[Dict]:
+    """
+    Parse user destinations to standardized format with coordinates.
     
-    # Build POI lookup dict
-    poi_coords = {}
-    if location_data and location_data.get('pois'):
-        for category, pois in location_data['pois'].items():
-            for p in pois:
-                name = p.get('name', '')
-                if name and isinstance(name, str) and p.get('lat') and p.get('lon'):
-                    poi_coords[name.upper()] = (p['lat'], p['lon'])
+    index is the artifact set's DestinationIndex; without one it is built
+    from location_data for this call.
+    """
+    destinations = []
+    if index is None:
+        index = DestinationIndex(location_data)
+    school_coords, poi_coords = index.school_coords, index.poi_coords
     
     # Work locations
     for work in user_input.get('workLocations', []):
@@ -301,13 +437,7 @@ def parse_destinations(user_input: Dict, location_data: Dict = None) -> List[Dic
         if not location or not isinstance(location, str):
             continue
             
-        lat, lon = None, None
-        
-        # Try town lookup first
-        for town, data in TOWN_DATA.items():
-            if town.lower() in location.lower() or location.lower() in town.lower():
-                lat, lon = data['lat'], data['lon']
-                break
+        lat, lon = index.town_coords(location, partial=True) or (None, None)
         
         if lat and lon:
             destinations.append({
@@ -332,10 +462,7 @@ def parse_destinations(user_input: Dict, location_data: Dict = None) -> List[Dic
             lat, lon = poi_coords[location.upper()]
         # Try town lookup
         else:
-            for town, data in TOWN_DATA.items():
-                if town.lower() in location.lower():
-                    lat, lon = data['lat'], data['lon']
-                    break
+            lat, lon = index.town_coords(location) or (lat, lon)
         
         destinations.append({
             'name': other.get('name', 'Other'),
@@ -346,6 +473,153 @@ def parse_destinations(user_input: Dict, location_data: Dict = None) -> List[Dic
     return destinations
 
 
+# ============================================================================
+# REQUEST FINGERPRINT
+# ============================================================================
+
+def _sorted_unique(values, normalize) -> List[str]:
+    return sorted({normalize(v) for v in values or [] if isinstance(v, str) and v.strip()})
+
+
+def _num(value) -> Optional[float]:
+    return None if value is None else round(float(value), 6)
+
+
+def canonical_filters(user_input: Dict) -> Dict:
+    """
+    Normalize the hard-filter inputs that determine the candidate set.
+
+    Missing filters take FILTER_DEFAULTS, as in generate_candidate_set, so
+    leaving a filter out never shares a key with an explicit narrower one.
+    Lists are de-duplicated and sorted, strings case-folded the same way the
+    filters compare them and falsy max distances dropped (they disable the
+    filter).
+    """
+    max_distances = user_input.get('maxDistances') or {}
+    return {
+        'targetYear': int(user_input.get('targetYear', FILTER_DEFAULTS['targetYear'])),
+        'budget': [_num(v) for v in user_input.get('budget', FILTER_DEFAULTS['budget'])],
+        'towns': _sorted_unique(user_input.get('towns'), lambda v: v.upper().strip()),
+        'flatTypes': _sorted_unique(user_input.get('flatTypes'), lambda v: v.upper().strip()),
+        'flatModels': _sorted_unique(user_input.get('flatModels'), lambda v: v.lower().strip()),
+        'floorArea': [_num(v) for v in user_input.get('floorArea', FILTER_DEFAULTS['floorArea'])],
+        'storeyRanges': _sorted_unique(user_input.get('storeyRanges'), lambda v: v.strip()),
+        'leaseRange': [_num(v) for v in user_input.get('leaseRange', FILTER_DEFAULTS['leaseRange'])],
+        'maxDistances': {k: _num(v) for k, v in sorted(max_distances.items()) if v},
+    }
+
+
+def canonical_request(user_input: Dict, destinations: List[Dict]) -> Dict:
+    """
+    Normalize a request to the exact inputs that determine its results.
+
+    Adds the scoring inputs to canonical_filters(): destinations reduced to
+    resolved coordinates plus frequency weight, sorted, because names and
+    order do not affect the scores, and the score weights in effect.
+    """
+    score_weights, amenity_weights, frequency_weights = request_weights(user_input)
+    return {
+        **canonical_filters(user_input),
+        'mode': user_input.get('mode') or 'ranked',
+        'trajectory': bool(user_input.get('trajectory')),
+        'weights': {k: _num(v) for k, v in score_weights.items()},
+        'amenityWeights': {k: _num(v) for k, v in amenity_weights.items()},
+        'destinations': sorted(
+            [_num(d['lat']), _num(d['lon']), _num(frequency_weights.get(d.get('frequency', 'weekly'), 1.0))]
+            for d in destinations
+            if d.get('lat') is not None and d.get('lon') is not None
+        ),
+    }
+
+
+def _fingerprint(canonical: Dict) -> str:
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:32]
+
+
+def request_fingerprint(user_input: Dict, destinations: List[Dict]) -> str:
+    """Stable hash of canonical_request(), used as the recommendation cache key."""
+    return _fingerprint(canonical_request(user_input, destinations))
+
+
+def candidate_fingerprint(user_input: Dict) -> str:
+    """Stable hash of canonical_filters(), used as the candidate-set cache key."""
+    return _fingerprint(canonical_filters(user_input))
+
+
+# ============================================================================
+# CANDIDATE SET REFINEMENT
+# ============================================================================
+
+def _range_within(inner: List, outer: List) -> bool:
+    return outer[0] <= inner[0] and inner[1] <= outer[1]
+
+
+def _values_within(inner: List[str], outer: List[str]) -> bool:
+    """Categorical filters: an empty list allows every value."""
+    return not outer or (bool(inner) and set(inner) <= set(outer))
+
+
+def filters_subsume(outer: Dict, inner: Dict) -> bool:
+    """
+    True if every flat passing the canonical_filters() inner also passes
+    outer, so a complete candidate set for outer contains the one for inner.
+    """
+    if outer['targetYear'] != inner['targetYear']:
+        return False
+    if not all(_range_within(inner[key], outer[key]) for key in ('budget', 'floorArea', 'leaseRange')):
+        return False
+    if not all(_values_within(inner[key], outer[key]) for key in ('towns', 'flatTypes', 'storeyRanges')):
+        return False
+    # Flat models match as substrings: a pattern containing an outer pattern is narrower
+    if outer['flatModels'] and not (inner['flatModels'] and all(
+            any(o in i for o in outer['flatModels']) for i in inner['flatModels'])):
+        return False
+    return all(key in inner['maxDistances'] and inner['maxDistances'][key] <= limit
+               for key, limit in outer['maxDistances'].items())
+
+
+def refine_candidate_set(candidate_set: Dict[str, Any], user_input: Dict,
+                         hdb_data: pd.DataFrame = None) -> Dict[str, Any]:
+    """
+    Candidate set for user_input derived from a complete cached set whose
+    filters subsume it (see filters_subsume): the hard filters are applied
+    again to the cached columns, with no distance lookups or inference.
+    Cached rows are in hdb_data order (see _concat_frames) and keep it, with
+    new sequential ids, so the result equals a fresh generate_candidate_set.
+    filtered and evaluated are the hard-filter count over hdb_data, as in a
+    fresh run; without hdb_data, the cached rows passing the new filters.
+    """
+    frame = candidate_set['candidates']
+    filters = canonical_filters(user_input)
+    min_budget, max_budget = filters['budget']
+    low, high = historical_price_band(min_budget, max_budget, target_price_factor(filters['targetYear']))
+    
+    keep = ((frame['historical_price'] >= low) & (frame['historical_price'] <= high) &
+            frame['floor_area_sqm'].between(*filters['floorArea']) &
+            frame['remaining_lease'].between(*filters['leaseRange']))
+    if filters['towns']:
+        keep &= frame['town'].isin(filters['towns'])
+    if filters['flatTypes']:
+        keep &= frame['flat_type'].isin(filters['flatTypes'])
+    if filters['flatModels']:
+        keep &= frame['flat_model'].str.lower().str.contains('|'.join(filters['flatModels']), na=False)
+    if filters['storeyRanges']:
+        keep &= frame['storey_range'].isin(filters['storeyRanges'])
+    for column, short in DISTANCE_COLUMNS.items():
+        if short in filters['maxDistances']:
+            keep &= frame[column].fillna(999) <= filters['maxDistances'][short]
+    considered = int(keep.sum())
+    keep &= frame['predicted_price'].between(min_budget, max_budget)
+    
+    if hdb_data is not None:
+        considered = len(hard_filter(hdb_data, user_input))
+    
+    refined = frame[keep.to_numpy()].reset_index(drop=True)
+    refined['id'] = np.arange(1, len(refined) + 1)
+    return _candidate_set(refined, filtered=considered, evaluated=considered)
+
+
 # ============================================================================
 # CANDIDATE GENERATOR (REAL DATA)
 # ============================================================================
@@ -410,54 +684,142 @@ def generate_candidates(
     predict_price_fn: Callable,
     mappings: Dict,
     hdb_data: pd.DataFrame = None,
-    timeout_seconds: float = 30.0  # Max processing time
+    deadline: float = None,
+    executor: Executor = None,
+    destinations: List[Dict] = None
 ) -> List[Dict]:
     """
     Filter real HDB transactions based on user criteria.
     This is the HARD FILTERING stage from the spec.
+    
+    See generate_candidate_set for the arguments; this returns just the
+    candidates, as a list of dicts.
     """
-    import time
-    start_time = time.time()
+    return candidate_records(generate_candidate_set(
+        user_input, calculate_distances_fn, predict_price_fn, mappings,
+        hdb_data=hdb_data, deadline=deadline, executor=executor, destinations=destinations
+    )['candidates'])
+
+
+def candidate_frame(candidates: List[Dict]) -> pd.DataFrame:
+    """Columnar candidate set from candidate dicts (distances nested under 'distances')."""
+    rows = []
+    for i, c in enumerate(candidates, 1):
+        dist = c.get('distances', {})
+        rows.append({
+            'id': c.get('id', i),
+            'town': c['town'],
+            'flat_type': c['flat_type'],
+            'flat_model': c.get('flat_model', 'Unknown'),
+            'block': c.get('block', ''),
+            'street_name': c.get('street_name', ''),
+            'floor_area_sqm': float(c['floor_area_sqm']),
+            'storey_range': c['storey_range'],
+            'lease_commence_year': int(c.get('lease_commence_year', 1990)),
+            'remaining_lease': float(c.get('remaining_lease', 60)),
+            'latitude': float(c['latitude']),
+            'longitude': float(c['longitude']),
+            'historical_price': float(c.get('historical_price', np.nan)),
+            'predicted_price': float(c['predicted_price']),
+            **{column: float(dist.get(column, np.nan)) for column in DISTANCE_COLUMNS}
+        })
+    return pd.DataFrame(rows, columns=CANDIDATE_COLUMNS)
+
+
+def candidate_records(frame: pd.DataFrame) -> List[Dict]:
+    """Candidate dicts from a columnar candidate set (inverse of candidate_frame)."""
+    records = []
+    for row in frame.to_dict('records'):
+        distances = {column: row.pop(column) for column in DISTANCE_COLUMNS}
+        distances.update({short: distances[column] for column, short in DISTANCE_COLUMNS.items() if short})
+        row['distances'] = distances
+        records.append(row)
+    return records
+
+
+def target_price_factor(target_year: int) -> float:
+    """Growth applied to historical prices for the target year (~3% a year from 2025)."""
+    current_year = 2025
+    price_growth_rate = 0.03  # ~3% annual appreciation
+    return (1 + price_growth_rate) ** (target_year - current_year)
+
+
+def historical_price_band(min_budget: float, max_budget: float, price_factor: float) -> Tuple[float, float]:
+    """Historical resale prices worth pricing for a budget (20% slack either side)."""
+    return min_budget / price_factor * 0.8, max_budget / price_factor * 1.2
+
+
+def _candidate_set(candidates, filtered: int = None, evaluated: int = None,
+                   sampled: bool = False, timed_out: bool = False) -> Dict[str, Any]:
+    if not isinstance(candidates, pd.DataFrame):
+        candidates = candidate_frame(candidates)
+    filtered = len(candidates) if filtered is None else filtered
+    evaluated = filtered if evaluated is None else evaluated
+    return {
+        'candidates': candidates,
+        'filtered': filtered,         # Rows passing the hard filters
+        'evaluated': evaluated,       # Rows actually priced
+        'sampled': sampled,
+        'timed_out': timed_out,
+        'exact': not sampled and not timed_out
+    }
+
+
+def priority_scores(df: pd.DataFrame, user_input: Dict, destinations: List[Dict],
+                    price_factor: float = 1.0) -> np.ndarray:
+    """
+    Cheap optimistic score per filtered row, used to price the most
+    promising rows first.
     
-    # Load data if not provided
-    if hdb_data is None:
-        hdb_data = load_hdb_data()
+    Travel and space are exact (they need only coordinates and floor area),
+    budget is estimated from the historical price grown to the target year,
+    and value and amenity are taken at their maximum since they need the
+    prediction and amenity distances.
+    """
+    budget = user_input.get('budget', [0, 1000000])
+    floor_area_range = user_input.get('floorArea', [70, 120])
+    weights, _, frequency_weights = request_weights(user_input)
     
-    if hdb_data is None or len(hdb_data) == 0:
-        print("WARNING: No HDB data available, falling back to synthetic")
-        return generate_candidates_synthetic(user_input, calculate_distances_fn, predict_price_fn, mappings)
+    travel = travel_scores(df['latitude'].to_numpy(float), df['longitude'].to_numpy(float), destinations,
+                           frequency_weights)
     
-    # Get user preferences
-    target_year = user_input.get('targetYear', 2026)
-    budget = user_input.get('budget', [0, float('inf')])
-    min_budget, max_budget = budget[0], budget[1]
+    preferred_area = (floor_area_range[0] + floor_area_range[1]) / 2
+    area = df['floor_area_sqm'].to_numpy(float)
+    space = np.clip(area / preferred_area * 100, 0, 100) if preferred_area else np.full(len(df), 50.0)
     
+    mid, budget_range = (budget[0] + budget[1]) / 2, budget[1] - budget[0]
+    estimate = df['resale_price'].to_numpy(float) * price_factor
+    if budget_range > 0:
+        budget_est = np.clip(100 - np.abs(estimate - mid) / budget_range * 100, 0, 100)
+    else:
+        budget_est = np.full(len(df), 100.0)
+    
+    return (weights['travel'] * travel +
+            weights['space'] * space +
+            weights['budget'] * budget_est +
+            (weights['value'] + weights['amenity']) * 100)
+
+
+def hard_filter(hdb_data: pd.DataFrame, user_input: Dict) -> pd.DataFrame:
+    """
+    Rows of hdb_data passing the request's hard filters (HARD FILTERING,
+    spec section 5.2.2), in hdb_data order. The amenity distance limits and
+    the predicted-price budget check come later, during pricing.
+    """
+    target_year = user_input.get('targetYear', FILTER_DEFAULTS['targetYear'])
+    min_budget, max_budget = user_input.get('budget', FILTER_DEFAULTS['budget'])[:2]
     towns = user_input.get('towns', [])
     flat_types = user_input.get('flatTypes', [])
     flat_models = user_input.get('flatModels', [])
-    floor_area_range = user_input.get('floorArea', [0, 200])
-    lease_range = user_input.get('leaseRange', [0, 99])
+    floor_area_range = user_input.get('floorArea', FILTER_DEFAULTS['floorArea'])
+    lease_range = user_input.get('leaseRange', FILTER_DEFAULTS['leaseRange'])
     storey_ranges = user_input.get('storeyRanges', [])
-    max_distances = user_input.get('maxDistances', {})
-    
-    # Start with full dataset
-    df = hdb_data.copy()
-    initial_count = len(df)
-    
-    # ==========================================
-    # HARD FILTERING (from spec section 5.2.2)
-    # ==========================================
+    df = hdb_data
     
     # Filter by budget (using historical prices as reference)
     # Apply price adjustment factor for target year
-    current_year = 2025
-    price_growth_rate = 0.03  # ~3% annual appreciation
-    years_ahead = target_year - current_year
-    price_factor = (1 + price_growth_rate) ** years_ahead
-    
-    adjusted_min = min_budget / price_factor
-    adjusted_max = max_budget / price_factor
-    df = df[(df['resale_price'] >= adjusted_min * 0.8) & (df['resale_price'] <= adjusted_max * 1.2)]
+    low, high = historical_price_band(min_budget, max_budget, target_price_factor(target_year))
+    df = df[(df['resale_price'] >= low) & (df['resale_price'] <= high)]
     
     # Filter by town
     if towns:
@@ -487,22 +849,98 @@ def generate_candidates(
         df = df[df['storey_range'].isin(storey_ranges)]
     
     # Remove rows with missing coordinates
-    df = df.dropna(subset=['latitude', 'longitude'])
+    return df.dropna(subset=['latitude', 'longitude'])
+
+
+def generate_candidate_set(
+    user_input: Dict,
+    calculate_distances_fn: Callable,
+    predict_price_fn: Callable,
+    mappings: Dict,
+    hdb_data: pd.DataFrame = None,
+    deadline: float = None,
+    executor: Executor = None,
+    destinations: List[Dict] = None,
+    predict_batch_fn: Callable = None,
+    progress_fn: Callable = None,
+    distance_batch_fn: Callable = None,
+    batch_rows: int = PREDICT_BATCH_ROWS
+) -> Dict[str, Any]:
+    """
+    Hard-filter real HDB transactions, then price the survivors best-first.
+    
+    Rows are priced in descending priority_scores order, so when the
+    deadline (a time.time() value) is reached the candidates found so far
+    are the most promising ones rather than whatever came first in the
+    DataFrame. Without a deadline every row is priced.
+    
+    Exact mode: when predict_batch_fn(rows, year) is given and hdb_data
+    carries precomputed amenity distance columns, every filtered row is
+    priced in batches of batch_rows (no sampling), with batches spread over
+    the executor.
+    Otherwise rows are priced one at a time through calculate_distances_fn
+    and predict_price_fn after stratified sampling; with an executor, rows
+    are then partitioned by town and priced in parallel (scatter), then
+    concatenated (gather). Ranking happens afterwards over the merged set
+    because the value score is normalized across all candidates.
+    
+    progress_fn(stage, info), if given, is called from the pricing threads:
+    'filtered' with the hard-filter count, then 'priced' with the evaluated
+    count and the candidate frame so far as batches or partitions finish.
+    
+    Without HDB data, candidates come from generate_candidates_synthetic,
+    which uses distance_batch_fn(lats, lons) and predict_batch_fn if given.
+    
+    Returns:
+        Dict with the candidate frame (CANDIDATE_COLUMNS), filtered and
+        evaluated row counts, and sampled / timed_out / exact flags. exact
+        means every row that passed the hard filters was priced.
+    """
+    start_time = time.time()
+    
+    # Load data if not provided
+    if hdb_data is None:
+        hdb_data = load_hdb_data()
+    
+    if hdb_data is None or len(hdb_data) == 0:
+        print("WARNING: No HDB data available, falling back to synthetic")
+        return _candidate_set(
+            generate_candidates_synthetic(user_input, calculate_distances_fn, predict_price_fn, mappings,
+                                          distance_batch_fn, predict_batch_fn)
+        )
+    
+    # Filters build new frames, the shared dataset is never modified
+    initial_count = len(hdb_data)
+    price_factor = target_price_factor(user_input.get('targetYear', FILTER_DEFAULTS['targetYear']))
+    df = hard_filter(hdb_data, user_input)
     
     print(f"Hard filtering: {initial_count} -> {len(df)} candidates")
     
     if len(df) == 0:
-        return []
+        return _candidate_set([])
+    filtered = len(df)
+    stop_at = deadline - DEADLINE_RESERVE_SECONDS if deadline is not None else None
+    if progress_fn is not None:
+        progress_fn('filtered', {'filtered': filtered})
+    
+    if predict_batch_fn is not None and all(column in df.columns for column in DISTANCE_COLUMNS):
+        # Best-first: most promising rows first (stable, so ties keep data order)
+        priority = priority_scores(df, user_input, destinations, price_factor)
+        df = df.iloc[np.argsort(-priority, kind='stable')]
+        
+        candidates, evaluated = _price_batches(df, user_input, predict_batch_fn, stop_at, executor, progress_fn,
+                                               batch_rows)
+        timed_out = evaluated < filtered
+        elapsed = time.time() - start_time
+        print(f"Exact mode: {len(candidates)} candidates from {evaluated}/{filtered} rows "
+              f"(processed in {elapsed:.2f}s{', deadline reached' if timed_out else ''})")
+        return _candidate_set(candidates, filtered, evaluated, False, timed_out)
     
     # ==========================================
     # CALCULATE AMENITY DISTANCES
     # ==========================================
     
-    candidates = []
-    
     # Smart sampling: Ensure town coverage while limiting total candidates
-    MAX_CANDIDATES_TO_PROCESS = 2000  # Limit for performance
-    
     if len(df) > MAX_CANDIDATES_TO_PROCESS:
         # Stratified sampling by town to ensure coverage
         towns_in_df = df['town'].unique()
@@ -518,16 +956,170 @@ def generate_candidates(
         print(f"Stratified sampling: {len(df)} candidates ({samples_per_town} per town)")
     else:
         print(f"Processing {len(df)} candidates...")
+    sampled = len(df) < filtered
+    
+    # Best-first: most promising rows first (stable, so ties keep data order)
+    priority = priority_scores(df, user_input, destinations, price_factor)
+    df = df.iloc[np.argsort(-priority, kind='stable')]
+    
+    if executor is not None and len(df) >= MIN_PARTITION_ROWS and df['town'].nunique() > 1:
+        # Scatter: one partition per town; groupby keeps the priority order within each
+        partitions = [part for _, part in df.groupby('town', sort=True)]
+        futures = [
+            executor.submit(_price_partition, part, user_input, calculate_distances_fn, predict_price_fn, stop_at)
+            for part in partitions
+        ]
+        # Gather in town order so results don't depend on completion order
+        candidates, evaluated = [], 0
+        for future in futures:
+            part_candidates, part_evaluated = future.result()
+            candidates += part_candidates
+            evaluated += part_evaluated
+            if progress_fn is not None:
+                progress_fn('priced', {'evaluated': evaluated, 'candidates': candidate_frame(candidates)})
+        print(f"Scatter-gather: {len(partitions)} town partitions")
+    else:
+        candidates, evaluated = _price_partition(
+            df, user_input, calculate_distances_fn, predict_price_fn, stop_at
+        )
+    
+    for i, c in enumerate(candidates, 1):
+        c['id'] = i
     
-    # Early exit threshold - stop after finding enough good candidates
-    MAX_GOOD_CANDIDATES = 500
+    timed_out = evaluated < len(df)
+    elapsed = time.time() - start_time
+    print(f"After amenity filters: {len(candidates)} candidates from {evaluated}/{len(df)} rows "
+          f"(processed in {elapsed:.2f}s{', deadline reached' if timed_out else ''})")
+    return _candidate_set(candidates, filtered, evaluated, sampled, timed_out)
+
+
+def _price_batches(
+    df: pd.DataFrame,
+    user_input: Dict,
+    predict_batch_fn: Callable,
+    stop_at: Optional[float],
+    executor: Executor = None,
+    progress_fn: Callable = None,
+    batch_rows: int = PREDICT_BATCH_ROWS
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Exact mode pricing: apply the distance filters on the precomputed
+    columns, then price the remaining rows in batches of batch_rows
+    until stop_at. Batches run on the executor when one is given, and
+    progress_fn gets the candidates so far after each one.
+    
+    Returns:
+        (candidate frame, number of rows evaluated)
+    """
+    target_year = user_input.get('targetYear', 2026)
+    budget = user_input.get('budget', [0, float('inf')])
+    min_budget, max_budget = budget[0], budget[1]
+    max_distances = user_input.get('maxDistances', {})
+    
+    # Strict amenity filters are column comparisons here
+    keep = np.ones(len(df), dtype=bool)
+    for column, short in DISTANCE_COLUMNS.items():
+        if short and max_distances.get(short):
+            keep &= df[column].fillna(999).to_numpy() <= max_distances[short]
+    distance_filtered = int((~keep).sum())
+    df = df[keep]
+    
+    batches = [df.iloc[i:i + batch_rows] for i in range(0, len(df), batch_rows)]
+    
+    def price(batch):
+        if stop_at is not None and time.time() > stop_at:
+            return None
+        return predict_batch_fn(batch, target_year)
+    
+    # Both maps yield results in batch order; batches past stop_at come back as None
+    if executor is not None and len(batches) > 1:
+        results = executor.map(price, batches)
+    else:
+        results = map(price, batches)
+    
+    frames = []
+    evaluated = distance_filtered
+    for batch, predicted in zip(batches, results):
+        if predicted is None:
+            continue
+        frames.append(_priced_frame(batch, predicted, min_budget, max_budget))
+        evaluated += len(batch)
+        if progress_fn is not None:
+            progress_fn('priced', {'evaluated': evaluated, 'candidates': _concat_frames(frames)})
+    
+    return _concat_frames(frames), evaluated
+
+
+def _priced_frame(rows: pd.DataFrame, predicted: np.ndarray, min_budget: float, max_budget: float) -> pd.DataFrame:
+    """Candidate frame for one priced batch, after the final budget check (ids assigned on concat)."""
+    # NaN = unknown town / flat type. The budget is checked on the rounded
+    # price that is stored, so refine_candidate_set re-applies it exactly
+    predicted = np.round(predicted, 0)
+    ok = np.isfinite(predicted) & (predicted >= min_budget) & (predicted <= max_budget)
+    rows, predicted = rows[ok], predicted[ok]
+    return pd.DataFrame(index=rows.index, data={
+        'id': 0,
+        'town': rows['town'].to_numpy(),
+        'flat_type': rows['flat_type'].to_numpy(),
+        'flat_model': rows['flat_model'].fillna('Unknown').to_numpy(),
+        'block': rows['block'].fillna('').to_numpy() if 'block' in rows else '',
+        'street_name': rows['street_name'].fillna('').to_numpy() if 'street_name' in rows else '',
+        'floor_area_sqm': rows['floor_area_sqm'].astype(float).to_numpy(),
+        'storey_range': rows['storey_range'].to_numpy(),
+        'lease_commence_year': rows['lease_commence_year'].fillna(1990).astype(int).to_numpy(),
+        'remaining_lease': rows['remaining_lease_years'].fillna(60).astype(float).to_numpy(),
+        'latitude': rows['latitude'].astype(float).to_numpy(),
+        'longitude': rows['longitude'].astype(float).to_numpy(),
+        'historical_price': rows['resale_price'].astype(float).to_numpy(),
+        'predicted_price': predicted,
+        **{column: rows[column].to_numpy(float) for column in DISTANCE_COLUMNS}
+    }, columns=CANDIDATE_COLUMNS)
+
+
+def _concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Merge batch frames into one candidate frame with sequential ids, in
+    hdb_data row order rather than pricing order. A candidate set (its ids,
+    and so the tie order of equal scores) then depends only on the filters,
+    not on the destinations that set the pricing order or on whether it was
+    refined from a cached superset.
+    """
+    if not frames:
+        return candidate_frame([])
+    frame = pd.concat(frames).sort_index(kind='stable').reset_index(drop=True)
+    frame['id'] = np.arange(1, len(frame) + 1)
+    return frame
+
+
+def _price_partition(
+    df: pd.DataFrame,
+    user_input: Dict,
+    calculate_distances_fn: Callable,
+    predict_price_fn: Callable,
+    stop_at: Optional[float]
+) -> Tuple[List[Dict], int]:
+    """
+    Calculate amenity distances, apply distance filters and predict prices
+    for one partition of filtered rows, in order, until stop_at. Runs on
+    executor threads.
+    
+    Returns:
+        (candidates, number of rows evaluated)
+    """
+    target_year = user_input.get('targetYear', 2026)
+    budget = user_input.get('budget', [0, float('inf')])
+    min_budget, max_budget = budget[0], budget[1]
+    max_distances = user_input.get('maxDistances', {})
+    
+    candidates = []
+    evaluated = 0
     
     for idx, row in df.iterrows():
-        # Check timeout
-        if time.time() - start_time > timeout_seconds:
-            print(f"Timeout reached ({timeout_seconds}s), returning {len(candidates)} candidates")
+        # Stop at the deadline; rows left are the least promising ones
+        if stop_at is not None and time.time() > stop_at:
             break
-        
+        evaluated += 1
+
         lat, lon = row['latitude'], row['longitude']
         
         # Calculate distances to amenities (returns long keys)
@@ -582,7 +1174,6 @@ def generate_candidates(
             continue
         
         candidates.append({
-            'id': len(candidates) + 1,
             'town': row['town'],
             'flat_type': row['flat_type'],
             'flat_model': row.get('flat_model', 'Unknown'),
@@ -598,169 +1189,182 @@ def generate_candidates(
             'predicted_price': round(predicted_price, 0),
             'distances': distances
         })
-        
-        # Early exit if we have enough good candidates
-        if len(candidates) >= MAX_GOOD_CANDIDATES:
-            print(f"Early exit: Found {MAX_GOOD_CANDIDATES} candidates")
-            break
     
-    elapsed = time.time() - start_time
-    print(f"After amenity filters: {len(candidates)} candidates (processed in {elapsed:.2f}s)")
-    return candidates
+    return candidates, evaluated
+
+
+
+
+# Synthetic fallback: flats per town at most, random flats per combination,
+# and amenity distance ranges (km) used when distances can't be computed
+SYNTHETIC_PER_TOWN = 20
+SYNTHETIC_VARIATIONS = 2
+SYNTHETIC_DISTANCE_RANGES = {
+    'distance_to_nearest_mrt_km': (0.2, 1.5),
+    'distance_to_nearest_primary_school_km': (0.2, 0.8),
+    'distance_to_nearest_mall_km': (0.3, 2.0),
+    'distance_to_nearest_hawker_km': (0.2, 1.0),
+    'distance_to_cbd_km': (5, 20),
+    'distance_to_nearest_high_value_school_km': (0.5, 3.0),
+}
+SYNTHETIC_TYPE_MULTIPLIERS = {'3 ROOM': 0.75, '4 ROOM': 1.0, '5 ROOM': 1.25, 'EXECUTIVE': 1.5}
 
 
 def generate_candidates_synthetic(
     user_input: Dict,
     calculate_distances_fn: Callable,
     predict_price_fn: Callable,
-    mappings: Dict
-) -> List[Dict]:
+    mappings: Dict,
+    distance_batch_fn: Callable = None,
+    predict_batch_fn: Callable = None
+) -> pd.DataFrame:
     """
     Fallback: Generate synthetic candidates if real data unavailable.
-    """
-    candidates = []
     
-    # Get user preferences
-    target_year = user_input.get('targetYear', 2026)
-    budget = user_input.get('budget', [0, float('inf')])
+    Each combination of town, flat type, flat model (first 3) and storey
+    range (first 3) gets SYNTHETIC_VARIATIONS random flats near the town
+    centre. All samples are drawn up front from a Generator seeded with the
+    request's hard filters, so the same filters always give the same flats
+    and the set can be cached like a real one.
+    
+    Distances come from distance_batch_fn(lats, lons) -> {column: array}
+    and prices from predict_batch_fn(rows, year), one call each for the
+    whole grid; without them, calculate_distances_fn and predict_price_fn
+    are called per flat. Flats that can't be priced get a town-average
+    estimate. At most SYNTHETIC_PER_TOWN flats are kept per town.
+    """
+    target_year = user_input.get('targetYear', FILTER_DEFAULTS['targetYear'])
+    budget = user_input.get('budget', FILTER_DEFAULTS['budget'])
     min_budget, max_budget = budget[0], budget[1]
     
-    towns = user_input.get('towns', [])
-    if not towns:
-        towns = list(TOWN_DATA.keys())
-    
-    flat_types = user_input.get('flatTypes', [])
-    if not flat_types:
-        flat_types = ['3 ROOM', '4 ROOM', '5 ROOM']
-    
-    flat_models = user_input.get('flatModels', [])
-    if not flat_models:
-        flat_models = ['Improved', 'Model A', 'New Generation']
-    
-    floor_area_range = user_input.get('floorArea', [70, 120])
-    lease_range = user_input.get('leaseRange', [30, 99])
-    storey_ranges = user_input.get('storeyRanges', [])
-    if not storey_ranges:
-        storey_ranges = ["04 TO 06", "07 TO 09", "10 TO 12", "13 TO 15"]
-    
+    towns = user_input.get('towns', []) or list(TOWN_DATA.keys())
+    flat_types = user_input.get('flatTypes', []) or ['3 ROOM', '4 ROOM', '5 ROOM']
+    flat_models = user_input.get('flatModels', []) or ['Improved', 'Model A', 'New Generation']
+    floor_area_range = user_input.get('floorArea', FILTER_DEFAULTS['floorArea'])
+    lease_range = user_input.get('leaseRange', FILTER_DEFAULTS['leaseRange'])
+    storey_ranges = user_input.get('storeyRanges', []) or ["04 TO 06", "07 TO 09", "10 TO 12", "13 TO 15"]
     max_distances = user_input.get('maxDistances', {})
     
-    # Generate candidate combinations
-    candidate_id = 0
+    # Candidate grid, in the order flats are kept per town
+    grid = [
+        (town, flat_type, flat_model, storey)
+        for town in towns if town in TOWN_DATA
+        for flat_type in flat_types if flat_type in FLAT_TYPE_AREAS
+        # Flat type's area must overlap the requested floor area
+        if FLAT_TYPE_AREAS[flat_type][1] >= floor_area_range[0]
+        and FLAT_TYPE_AREAS[flat_type][0] <= floor_area_range[1]
+        for flat_model in flat_models[:3]
+        for storey in storey_ranges[:3]
+        for _ in range(SYNTHETIC_VARIATIONS)
+    ]
+    if not grid:
+        return candidate_frame([])
+    df = pd.DataFrame(grid, columns=['town', 'flat_type', 'flat_model', 'storey_range'])
+    n = len(df)
+    
+    # Every draw happens before any filtering, so a flat's values depend
+    # only on its grid position
+    rng = np.random.default_rng(int(candidate_fingerprint(user_input)[:16], 16))
+    lat_offset = rng.uniform(-0.01, 0.01, n)
+    lon_offset = rng.uniform(-0.01, 0.01, n)
+    area_draw = rng.random(n)
+    lease_offset = rng.integers(-5, 11, n)
+    floor_offset = rng.integers(0, 3, n)
+    fallback_distances = {column: rng.uniform(low, high, n)
+                          for column, (low, high) in SYNTHETIC_DISTANCE_RANGES.items()}
+    
+    town_info = df['town'].map(TOWN_DATA)
+    df['latitude'] = town_info.map(lambda info: info['lat']).to_numpy() + lat_offset
+    df['longitude'] = town_info.map(lambda info: info['lon']).to_numpy() + lon_offset
+    
+    # Floor area within type bounds and user preference
+    type_areas = df['flat_type'].map(FLAT_TYPE_AREAS)
+    area_low = np.maximum(type_areas.str[0].to_numpy(float), floor_area_range[0])
+    area_high = np.minimum(type_areas.str[1].to_numpy(float), floor_area_range[1])
+    df['floor_area_sqm'] = area_low + area_draw * (area_high - area_low)
+    
+    # Lease commence year based on town average + variation
+    base_lease = town_info.map(lambda info: info.get('avg_lease', 1990)).to_numpy()
+    df['lease_commence_year'] = np.clip(base_lease + lease_offset, 1966, 2020)
+    df['remaining_lease'] = 99 - (target_year - df['lease_commence_year'])
+    df['floor_level'] = df['storey_range'].str.split(' TO ').str[0].astype(int).to_numpy() + floor_offset
+    for column, values in fallback_distances.items():
+        df[column] = values
+    
+    df = df[(df['remaining_lease'] >= lease_range[0]) & (df['remaining_lease'] <= lease_range[1])]
+    if len(df) == 0:
+        return candidate_frame([])
     
-    for town in towns:
-        if town not in TOWN_DATA:
-            continue
-        
-        town_info = TOWN_DATA[town]
-        
-        for flat_type in flat_types:
-            if flat_type not in FLAT_TYPE_AREAS:
-                continue
-            
-            area_min, area_max = FLAT_TYPE_AREAS[flat_type]
-            
-            # Check floor area constraints
-            if area_max < floor_area_range[0] or area_min > floor_area_range[1]:
-                continue
-            
-            for flat_model in flat_models[:3]:  # Limit models per combination
-                for storey in storey_ranges[:3]:  # Limit storey variations
-                    # Generate a few variations per combination
-                    for variation in range(2):
-                        # Randomize within reasonable bounds
-                        lat = town_info['lat'] + random.uniform(-0.01, 0.01)
-                        lon = town_info['lon'] + random.uniform(-0.01, 0.01)
-                        
-                        # Floor area within type bounds and user preference
-                        floor_area = random.uniform(
-                            max(area_min, floor_area_range[0]),
-                            min(area_max, floor_area_range[1])
-                        )
-                        
-                        # Lease commence year based on town average + variation
-                        base_lease = town_info.get('avg_lease', 1990)
-                        lease_year = base_lease + random.randint(-5, 10)
-                        lease_year = max(1966, min(2020, lease_year))
-                        
-                        remaining_lease = 99 - (target_year - lease_year)
-                        
-                        # Check lease constraint
-                        if remaining_lease < lease_range[0] or remaining_lease > lease_range[1]:
-                            continue
-                        
-                        # Floor level from storey range
-                        storey_parts = storey.split(' TO ')
-                        floor_level = int(storey_parts[0]) + random.randint(0, 2)
-                        
-                        # Calculate distances
-                        try:
-                            distances = calculate_distances_fn(lat, lon)
-                        except:
-                            distances = {
-                                'distance_to_nearest_mrt_km': random.uniform(0.2, 1.5),
-                                'distance_to_nearest_primary_school_km': random.uniform(0.2, 0.8),
-                                'distance_to_nearest_mall_km': random.uniform(0.3, 2.0),
-                                'distance_to_nearest_hawker_km': random.uniform(0.2, 1.0),
-                                'distance_to_cbd_km': random.uniform(5, 20),
-                                'distance_to_nearest_high_value_school_km': random.uniform(0.5, 3.0)
-                            }
-                        
-                        # Check max distance constraints
-                        if max_distances.get('mrt') and distances.get('distance_to_nearest_mrt_km', 0) > max_distances['mrt']:
-                            continue
-                        if max_distances.get('school') and distances.get('distance_to_nearest_primary_school_km', 0) > max_distances['school']:
-                            continue
-                        if max_distances.get('mall') and distances.get('distance_to_nearest_mall_km', 0) > max_distances['mall']:
-                            continue
-                        if max_distances.get('hawker') and distances.get('distance_to_nearest_hawker_km', 0) > max_distances['hawker']:
-                            continue
-                        
-                        # Predict price using hybrid model
-                        try:
-                            predicted_price = predict_price_fn(
-                                town=town,
-                                flat_type=flat_type,
-                                flat_model=flat_model,
-                                floor_area_sqm=floor_area,
-                                floor_level=floor_level,
-                                lease_commence_year=lease_year,
-                                year=target_year,
-                                lat=lat, lon=lon,
-                                distances=distances
-                            )
-                        except Exception as e:
-                            # Fallback to estimate
-                            base_price = town_info['avg_price_4rm']
-                            type_mult = {'3 ROOM': 0.75, '4 ROOM': 1.0, '5 ROOM': 1.25, 'EXECUTIVE': 1.5}.get(flat_type, 1.0)
-                            predicted_price = base_price * type_mult * (1.035 ** (target_year - 2024))
-                        
-                        # Check budget
-                        if predicted_price < min_budget or predicted_price > max_budget:
-                            continue
-                        
-                        candidate_id += 1
-                        candidates.append({
-                            'id': candidate_id,
-                            'town': town,
-                            'flat_type': flat_type,
-                            'flat_model': flat_model,
-                            'floor_area_sqm': round(floor_area, 1),
-                            'storey_range': storey,
-                            'floor_level': floor_level,
-                            'lease_commence_year': lease_year,
-                            'remaining_lease': remaining_lease,
-                            'latitude': lat,
-                            'longitude': lon,
-                            'predicted_price': round(predicted_price, 0),
-                            'distances': distances
-                        })
-                        
-                        # Limit candidates per town
-                        if len([c for c in candidates if c['town'] == town]) >= 20:
-                            break
-    
-    return candidates
+    # Amenity distances, replacing the fallback draws
+    try:
+        if distance_batch_fn is not None:
+            distances = distance_batch_fn(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+        else:
+            per_flat = [calculate_distances_fn(lat, lon) for lat, lon in zip(df['latitude'], df['longitude'])]
+            distances = {column: [d[column] for d in per_flat] for column in SYNTHETIC_DISTANCE_RANGES}
+        df = df.assign(**{column: np.asarray(distances[column], dtype=float) for column in SYNTHETIC_DISTANCE_RANGES})
+    except Exception as e:
+        print(f"WARNING: Synthetic distances failed ({e}), using random distances")
+    
+    # Check max distance constraints
+    for column, short in DISTANCE_COLUMNS.items():
+        if short and max_distances.get(short):
+            df = df[~(df[column] > max_distances[short])]
+    if len(df) == 0:
+        return candidate_frame([])
+    
+    # Predict prices using hybrid model
+    predicted = np.full(len(df), np.nan)
+    try:
+        if predict_batch_fn is not None:
+            predicted = np.asarray(predict_batch_fn(df, target_year), dtype=float)
+        else:
+            for i, row in enumerate(df.itertuples(index=False)):
+                try:
+                    predicted[i] = predict_price_fn(
+                        town=row.town,
+                        flat_type=row.flat_type,
+                        flat_model=row.flat_model,
+                        floor_area_sqm=row.floor_area_sqm,
+                        floor_level=row.floor_level,
+                        lease_commence_year=row.lease_commence_year,
+                        year=target_year,
+                        lat=row.latitude, lon=row.longitude,
+                        distances={column: getattr(row, column) for column in SYNTHETIC_DISTANCE_RANGES}
+                    )
+                except Exception:
+                    pass
+    except Exception as e:
+        print(f"WARNING: Synthetic pricing failed ({e}), using town estimates")
+    
+    # Fallback to estimate
+    estimate = (df['town'].map(lambda town: TOWN_DATA[town]['avg_price_4rm']).to_numpy(float)
+                * df['flat_type'].map(SYNTHETIC_TYPE_MULTIPLIERS).fillna(1.0).to_numpy()
+                * (1.035 ** (target_year - 2024)))
+    df['predicted_price'] = np.round(np.where(np.isfinite(predicted), predicted, estimate), 0)
+    
+    # Check budget, then limit candidates per town
+    df = df[(df['predicted_price'] >= min_budget) & (df['predicted_price'] <= max_budget)]
+    df = df[df.groupby('town').cumcount() < SYNTHETIC_PER_TOWN]
+    
+    frame = pd.DataFrame({
+        'id': np.arange(1, len(df) + 1),
+        'town': df['town'].to_numpy(),
+        'flat_type': df['flat_type'].to_numpy(),
+        'flat_model': df['flat_model'].to_numpy(),
+        'block': '',
+        'street_name': '',
+        'floor_area_sqm': df['floor_area_sqm'].round(1).to_numpy(),
+        'storey_range': df['storey_range'].to_numpy(),
+        'lease_commence_year': df['lease_commence_year'].astype(int).to_numpy(),
+        'remaining_lease': df['remaining_lease'].astype(float).to_numpy(),
+        'latitude': df['latitude'].to_numpy(),
+        'longitude': df['longitude'].to_numpy(),
+        'historical_price': np.nan,
+        'predicted_price': df['predicted_price'].to_numpy(),
+        **{column: df[column].to_numpy(float) for column in DISTANCE_COLUMNS}
+    }, columns=CANDIDATE_COLUMNS)
+    return frame
 
 
 # ============================================================================
@@ -774,7 +1378,8 @@ def generate_recommendations(
     mappings: Dict,
     location_data: Dict = None,
     hdb_data: pd.DataFrame = None,
-    top_n: int = 10
+    top_n: int = 10,
+    destinations: List[Dict] = None
 ) -> Dict[str, Any]:
     """
     Generate top-N flat recommendations using REAL HDB data.
@@ -787,12 +1392,14 @@ def generate_recommendations(
         location_data: Schools and POIs data for coordinate lookup
         hdb_data: Real HDB transaction dataset
         top_n: Number of recommendations
+        destinations: Already-parsed destinations (parsed here if omitted)
     
     Returns:
         Dict with total_candidates and recommendations list
     """
     # Parse destinations
-    destinations = parse_destinations(user_input, location_data)
+    if destinations is None:
+        destinations = parse_destinations(user_input, location_data)
     
     # Generate candidates from REAL data
     candidates = generate_candidates(
@@ -803,79 +1410,356 @@ def generate_recommendations(
         hdb_data=hdb_data
     )
     
-    if not candidates:
+    return score_candidates(candidates, destinations, user_input, top_n=top_n)
+
+
+def score_frame(frame: pd.DataFrame, destinations: List[Dict], user_input: Dict) -> Dict[str, np.ndarray]:
+    """
+    Vectorized component and final scores for every candidate, using the
+    same formulas and rounding as the calculate_*_score functions.
+    """
+    budget = user_input.get('budget', [0, 1000000])
+    min_budget, max_budget = budget[0], budget[1]
+    floor_area_range = user_input.get('floorArea', [70, 120])
+    score_weights, amenity_weights, frequency_weights = request_weights(user_input)
+    n = len(frame)
+    
+    price = frame['predicted_price'].to_numpy(float)
+    area = frame['floor_area_sqm'].to_numpy(float)
+    
+    travel = travel_scores(frame['latitude'].to_numpy(float), frame['longitude'].to_numpy(float), destinations,
+                           frequency_weights)
+    
+    # Value: price per sqm relative to the whole candidate set
+    ppsm = price / area
+    if n <= 1 or ppsm.max() == ppsm.min():
+        value = np.full(n, 50.0)
+    else:
+        value = np.round(np.clip(100 * (1 - (ppsm - ppsm.min()) / (ppsm.max() - ppsm.min())), 0, 100), 1)
+    
+    mid, budget_range = (min_budget + max_budget) / 2, max_budget - min_budget
+    if budget_range == 0:
+        budget_score = np.where(price == mid, 100.0, 0.0)
+    else:
+        budget_score = np.round(np.clip(100 - np.abs(price - mid) / budget_range * 100, 0, 100), 1)
+    
+    amenity = amenity_scores(frame, amenity_weights)
+    
+    preferred = (floor_area_range[0] + floor_area_range[1]) / 2
+    if preferred == 0:
+        space = np.full(n, 50.0)
+    else:
+        space = np.round(np.clip(area / preferred * 100, 0, 100), 1)
+    
+    scores = {'travel': travel, 'value': value, 'budget': budget_score, 'amenity': amenity, 'space': space}
+    scores['final'] = final_scores(scores, score_weights)
+    return scores
+
+
+def amenity_scores(frame: pd.DataFrame, weights: Dict[str, float] = None) -> np.ndarray:
+    """Vectorized calculate_amenity_score from the frame's distance columns."""
+    weights = weights or AMENITY_WEIGHTS
+    raw = (weights['mrt'] / (1 + frame['distance_to_nearest_mrt_km'].fillna(1.0).to_numpy(float)) +
+           weights['school'] / (1 + frame['distance_to_nearest_primary_school_km'].fillna(0.5).to_numpy(float)) +
+           weights['mall'] / (1 + frame['distance_to_nearest_mall_km'].fillna(1.0).to_numpy(float)) +
+           weights['hawker'] / (1 + frame['distance_to_nearest_hawker_km'].fillna(0.5).to_numpy(float)))
+    return np.round(np.minimum(100, raw * 100), 1)
+
+
+def final_scores(scores: Dict[str, np.ndarray], weights: Dict[str, float] = None) -> np.ndarray:
+    """Weighted blend of the component scores, as in calculate_final_score."""
+    weights = weights or SCORE_WEIGHTS
+    return np.round(
+        weights['travel'] * scores['travel'] +
+        weights['value'] * scores['value'] +
+        weights['budget'] * scores['budget'] +
+        weights['amenity'] * scores['amenity'] +
+        weights['space'] * scores['space'], 1)
+
+
+def top_n_indices(match_scores: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Positions of the top_n highest scores, best first, ties in original
+    order (same as a stable sort), via a partial sort instead of a full one.
+    """
+    n = len(match_scores)
+    if n > top_n > 0:
+        kth = np.partition(match_scores, n - top_n)[n - top_n]
+        positions = np.flatnonzero(match_scores >= kth)
+    else:
+        positions = np.arange(n)
+    order = np.lexsort((positions, -match_scores[positions]))
+    return positions[order][:max(top_n, 0)]
+
+
+def _records_at(frame: pd.DataFrame, positions: np.ndarray) -> List[Dict]:
+    """
+    frame.iloc[positions].to_dict('records') without building the sub-frame:
+    takes the positions from each column's array, which for a handful of
+    rows is much cheaper than pandas row indexing on a wide frame.
+    """
+    columns = {}
+    for name, series in frame.items():
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = np.asarray(series.cat.categories)[series.cat.codes.to_numpy()[positions]]
+        else:
+            values = series.to_numpy()[positions]
+        columns[name] = values.tolist()
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def _recommendation(row: Dict, scores: Dict[str, float]) -> Dict[str, Any]:
+    """Response dict for one scored candidate."""
+    price = row['predicted_price']
+    
+    def dist(column, default):
+        value = row[column]
+        return default if value is None or np.isnan(value) else value
+    
+    return {
+        'id': int(row['id']),
+        'town': row['town'],
+        'flatType': row['flat_type'],
+        'flatModel': row['flat_model'],
+        'predictedPrice': int(round(price / 1000) * 1000),
+        'priceRange': {
+            'low': int(price * 0.94 / 1000) * 1000,
+            'high': int(price * 1.06 / 1000) * 1000
+        },
+        'floorArea': {
+            'min': int(row['floor_area_sqm'] - 5),
+            'max': int(row['floor_area_sqm'] + 5)
+        },
+        'storeyRange': row['storey_range'],
+        'remainingLease': row['remaining_lease'],
+        'distances': {
+            'mrt': round(dist('distance_to_nearest_mrt_km', 0.5), 1),
+            'school': round(dist('distance_to_nearest_primary_school_km', 0.5), 1),
+            'mall': round(dist('distance_to_nearest_mall_km', 1.0), 1),
+            'hawker': round(dist('distance_to_nearest_hawker_km', 0.5), 1)
+        },
+        'matchScore': int(round(scores['final'])),
+        'scores': scores
+    }
+
+
+# Columns kept in a ranking: what _recommendation needs, plus score_<name> per score
+RANKING_COLUMNS = [
+    'id', 'town', 'flat_type', 'flat_model', 'predicted_price', 'floor_area_sqm',
+    'storey_range', 'remaining_lease', 'latitude', 'longitude', *DISTANCE_COLUMNS
+]
+SCORE_NAMES = ['travel', 'value', 'budget', 'amenity', 'space', 'final']
+
+
+def rank_frame(frame: pd.DataFrame, scores: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Every candidate in rank order (best first, ties in original order, the
+    same order as top_n_indices), with its scores as columns. Repeated
+    strings are stored as categoricals to keep cached rankings small.
+    """
+    match = np.round(scores['final']).astype(int)
+    order = np.argsort(-match, kind='stable')
+    ranked = frame.iloc[order][RANKING_COLUMNS].reset_index(drop=True)
+    for name in SCORE_NAMES:
+        ranked[f'score_{name}'] = scores[name][order]
+    for column in ('town', 'flat_type', 'flat_model', 'storey_range'):
+        ranked[column] = ranked[column].astype('category')
+    return ranked
+
+
+def ranking_page(ranked: pd.DataFrame, offset: int, limit: int) -> List[Dict]:
+    """Response dicts for ranks offset .. offset + limit - 1; cost depends only on limit."""
+    rows = _records_at(ranked, np.arange(offset, min(offset + limit, len(ranked))))
+    return [_recommendation(row, {name: float(row[f'score_{name}']) for name in SCORE_NAMES}) for row in rows]
+
+
+def rerank(ranked: pd.DataFrame, destinations: List[Dict], user_input: Dict, top_n: int = 10) -> Dict[str, Any]:
+    """
+    Top N of a stored ranking under the request's weight overrides.
+    
+    ranked must have been scored with the default weights (rank_frame of a
+    request without overrides). Value, budget and space scores are reused
+    as stored; amenity and travel are recomputed from the stored distance
+    and coordinate columns only when their weights are overridden. What is
+    left is a weighted sum and a partial sort over arrays. Equal match
+    scores keep their default-weight order.
+    
+    With mode='pareto' the top N is replaced by up to top_n skyline flats
+    over the same (possibly recomputed) scores, as in skyline_candidates.
+    """
+    pareto = user_input.get('mode') == 'pareto'
+    if len(ranked) == 0:
         return {
             'total_candidates': 0,
             'recommendations': [],
+            **({'skyline_size': 0} if pareto else {}),
             'message': 'No flats match your criteria. Try relaxing some filters.'
         }
+    score_weights, amenity_weights, frequency_weights = request_weights(user_input)
+    scores = {name: ranked[f'score_{name}'].to_numpy() for name in SCORE_NAMES if name != 'final'}
+    if user_input.get('amenityWeights'):
+        scores['amenity'] = amenity_scores(ranked, amenity_weights)
+    if user_input.get('frequencyWeights'):
+        scores['travel'] = travel_scores(ranked['latitude'].to_numpy(float), ranked['longitude'].to_numpy(float),
+                                         destinations, frequency_weights)
+    scores['final'] = final_scores(scores, score_weights)
+    if pareto:
+        return _skyline_result(ranked, scores, top_n)
+    
+    top = top_n_indices(np.round(scores['final']).astype(int), top_n)
+    rows = _records_at(ranked, top)
+    return {
+        'total_candidates': len(ranked),
+        'recommendations': [
+            _recommendation(row, {name: float(values[i]) for name, values in scores.items()})
+            for row, i in zip(rows, top)
+        ]
+    }
+
+
+def score_candidates(
+    candidates,
+    destinations: List[Dict],
+    user_input: Dict,
+    top_n: int = 10,
+    keep_ranking: bool = False
+) -> Dict[str, Any]:
+    """
+    Score and rank a candidate set against the user's destinations.
+
+    This is the cheap half of the pipeline: candidates are never modified,
+    so one cached candidate set can be re-scored for many destination sets.
+    Scores are computed as arrays over the whole set and only the top N
+    rows are turned into response dicts.
     
-    # Get budget for scoring
-    budget = user_input.get('budget', [0, 1000000])
-    min_budget, max_budget = budget[0], budget[1]
-    floor_area_range = user_input.get('floorArea', [70, 120])
+    Args:
+        candidates: Candidate frame (CANDIDATE_COLUMNS) or list of candidate dicts
+        keep_ranking: Also fully sort the set and return it as 'ranking'
+            (see rank_frame), so later pages can be served with ranking_page
     
-    # Calculate price per sqm for all candidates
-    for c in candidates:
-        c['price_per_sqm'] = c['predicted_price'] / c['floor_area_sqm']
+    Returns:
+        Dict with total_candidates and recommendations list
+    """
+    frame = candidates if isinstance(candidates, pd.DataFrame) else candidate_frame(candidates)
+    if len(frame) == 0:
+        return {
+            'total_candidates': 0,
+            'recommendations': [],
+            'message': 'No flats match your criteria. Try relaxing some filters.'
+        }
     
-    all_ppsm = np.array([c['price_per_sqm'] for c in candidates])
+    scores = score_frame(frame, destinations, user_input)
+    if keep_ranking:
+        ranked = rank_frame(frame, scores)
+        return {
+            'total_candidates': len(frame),
+            'recommendations': ranking_page(ranked, 0, top_n),
+            'ranking': ranked
+        }
+    match = np.round(scores['final']).astype(int)
     
-    # Score each candidate
-    results = []
-    for c in candidates:
-        dist = c['distances']
-        
-        travel = calculate_travel_score(c['latitude'], c['longitude'], destinations)
-        value = calculate_value_score(c['price_per_sqm'], all_ppsm)
-        budget_score = calculate_budget_score(c['predicted_price'], min_budget, max_budget)
-        amenity = calculate_amenity_score(
-            dist.get('distance_to_nearest_mrt_km', 1.0),
-            dist.get('distance_to_nearest_primary_school_km', 0.5),
-            dist.get('distance_to_nearest_mall_km', 1.0),
-            dist.get('distance_to_nearest_hawker_km', 0.5)
-        )
-        space = calculate_space_score(c['floor_area_sqm'], floor_area_range[0], floor_area_range[1])
-        final = calculate_final_score(travel, value, budget_score, amenity, space)
+    # Merge step: partial sort for the global top N
+    top = top_n_indices(match, top_n)
+    rows = _records_at(frame, top)
+    recommendations = [
+        _recommendation(row, {name: float(values[i]) for name, values in scores.items()})
+        for row, i in zip(rows, top)
+    ]
+    
+    return {
+        'total_candidates': len(frame),
+        'recommendations': recommendations
+    }
+
+
+# ============================================================================
+# PARETO (SKYLINE) MODE
+# ============================================================================
+
+SKYLINE_MAX_RESULTS = 50  # Skyline flats returned, cheapest first
+
+
+def skyline_indices(points: np.ndarray, block: int = 16) -> np.ndarray:
+    """
+    Positions of the non-dominated rows of points (n x d, larger is better
+    in every column). A row is dominated if another is at least as good in
+    every column and better in one.
+    
+    Sort-filter skyline: rows are visited in descending order of their
+    normalized coordinate sum, so a row can only be dominated by rows ahead
+    of it. Each round takes the next block of survivors; the ones no earlier
+    row of the block dominates are skyline rows, and every survivor they
+    dominate is dropped in one vectorized pass. Cost is O(n x skyline size)
+    comparisons, with the numpy overhead paid once per block, not per row.
+    """
+    if len(points) == 0:
+        return np.array([], dtype=int)
+    low, high = points.min(axis=0), points.max(axis=0)
+    sums = ((points - low) / np.where(high > low, high - low, 1)).sum(axis=1)
+    order = np.argsort(-sums, kind='stable')
+    rest = points[order]
+    skyline = []
+    while len(order):
+        head = rest[:block]
+        # within_head[i, j]: head row i dominates head row j
+        within_head = ((head[None, :, :] <= head[:, None, :]).all(axis=2)
+                       & (head[None, :, :] < head[:, None, :]).any(axis=2))
+        winners = ~within_head.any(axis=0)
+        best = head[winners]
+        skyline.extend(order[:block][winners])
         
-        price = c['predicted_price']
-        results.append({
-            'id': c['id'],
-            'town': c['town'],
-            'flatType': c['flat_type'],
-            'flatModel': c['flat_model'],
-            'predictedPrice': int(round(price / 1000) * 1000),
-            'priceRange': {
-                'low': int(price * 0.94 / 1000) * 1000,
-                'high': int(price * 1.06 / 1000) * 1000
-            },
-            'floorArea': {
-                'min': int(c['floor_area_sqm'] - 5),
-                'max': int(c['floor_area_sqm'] + 5)
-            },
-            'storeyRange': c['storey_range'],
-            'remainingLease': c['remaining_lease'],
-            'distances': {
-                'mrt': round(dist.get('distance_to_nearest_mrt_km', 0.5), 1),
-                'school': round(dist.get('distance_to_nearest_primary_school_km', 0.5), 1),
-                'mall': round(dist.get('distance_to_nearest_mall_km', 1.0), 1),
-                'hawker': round(dist.get('distance_to_nearest_hawker_km', 0.5), 1)
-            },
-            'matchScore': int(round(final)),
-            'scores': {
-                'travel': travel,
-                'value': value,
-                'budget': budget_score,
-                'amenity': amenity,
-                'space': space,
-                'final': final
-            }
-        })
+        no_worse = np.ones((len(best), len(rest)), dtype=bool)
+        better = np.zeros((len(best), len(rest)), dtype=bool)
+        for column in range(points.shape[1]):
+            values, bound = rest[:, column], best[:, column][:, None]
+            no_worse &= values <= bound
+            better |= values < bound
+        dominated = (no_worse & better).any(axis=0)
+        dominated[:len(head)] = True
+        order, rest = order[~dominated], rest[~dominated]
+    return np.array(skyline)
+
+
+def skyline_candidates(
+    candidates,
+    destinations: List[Dict],
+    user_input: Dict,
+    limit: int = SKYLINE_MAX_RESULTS
+) -> Dict[str, Any]:
+    """
+    Pareto mode: the candidates no other candidate beats on price, travel,
+    amenity and space at once, instead of a top N by weighted score.
     
-    # Sort by score and return top N
-    results.sort(key=lambda x: x['matchScore'], reverse=True)
+    Computed over the whole candidate set. Up to limit skyline flats are
+    returned, cheapest first, so the list reads as a trade-off curve; each
+    still carries its component and final scores.
+    """
+    frame = candidates if isinstance(candidates, pd.DataFrame) else candidate_frame(candidates)
+    if len(frame) == 0:
+        return {
+            'total_candidates': 0,
+            'recommendations': [],
+            'skyline_size': 0,
+            'message': 'No flats match your criteria. Try relaxing some filters.'
+        }
     
+    return _skyline_result(frame, score_frame(frame, destinations, user_input), limit)
+
+
+def _skyline_result(frame: pd.DataFrame, scores: Dict[str, np.ndarray], limit: int) -> Dict[str, Any]:
+    """Skyline of frame on price, travel, amenity and space; up to limit flats, cheapest first."""
+    price = frame['predicted_price'].to_numpy(float)
+    points = np.column_stack([-price, scores['travel'], scores['amenity'], scores['space']])
+    skyline = skyline_indices(points)
+    
+    # Cheapest first, ties in frame order
+    shown = skyline[np.lexsort((skyline, price[skyline]))][:limit]
+    rows = _records_at(frame, shown)
     return {
-        'total_candidates': len(candidates),
-        'recommendations': results[:top_n]
-    }
\ No newline at end of file
+        'total_candidates': len(frame),
+        'recommendations': [
+            _recommendation(row, {name: float(values[i]) for name, values in scores.items()})
+            for row, i in zip(rows, shown)
+        ],
+        'skyline_size': len(skyline)
+    }
@@ -0,0 +1,177 @@
+"""
+HDB Thread Budget
+Central policy for how many threads each layer of the service may use.
+
+Several layers can each spawn threads: the request lanes (/recommend on
+threads or forked processes, /predict on threads), the per-job pricing
+(partition) pool, and the native pools inside XGBoost (OpenMP) and NumPy
+(BLAS). Left alone, each layer sizes
+itself from os.cpu_count(), so under load we ran pool threads x OpenMP
+threads on the same cores. The budget divides the CPUs the container is
+actually allowed to use across the layers, so the product stays close to
+the core count.
+
+CPU count is the smallest of os.cpu_count(), the scheduler affinity mask
+and the cgroup CPU quota (v2 cpu.max or v1 cfs_quota_us). CPU_LIMIT
+overrides the detection; EXECUTION_WORKERS, PARTITION_WORKERS,
+PREDICT_WORKERS and MODEL_THREADS override individual layers.
+"""
+import math
+import os
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+
+# ============================================
+# CPU DETECTION
+# ============================================
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """CPUs allowed by the cgroup quota, or None if unlimited or unknown."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def detect_cpus() -> Dict[str, Any]:
+    """All CPU limits we can see, plus the effective count and where it came from."""
+    limits = {'cpu_count': os.cpu_count() or 1}
+    if hasattr(os, "sched_getaffinity"):
+        limits['affinity'] = len(os.sched_getaffinity(0))
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        # A 1.5 CPU quota still runs fine on 2 threads
+        limits['cgroup_quota'] = max(1, math.ceil(quota))
+
+    override = os.environ.get("CPU_LIMIT")
+    if override:
+        effective, source = max(1, int(override)), 'CPU_LIMIT'
+    else:
+        source = min(limits, key=limits.get)
+        effective = limits[source]
+    return {'effective': effective, 'source': source, **limits}
+
+
+def effective_cpu_count() -> int:
+    return detect_cpus()['effective']
+
+
+# ============================================
+# BUDGET
+# ============================================
+
+@dataclass(frozen=True)
+class ThreadBudget:
+    """Thread counts for each layer, derived from one CPU count."""
+    cpus: int
+    cpu_source: str
+    backend: str
+    recommend_workers: int   # Recommendation pool size (threads or processes)
+    partition_workers: int   # Pricing batch threads per process (1 = serial)
+    predict_workers: int     # /predict lane threads
+    model_threads: int       # XGBoost nthread per predict call
+    blas_threads: int        # OpenMP/BLAS threads outside XGBoost
+    io_workers: int          # General thread pool (reloads, blocking I/O)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return max(1, int(value)) if value else None
+
+
+def plan_thread_budget(backend: str = "thread", cpus: Optional[int] = None) -> ThreadBudget:
+    """
+    Split the CPU budget across the layers.
+
+    Process backend: one worker per CPU, each single-threaded inside.
+    Thread backend: jobs are GIL-bound, so a few threads per CPU keep cores
+    busy while others wait; the partition pool is shared by all jobs in
+    the process and gets one thread per CPU. In both cases XGBoost gets
+    whatever is left per concurrent predict call, which is 1 unless the
+    pools are sized below the CPU count.
+    """
+    if cpus is None:
+        detected = detect_cpus()
+        cpus, source = detected['effective'], detected['source']
+    else:
+        source = 'argument'
+
+    if backend == "process":
+        recommend_workers = _env_int("EXECUTION_WORKERS") or cpus
+        # Processes already cover the cores; extra partition threads only compete
+        partition_workers = _env_int("PARTITION_WORKERS") or max(1, cpus // recommend_workers)
+        concurrent_predicts = recommend_workers * partition_workers
+    else:
+        recommend_workers = _env_int("EXECUTION_WORKERS") or min(32, cpus * 2)
+        partition_workers = _env_int("PARTITION_WORKERS") or cpus
+        # Partition threads are the ones calling predict while a job is running
+        concurrent_predicts = max(recommend_workers, partition_workers)
+
+    # /predict has its own small lane; its jobs are single-row and short
+    predict_workers = _env_int("PREDICT_WORKERS") or max(2, cpus)
+    concurrent_predicts += predict_workers
+
+    model_threads = _env_int("MODEL_THREADS") or max(1, cpus // concurrent_predicts)
+
+    return ThreadBudget(
+        cpus=cpus,
+        cpu_source=source,
+        backend=backend,
+        recommend_workers=recommend_workers,
+        partition_workers=partition_workers,
+        predict_workers=predict_workers,
+        model_threads=model_threads,
+        blas_threads=model_threads,
+        io_workers=min(8, cpus * 2),
+    )
+
+
+# ============================================
+# APPLYING THE BUDGET
+# ============================================
+
+def set_native_thread_env(threads: int):
+    """Default OpenMP/BLAS env vars, for runtimes initialised (or processes spawned) later."""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(threads))
+
+
+def limit_native_threads(threads: int) -> bool:
+    """Cap the OpenMP/BLAS pools already loaded in this process."""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return False
+    threadpool_limits(threads)
+    return True
+
+
+def apply_model_threads(model, threads: int):
+    """Set the XGBoost booster's nthread (and the sklearn wrapper's n_jobs to match)."""
+    if hasattr(model, 'set_params'):
+        model.set_params(n_jobs=threads)
+    if hasattr(model, 'get_booster'):
+        try:
+            model.get_booster().set_param('nthread', threads)
+        except Exception as e:
+            print(f"WARNING: Could not set model nthread: {e}")
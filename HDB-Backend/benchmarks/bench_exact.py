@@ -0,0 +1,106 @@
+"""
+Exact top-N benchmark
+=====================
+Times the exact recommendation path (every filtered flat priced from the
+per-year price tables, array scoring, partial sort) on the dataset the
+API loads, for a few request shapes from wide to narrow, and checks the
+p95 against a latency budget. Candidate and result caches are bypassed.
+Latency figures quoted so far were measured on a synthetic dataset with
+the production row count (254k), not the real resale data; rerun on the
+real file before relying on them.
+--no-price-tables times batched inference per request instead.
+
+Optionally compares against the sampled per-row path, which prices at
+most MAX_CANDIDATES_TO_PROCESS rows one at a time.
+
+Run from HDB-Backend/ (with the full 2015-2025 dataset in app/data/):
+    python -m benchmarks.bench_exact
+    python -m benchmarks.bench_exact --repeats 10 --budget-ms 1500
+    python -m benchmarks.bench_exact --compare-sampled --repeats 1
+    python -m benchmarks.bench_exact --no-price-tables
+"""
+import argparse
+import statistics
+import sys
+import time
+from functools import partial
+
+from app.artifacts import load_artifact_state
+from app.execution import partition_executor
+from app.recommendation import generate_candidate_set, parse_destinations, score_candidates
+from app import main
+
+SCENARIOS = {
+    'all towns, wide filters': {'budget': [200000, 1500000], 'floorArea': [0, 300], 'leaseRange': [0, 99]},
+    'default filters': {'budget': [400000, 700000]},
+    'two towns + work location': {
+        'budget': [350000, 800000], 'towns': ['TAMPINES', 'BEDOK'],
+        'workLocations': [{'location': 'CBD (Raffles Place)', 'frequency': 'Daily (5x per week)'}],
+    },
+    '4 ROOM near MRT': {'budget': [400000, 800000], 'flatTypes': ['4 ROOM'], 'maxDistances': {'mrt': 0.8}},
+}
+
+
+def run_once(state, user_input, exact, workers):
+    destinations = parse_destinations(user_input, state.location_data, state.destination_index)
+    start = time.perf_counter()
+    candidate_set = generate_candidate_set(
+        user_input,
+        partial(main.calculate_all_distances, state=state),
+        partial(main.predict_price_for_recommendation, state=state),
+        state.mappings,
+        hdb_data=state.hdb_data,
+        executor=partition_executor(workers),
+        destinations=destinations,
+        predict_batch_fn=partial(main.candidate_prices, state=state) if exact else None,
+    )
+    result = score_candidates(candidate_set['candidates'], destinations, user_input, top_n=10)
+    return time.perf_counter() - start, candidate_set, result
+
+
+def bench(args):
+    state = load_artifact_state()
+    if state.hdb_data is None:
+        sys.exit("HDB dataset not found - this benchmark needs the real dataset")
+    if not args.no_price_tables:
+        main._build_price_tables(state, None)
+    print(f"Dataset: {len(state.hdb_data)} transactions, partition workers: {args.workers}")
+    print(f"Latency budget: p95 <= {args.budget_ms} ms\n")
+
+    modes = [('exact', True)] + ([('sampled', False)] if args.compare_sampled else [])
+    rows = []
+    over_budget = False
+    for name, user_input in SCENARIOS.items():
+        for mode, exact in modes:
+            run_once(state, user_input, exact, args.workers)  # warm up
+            timings = []
+            for _ in range(args.repeats):
+                elapsed, candidate_set, result = run_once(state, user_input, exact, args.workers)
+                timings.append(elapsed * 1000)
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            if exact and p95 > args.budget_ms:
+                over_budget = True
+            top = result['recommendations'][0]['matchScore'] if result['recommendations'] else None
+            rows.append((name, mode, candidate_set['filtered'], candidate_set['evaluated'],
+                         len(candidate_set['candidates']), top, p50, p95))
+            print(f"  {name:<28} {mode:<8} p50={p50:8.1f} ms  p95={p95:8.1f} ms")
+
+    print()
+    print(f"{'scenario':<28} {'mode':<8} {'filtered':>8} {'priced':>8} {'cands':>7} {'top':>4} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, mode, filtered, evaluated, candidates, top, p50, p95 in rows:
+        print(f"{name:<28} {mode:<8} {filtered:>8} {evaluated:>8} {candidates:>7} {str(top):>4} {p50:>8.1f} {p95:>8.1f}")
+    print()
+    print("FAIL: exact mode over budget" if over_budget else "OK: exact mode within budget")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="p95 latency budget for exact mode")
+    parser.add_argument("--workers", type=int, default=main.PARTITION_WORKERS, help="Partition threads (1 = serial)")
+    parser.add_argument("--no-price-tables", action="store_true", help="Price with batched inference per request")
+    parser.add_argument("--compare-sampled", action="store_true", help="Also time the sampled per-row path")
+    sys.exit(bench(parser.parse_args()))
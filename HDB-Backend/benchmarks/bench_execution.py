@@ -0,0 +1,78 @@
+"""
+Execution backend benchmark
+===========================
+Compares /recommend job throughput on the thread pool and the process pool
+at increasing concurrency. Each job uses a distinct budget so no cache tier
+can serve it, and candidate refinement is disabled so no job is derived
+from an earlier job's (wider) candidate set: every job filters and prices
+from scratch.
+
+Run from HDB-Backend/:
+    python -m benchmarks.bench_execution
+    python -m benchmarks.bench_execution --levels 1 2 4 8 16 --jobs-per-level 16
+    python -m benchmarks.bench_execution --towns BEDOK TAMPINES   # smaller jobs
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.artifacts import load_artifact_state
+from app.execution import ExecutionEngine
+from app.threads import plan_thread_budget
+from app import main
+
+
+async def run_level(engine, state, concurrency, jobs, towns, offset):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        # Distinct budget per job so neither cache tier can answer it
+        user_input = {'budget': [300000 + 1000 * (offset + i), 800000], 'towns': towns}
+        async with semaphore:
+            start = time.perf_counter()
+            await engine.run(main._run_recommendations, state, user_input, [])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(jobs)))
+    elapsed = time.perf_counter() - start
+    return jobs / elapsed, statistics.median(latencies), max(latencies)
+
+
+async def bench(args):
+    # Set before the pools start, so forked workers inherit it
+    main.CANDIDATE_REFINEMENT = False
+    state = load_artifact_state()
+    results = []
+    offset = 0
+    for backend in args.backends:
+        budget = plan_thread_budget(backend)
+        workers = args.workers or budget.recommend_workers
+        engine = ExecutionEngine(backend, workers, budget.model_threads)
+        engine.start(state)
+        await engine.run(main._run_recommendations, state, {'budget': [1, 2], 'towns': args.towns}, [])  # warm up
+        for level in args.levels:
+            jobs = max(level, args.jobs_per_level)
+            throughput, p50, worst = await run_level(engine, state, level, jobs, args.towns, offset)
+            offset += jobs
+            results.append((backend, workers, level, jobs, throughput, p50, worst))
+            print(f"  {backend:<8} workers={workers:<3} concurrency={level:<3} "
+                  f"{throughput:6.2f} jobs/s  p50={p50:6.2f}s  max={worst:6.2f}s")
+        engine.shutdown()
+
+    print()
+    print(f"{'backend':<8} {'workers':>7} {'conc':>5} {'jobs':>5} {'jobs/s':>8} {'p50 s':>7} {'max s':>7}")
+    for backend, workers, level, jobs, throughput, p50, worst in results:
+        print(f"{backend:<8} {workers:>7} {level:>5} {jobs:>5} {throughput:>8.2f} {p50:>7.2f} {worst:>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["thread", "process"])
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--jobs-per-level", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: engine default per backend)")
+    parser.add_argument("--towns", nargs="*", default=[], help="Restrict jobs to these towns")
+    asyncio.run(bench(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Thread budget benchmark
+=======================
+Throughput curve for candidate pricing as the job pool grows, with XGBoost
+pinned to 1 thread (the budget's choice once pools cover the cores) versus
+left at n_jobs=-1 (one OpenMP thread per core inside every predict call).
+Each job prices one town's candidates under a distinct budget through the
+same exact-mode path /recommend uses (batched pricing on the partition
+executor). Price tables are not built, so every batch is a model call.
+
+Run from HDB-Backend/:
+    python -m benchmarks.bench_threads
+    python -m benchmarks.bench_threads --pool-sizes 1 2 4 8 16 32 --model-threads 1 2 -1
+    CPU_LIMIT=4 python -m benchmarks.bench_threads   # simulate a 4-CPU container
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.artifacts import load_artifact_state
+from app.execution import partition_executor
+from app.recommendation import generate_candidate_set
+from app.threads import apply_model_threads, detect_cpus, limit_native_threads, plan_thread_budget
+from app import main
+
+
+def run_level(state, pool_size, jobs, towns, offset):
+    distances_fn = partial(main.calculate_all_distances, state=state)
+    predict_fn = partial(main.predict_price_for_recommendation, state=state)
+    batch_fn = partial(main.candidate_prices, state=state)
+    executor = partition_executor(main.PARTITION_WORKERS)
+    latencies = []
+    priced = []
+
+    def one(i):
+        user_input = {'budget': [300000 + 1000 * (offset + i), 900000], 'towns': [towns[i % len(towns)]]}
+        start = time.perf_counter()
+        candidate_set = generate_candidate_set(user_input, distances_fn, predict_fn, state.mappings,
+                                               hdb_data=state.hdb_data, executor=executor,
+                                               predict_batch_fn=batch_fn)
+        latencies.append(time.perf_counter() - start)
+        priced.append(candidate_set['evaluated'])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        list(pool.map(one, range(jobs)))
+    elapsed = time.perf_counter() - start
+    return jobs / elapsed, sum(priced) / elapsed, statistics.median(latencies)
+
+
+def bench(args):
+    print(f"CPUs: {detect_cpus()}")
+    print(f"Budget (thread backend): {plan_thread_budget('thread').to_dict()}")
+    state = load_artifact_state()
+    results = []
+    offset = 0
+    for model_threads in args.model_threads:
+        apply_model_threads(state.model, model_threads)
+        limit_native_threads(model_threads if model_threads > 0 else detect_cpus()['cpu_count'])
+        main.predict_prices_for_recommendation(state.hdb_data.head(256), 2026, state)  # warm up
+        for pool_size in args.pool_sizes:
+            jobs = max(pool_size, args.jobs_per_level)
+            jobs_s, rows_s, p50 = run_level(state, pool_size, jobs, args.towns, offset)
+            offset += jobs
+            results.append((model_threads, pool_size, jobs, jobs_s, rows_s, p50))
+            print(f"  model_threads={model_threads:<3} pool={pool_size:<3} "
+                  f"{jobs_s:6.2f} jobs/s  {rows_s:8.0f} rows priced/s  p50={p50:6.2f}s")
+
+    print()
+    print(f"{'nthread':>7} {'pool':>5} {'jobs':>5} {'jobs/s':>8} {'rows/s':>9} {'p50 s':>7}")
+    for model_threads, pool_size, jobs, jobs_s, rows_s, p50 in results:
+        print(f"{model_threads:>7} {pool_size:>5} {jobs:>5} {jobs_s:>8.2f} {rows_s:>9.0f} {p50:>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--model-threads", nargs="+", type=int, default=[1, -1],
+                        help="XGBoost nthread values to compare (-1 = all cores)")
+    parser.add_argument("--jobs-per-level", type=int, default=8)
+    parser.add_argument("--towns", nargs="+", default=["BEDOK", "TAMPINES", "WOODLANDS", "JURONG WEST"])
+    bench(parser.parse_args())
@@ -0,0 +1,41 @@
+"""
+Shared fixtures. The tests use a small generated HDB dataset and a
+deterministic pricing function, so they run without the model or the
+resale dataset; model_state loads the model files kept in the repo.
+"""
+import asyncio
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from app import artifacts
+from app.artifacts import ArtifactState
+from tests.data import fake_prices, make_hdb_data
+
+
+@pytest.fixture(scope="session")
+def hdb_data() -> pd.DataFrame:
+    return make_hdb_data()
+
+
+@pytest.fixture(scope="session")
+def model_state() -> ArtifactState:
+    """The real model, trends, mappings and amenities, without the resale dataset."""
+    with mock.patch.object(artifacts, "load_hdb_dataset", return_value=None):
+        return artifacts.load_artifact_state()
+
+
+@pytest.fixture
+def main(hdb_data, monkeypatch):
+    """app.main serving hdb_data with fake_prices as the model, caches empty before and after."""
+    from app import main
+
+    state = ArtifactState(version="test", loaded_at="now", model=None, trend_multipliers={},
+                          model_features=None, mappings={}, amenity_data={}, amenity_trees={},
+                          location_data={}, hdb_data=hdb_data)
+    monkeypatch.setattr(main.artifacts, "_state", state)
+    monkeypatch.setattr(main, "candidate_prices", lambda rows, year, state=None: fake_prices(rows, year))
+    asyncio.run(main.clear_recommendation_cache())
+    yield main
+    asyncio.run(main.clear_recommendation_cache())
@@ -0,0 +1,47 @@
+"""Generated HDB data and a stand-in pricing function for the tests."""
+import numpy as np
+import pandas as pd
+
+from app.recommendation import DISTANCE_COLUMNS, TOWN_DATA
+
+FLAT_TYPES = ['3 ROOM', '4 ROOM', '5 ROOM']
+FLAT_MODELS = ['Model A', 'Model A2', 'Improved', 'New Generation', 'Premium Apartment']
+STOREYS = ['01 TO 03', '04 TO 06', '07 TO 09', '10 TO 12', '13 TO 15']
+
+
+def make_hdb_data(rows: int = 4000, seed: int = 7) -> pd.DataFrame:
+    """hdb_data with the columns the candidate pipeline reads, amenity distances included."""
+    rng = np.random.default_rng(seed)
+    towns = list(TOWN_DATA)
+    town = rng.choice(towns, rows)
+    lease_commence = rng.integers(1970, 2020, rows)
+    data = pd.DataFrame({
+        'town': town,
+        'flat_type': rng.choice(FLAT_TYPES, rows),
+        'flat_model': rng.choice(FLAT_MODELS, rows),
+        'block': rng.integers(1, 900, rows).astype(str),
+        'street_name': 'STREET',
+        'floor_area_sqm': rng.uniform(40, 160, rows).round(1),
+        'storey_range': rng.choice(STOREYS, rows),
+        'lease_commence_year': lease_commence,
+        'remaining_lease_years': (99 - (2025 - lease_commence)).astype(float),
+        'latitude': [TOWN_DATA[t]['lat'] for t in town] + rng.uniform(-0.01, 0.01, rows),
+        'longitude': [TOWN_DATA[t]['lon'] for t in town] + rng.uniform(-0.01, 0.01, rows),
+        'resale_price': rng.integers(200, 1100, rows) * 1000.0,
+    })
+    for column in DISTANCE_COLUMNS:
+        data[column] = rng.uniform(0.05, 3.0, rows)
+    data['floor_level'] = data['storey_range'].str[:2].astype(int)
+    return data
+
+
+# Resolved destinations (as parse_destinations returns them) for scoring tests
+DESTINATIONS = [
+    {'lat': 1.2839, 'lon': 103.8515, 'frequency': 'Daily (5x per week)'},
+    {'lat': 1.3526, 'lon': 103.9447, 'frequency': 'weekly'},
+]
+
+
+def fake_prices(rows: pd.DataFrame, year: int) -> np.ndarray:
+    """Deterministic stand-in for the model: grows the last resale price by area and year."""
+    return rows['resale_price'].to_numpy(float) * (1.02 ** (year - 2024)) + rows['floor_area_sqm'].to_numpy(float) * 100
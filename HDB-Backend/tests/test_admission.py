@@ -0,0 +1,60 @@
+"""Overload must turn into fast 503s with a Retry-After, never a growing queue."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import AdmissionController, Overloaded
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def scenario():
+        controller = AdmissionController("test", max_limit=1, max_queue=1, target_latency=4.0)
+        await controller.acquire()                      # Takes the only slot
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()                  # Queue already holds one
+        assert controller.queued == 1 and controller.rejected == 1
+        # Two jobs ahead of it (the queued one and itself) at 4s each on one slot
+        assert rejected.value.retry_after == 8
+        controller.release(1.0)                         # Hands the slot to the queued job
+        await queued
+        assert controller.in_flight == 1 and controller.queued == 0
+    asyncio.run(scenario())
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        controller = AdmissionController("test", max_limit=1, max_queue=4, queue_timeout=0.05)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.retry_after >= 1
+        assert controller.timed_out == 1 and controller.queued == 0 and controller.in_flight == 1
+    asyncio.run(scenario())
+
+
+def test_slow_jobs_halve_the_limit_and_fast_ones_grow_it():
+    controller = AdmissionController("test", max_limit=8, target_latency=1.0)
+    controller.in_flight = 1
+    controller.release(5.0)
+    assert controller.current_limit == 4
+    for _ in range(20):
+        controller.in_flight = 1
+        controller.release(0.1)
+    assert controller.current_limit > 4
+
+
+def test_recommend_returns_503_with_retry_after(monkeypatch):
+    from app import main
+
+    async def scenario():
+        controller = AdmissionController("recommend", max_limit=1, max_queue=0, target_latency=3.0)
+        monkeypatch.setattr(main, "recommendation_admission", controller)
+        await controller.acquire()
+        with pytest.raises(HTTPException) as rejected:
+            await main._compute_recommendations(None, {}, [], None, "busy-key")
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers == {"Retry-After": "3"}
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from app import artifacts
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,2\n")
+    monkeypatch.setattr(artifacts, "_watched_files", lambda: [path])
+    return path
+
+
+def test_version_changes_on_same_size_edit(data_file):
+    before = artifacts.compute_artifact_version()
+    stat = data_file.stat()
+    data_file.write_text("a,b\n3,4\n")
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert data_file.stat().st_size == stat.st_size
+    assert artifacts.compute_artifact_version() != before
+
+
+def test_failed_reload_is_not_retried_until_files_change(data_file, monkeypatch):
+    manager = artifacts.ArtifactManager()
+    manager._state = SimpleNamespace(version="old", loaded_at=None, hdb_data=None)
+
+    def broken():
+        raise ValueError("bad artifacts")
+
+    monkeypatch.setattr(artifacts, "load_artifact_state", broken)
+    result = manager.reload()
+    assert result['success'] is False and result['version'] == "old"
+    assert manager._failed_fingerprint == artifacts.artifact_fingerprint()
+    assert manager.info()['waiting_for_fixed_artifacts']
+
+
+def test_new_state_is_prepared_before_validation(data_file, monkeypatch):
+    calls = []
+    manager = artifacts.ArtifactManager(validate_fn=lambda state: calls.append(("validate", state.version)),
+                                        prepare_fn=lambda state: calls.append(("prepare", state.version)))
+    manager.on_swap(lambda new, old: calls.append(("swap", new.version)))
+    monkeypatch.setattr(artifacts, "load_artifact_state",
+                        lambda: SimpleNamespace(version="v2", loaded_at=None, hdb_data=None))
+    assert manager.reload()['swapped']
+    assert calls == [("prepare", "v2"), ("validate", "v2"), ("swap", "v2")]
+
+
+def test_reload_without_dataset_is_rejected_when_active_has_one(monkeypatch):
+    from app import main
+
+    candidate = SimpleNamespace(version="v2", hdb_data=None)
+    monkeypatch.setattr(main.artifacts, "_state", SimpleNamespace(version="v1", hdb_data=pd.DataFrame({'a': [1]})))
+    with pytest.raises(ValueError, match="HDB dataset"):
+        main.validate_artifact_state(candidate)
+
+
+@pytest.mark.parametrize("token,host,sent,allowed", [
+    (None, "127.0.0.1", None, True),
+    (None, "10.0.0.5", None, False),
+    ("secret", "10.0.0.5", "secret", True),
+    ("secret", "127.0.0.1", None, False),
+])
+def test_admin_access(monkeypatch, token, host, sent, allowed):
+    from fastapi import HTTPException
+    from app import main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", token)
+    request = SimpleNamespace(client=SimpleNamespace(host=host))
+    if allowed:
+        main._check_admin_token(request, sent)
+    else:
+        with pytest.raises(HTTPException) as error:
+            main._check_admin_token(request, sent)
+        assert error.value.status_code == 403
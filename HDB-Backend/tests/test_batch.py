@@ -0,0 +1,50 @@
+"""/recommend/batch prices each hard-filter group once and answers every profile like /recommend."""
+import asyncio
+
+import httpx
+
+WIDE = {'budget': [300000, 900000]}
+NARROW = {'budget': [400000, 600000]}
+PROFILES = [WIDE, {**WIDE, 'weights': {'space': 1.0}}, NARROW, WIDE]
+
+
+def post(main, path, body):
+    async def send():
+        async with httpx.AsyncClient(app=main.app, base_url="http://t") as client:
+            response = await client.post(path, json=body)
+            assert response.status_code == 200
+            return response.json()
+    return asyncio.run(send())
+
+
+def test_batch_groups_profiles_by_hard_filters(main):
+    batch = post(main, "/recommend/batch", {'profiles': PROFILES})
+    assert batch['candidate_sets'] == 2 and batch['cache_hits'] == 0
+    results = batch['results']
+    assert len(results) == len(PROFILES) and all(r['success'] for r in results)
+    assert results[0] == results[3]
+    assert results[0]['recommendations'] != results[1]['recommendations']
+
+    # Every profile matches /recommend, which is now served from the cache the batch filled
+    assert len(main._candidate_cache) == 2
+    for profile, result in zip(PROFILES, results):
+        assert post(main, "/recommend", profile) == result
+    assert len(main._candidate_cache) == 2
+
+    again = post(main, "/recommend/batch", {'profiles': PROFILES})
+    assert (again['candidate_sets'], again['cache_hits']) == (0, 4)
+    assert again['results'] == results
+
+
+def test_failed_group_only_fails_its_profiles(main, monkeypatch):
+    run_group = main._run_recommendation_group
+
+    def failing(state, members, deadline):
+        if members[0][0]['budget'] == NARROW['budget']:
+            raise RuntimeError("pricing failed")
+        return run_group(state, members, deadline)
+    monkeypatch.setattr(main, "_run_recommendation_group", failing)
+
+    results = post(main, "/recommend/batch", {'profiles': PROFILES})['results']
+    assert [r['success'] for r in results] == [True, True, False, True]
+    assert "pricing failed" in results[2]['error']
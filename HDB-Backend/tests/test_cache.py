@@ -0,0 +1,156 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.cache import SQLiteCache, SingleFlight, TieredCache, create_cache
+
+
+def test_sqlite_totals_follow_inserts_updates_and_evictions(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.db", "t", max_entries=3, max_bytes=10 ** 6, ttl_seconds=None)
+    for i in range(5):
+        cache.set(f"k{i}", "x" * (i + 1))
+    cache.set("k4", "y" * 50)
+    conn = cache._conn()
+    count, total = conn.execute(f"SELECT COUNT(*), SUM(size) FROM {cache.table}").fetchone()
+    assert len(cache) == count == 3
+    assert cache.stats()['memory_bytes'] == total
+    assert cache.evictions == 2
+    assert cache.get("k0") is None and cache.get("k4") == "y" * 50
+
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()['memory_bytes'] == 0
+
+
+def test_sqlite_errors_are_counted_not_raised(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.db", "t")
+    cache.set("k", 1)
+
+    class Broken:
+        def execute(self, *args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+
+        in_transaction = False
+
+    cache._local.conn = Broken()
+    cache.set("k", 2)
+    assert cache.get("k", "default") == "default"
+    assert cache.recent(5) == []
+    assert cache.pop("k", "default") == "default"
+    assert cache.invalidate(lambda key: True) == 0
+    assert cache.clear() == 0
+    assert cache.keys() == [] and "k" not in cache and len(cache) == 0
+    assert cache.stats()['entries'] is None
+    assert cache.errors == 11
+
+
+def test_sqlite_cache_keeps_hot_entries_in_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_PATH", str(tmp_path / "cache.db"))
+    cache = create_cache("t", 10, 10 ** 6, 60, backend="sqlite", local_entries=2)
+    assert isinstance(cache, TieredCache)
+    cache.set("k", [1, 2, 3])
+    loads = cache.l2.hits
+    for _ in range(3):
+        assert cache.get("k") == [1, 2, 3]
+    assert cache.l2.hits == loads  # Served from the local copy
+    # Another worker's write goes to the shared table only
+    create_cache("t", 10, 10 ** 6, 60, backend="sqlite").set("other", "x")
+    assert cache.get("other") == "x"
+    assert create_cache("t", 10, 10 ** 6, 60, backend="local", local_entries=2).stats()['backend'] == 'local'
+
+
+def test_single_flight_runs_concurrent_callers_once():
+    async def scenario():
+        flights, calls, release = SingleFlight(), [], asyncio.Event()
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return {"value": 42}
+
+        callers = [asyncio.ensure_future(flights.do("k", compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.stats()['in_flight'] == 1
+        release.set()
+        results = await asyncio.gather(*callers)
+        assert len(calls) == 1 and all(r is results[0] for r in results)
+        assert flights.stats() == {'in_flight': 0, 'computations': 1, 'coalesced': 4, 'coalesced_ratio': 0.8}
+        # Finished flights are forgotten, so the next caller computes again
+        await flights.do("k", compute)
+        assert len(calls) == 2
+    asyncio.run(scenario())
+
+
+def test_single_flight_errors_reach_every_caller():
+    async def scenario():
+        flights, release = SingleFlight(), asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            raise ValueError("model failed")
+
+        callers = [asyncio.ensure_future(flights.do("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(r, ValueError) and str(r) == "model failed" for r in results)
+        assert flights.stats()['in_flight'] == 0
+    asyncio.run(scenario())
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def scenario():
+        flights, release = SingleFlight(), asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.ensure_future(flights.do("k", compute))
+        follower = asyncio.ensure_future(flights.do("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+        assert await follower == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISK_CACHE_DIR", str(tmp_path))
+    return lambda: create_cache("t", 3, 10 ** 6, 60, backend="local", persistent=True)
+
+
+def test_tiered_cache_promotes_l2_hits(disk_cache):
+    writer = disk_cache()
+    assert isinstance(writer, TieredCache)
+    writer.set("v1:k", {"rows": 3})
+    # A fresh process starts with an empty L1 over the same disk L2
+    reader = disk_cache()
+    assert "v1:k" not in reader.l1
+    assert reader.get("v1:k") == {"rows": 3}
+    assert reader.l1.get("v1:k") == {"rows": 3}
+    assert reader.l2.hits == 1
+    assert reader.get("v1:k") == {"rows": 3} and reader.l2.hits == 1
+    assert reader.get("v1:missing", "default") == "default"
+
+    assert reader.invalidate(lambda key: not key.startswith("v2:")) == 1
+    assert "v1:k" not in reader and disk_cache().get("v1:k") is None
+
+
+def test_tiered_cache_warms_most_recent_entries(disk_cache):
+    writer = disk_cache()
+    for i in range(5):
+        writer.set(f"k{i}", i)
+    # Recency order on disk: k1 newest, then k4, k3 ...
+    conn = writer.l2._conn()
+    for i, key in enumerate(["k0", "k2", "k3", "k4", "k1"]):
+        conn.execute(f"UPDATE {writer.l2.table} SET last_access = ? WHERE key = ?", (1000.0 + i, key))
+
+    reader = disk_cache()
+    assert reader.warm() == 3  # L1 capacity
+    # Loaded oldest first, so the newest entry is at the L1's most-recent end
+    assert reader.l1.keys() == ["k3", "k4", "k1"]
+    assert reader.get("k4") == 4 and reader.l2.hits == 0
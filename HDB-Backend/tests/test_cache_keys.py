@@ -0,0 +1,59 @@
+"""Requests that must return the same results share a cache key; others never do."""
+import pytest
+
+from app.recommendation import FILTER_DEFAULTS, candidate_fingerprint, request_fingerprint
+
+CBD = {'lat': 1.2839, 'lon': 103.8515, 'frequency': 'Daily (5x per week)'}
+TAMPINES = {'lat': 1.3526, 'lon': 103.9447, 'frequency': 'weekly'}
+
+BASE = {
+    'targetYear': 2026, 'budget': [400000, 700000], 'towns': ['BEDOK', 'TAMPINES'],
+    'flatTypes': ['4 ROOM'], 'flatModels': ['Model A'], 'floorArea': [70, 120],
+    'storeyRanges': ['04 TO 06'], 'leaseRange': [30, 65], 'maxDistances': {'mrt': 1.0},
+}
+
+
+@pytest.mark.parametrize("variant", [
+    {'towns': ['tampines ', 'Bedok', 'BEDOK']},
+    {'flatTypes': ['4 room'], 'flatModels': ['MODEL A', 'model a']},
+    {'budget': [400000.0, 700000.0], 'floorArea': [70.0, 120.0]},
+    {'maxDistances': {'mrt': 1.0, 'school': None, 'mall': 0}},
+])
+def test_equivalent_filters_share_keys(variant):
+    user_input = {**BASE, **variant}
+    assert candidate_fingerprint(user_input) == candidate_fingerprint(BASE)
+    assert request_fingerprint(user_input, [CBD]) == request_fingerprint(BASE, [CBD])
+
+
+@pytest.mark.parametrize("variant", [
+    {'towns': ['BEDOK']},
+    {'budget': [400000, 700001]},
+    {'targetYear': 2027},
+    {'maxDistances': {'mrt': 1.1}},
+    {'storeyRanges': []},
+])
+def test_different_filters_get_different_keys(variant):
+    assert candidate_fingerprint({**BASE, **variant}) != candidate_fingerprint(BASE)
+
+
+def test_omitted_filters_key_as_their_defaults():
+    omitted = {'budget': [400000, 700000]}
+    assert candidate_fingerprint(omitted) == candidate_fingerprint({**omitted, **{
+        name: value for name, value in FILTER_DEFAULTS.items() if name != 'budget'
+    }})
+    assert candidate_fingerprint(omitted) != candidate_fingerprint({**omitted, 'floorArea': [70, 120]})
+
+
+def test_destination_order_and_names_do_not_matter():
+    named = [{**CBD, 'name': 'Office'}, {**TAMPINES, 'name': 'Parents'}]
+    assert request_fingerprint(BASE, named) == request_fingerprint(BASE, [TAMPINES, CBD])
+    assert request_fingerprint(BASE, [CBD]) != request_fingerprint(BASE, [TAMPINES])
+
+
+def test_scoring_inputs_change_the_request_key_only():
+    for variant in ({'scoreWeights': {'space': 0.5}}, {'mode': 'pareto'}, {'trajectory': True}):
+        assert candidate_fingerprint({**BASE, **variant}) == candidate_fingerprint(BASE)
+        assert request_fingerprint({**BASE, **variant}, [CBD]) != request_fingerprint(BASE, [CBD])
+    # Explicit defaults are the same request as none at all
+    assert request_fingerprint({**BASE, 'mode': 'ranked', 'scoreWeights': None}, [CBD]) == \
+        request_fingerprint(BASE, [CBD])
@@ -0,0 +1,56 @@
+"""A deadline cuts pricing short after the most promising rows, and cut-off sets are never cached."""
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app import recommendation
+from app.recommendation import DEADLINE_RESERVE_SECONDS, generate_candidate_set, hard_filter, priority_scores
+from tests.data import DESTINATIONS, fake_prices
+
+FILTERS = {'budget': [300000, 900000], 'floorArea': [80, 110]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time.time() for the pipeline: each priced batch takes one second."""
+    now = [1000.0]
+    monkeypatch.setattr(recommendation, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_without_deadline_every_row_is_priced(hdb_data):
+    result = generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, predict_batch_fn=fake_prices,
+                                    destinations=DESTINATIONS, batch_rows=50)
+    assert result['exact'] and not result['timed_out']
+    assert result['evaluated'] == result['filtered'] > 200
+
+
+def test_deadline_prices_the_highest_priority_rows_first(hdb_data, clock):
+    priced = []
+
+    def prices(rows, year):
+        priced.extend(rows.index)
+        clock[0] += 1
+        return fake_prices(rows, year)
+
+    # Batches start at t = 1000, 1001, 1002 and 1003; the fifth is past the deadline
+    deadline = 1003.5 + DEADLINE_RESERVE_SECONDS
+    result = generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, predict_batch_fn=prices,
+                                    destinations=DESTINATIONS, deadline=deadline, batch_rows=50)
+    assert result['timed_out'] and not result['exact']
+    assert result['evaluated'] == len(priced) == 200 < result['filtered']
+
+    rows = hard_filter(hdb_data, FILTERS)
+    priority = priority_scores(rows, FILTERS, DESTINATIONS, recommendation.target_price_factor(2026))
+    assert priced == list(rows.index[np.argsort(-priority, kind='stable')][:200])
+
+
+def test_cut_off_sets_are_not_cached(main):
+    state = main.artifacts.current()
+    result = main._run_recommendations(state, FILTERS, DESTINATIONS, time.time() - 1)
+    assert result['timed_out'] and not result['exact'] and result['evaluated'] == 0
+    assert len(main._candidate_cache) == 0
+    assert not main._run_recommendations(state, FILTERS, DESTINATIONS)['timed_out']
+    assert len(main._candidate_cache) == 1
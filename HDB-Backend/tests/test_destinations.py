@@ -0,0 +1,62 @@
+"""DestinationIndex must resolve town names with the original substring rule."""
+import pytest
+
+from app.recommendation import TOWN_DATA, DestinationIndex, parse_destinations
+
+
+def centre(town):
+    return TOWN_DATA[town]['lat'], TOWN_DATA[town]['lon']
+
+
+def substring_match(location, partial):
+    """The per-request scan parse_destinations used before the index."""
+    for town in TOWN_DATA:
+        if town.lower() in location.lower() or (partial and location.lower() in town.lower()):
+            return centre(town)
+    return None
+
+
+@pytest.fixture(scope="module")
+def index():
+    return DestinationIndex({})
+
+
+@pytest.mark.parametrize("location,town", [
+    # Exact names and names inside an address
+    ("ANG MO KIO", "ANG MO KIO"),
+    ("kallang/whampoa", "KALLANG/WHAMPOA"),
+    ("Blk 123 Ang Mo Kio Ave 3", "ANG MO KIO"),
+    # Partial tokens (parents' homes only)
+    ("Ang Mo K", "ANG MO KIO"),
+    ("Jurong", "JURONG EAST"),
+    ("whampoa", "KALLANG/WHAMPOA"),
+    # Matched by the substring rule even though they split or extend a token
+    ("o kio", "ANG MO KIO"),
+    ("Bedokville", "BEDOK"),
+    ("ngkang", "SENGKANG"),
+])
+def test_town_lookup(index, location, town):
+    assert index.town_coords(location, partial=True) == centre(town)
+
+
+def test_only_parents_homes_match_part_of_a_name(index):
+    assert index.town_coords("Ang Mo K") is None
+    assert index.town_coords("Bedokville") == centre("BEDOK")
+    assert index.town_coords("Atlantis", partial=True) is None
+
+
+@pytest.mark.parametrize("location", [
+    "o kio", "Bedokville", "Jurong", "JURONG WEST ST 91", "ser", "Toa Payoh Lor 1",
+    "an", "Punggol Field", "MARINE", "Somewhere else", "Tampines/Bedok",
+])
+@pytest.mark.parametrize("partial", [True, False])
+def test_index_agrees_with_substring_scan(index, location, partial):
+    assert index.town_coords(location, partial) == substring_match(location, partial)
+
+
+def test_parse_destinations_resolves_parents_homes(index):
+    user_input = {'parentsHomes': [{'parent': 'Mum', 'location': 'o kio'},
+                                   {'parent': 'Dad', 'location': 'Atlantis'}]}
+    destinations = parse_destinations(user_input, index=index)
+    assert [(d['name'], d['lat'], d['lon']) for d in destinations] == \
+        [("Parents (Mum)", *centre("ANG MO KIO"))]
@@ -0,0 +1,67 @@
+"""A full lane rejects new jobs without blocking other lanes."""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.execution import ExecutionEngine, LaneFull
+
+STATE = SimpleNamespace(version="test")  # Thread lanes pass the state through untouched
+
+
+def blocked_job(release: threading.Event):
+    def job(state, value):
+        release.wait(5)
+        return value
+    return job
+
+
+@pytest.fixture
+def lanes():
+    engines = {
+        'recommend': ExecutionEngine("thread", max_workers=1, name="recommend", max_queue=1),
+        'predict': ExecutionEngine("thread", max_workers=1, name="predict", max_queue=0),
+    }
+    yield engines
+    for engine in engines.values():
+        engine.shutdown()
+
+
+def test_full_lane_rejects_and_other_lanes_keep_running(lanes):
+    recommend, predict = lanes['recommend'], lanes['predict']
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(recommend.run(blocked_job(release), STATE, i)) for i in range(2)]
+        await asyncio.sleep(0.05)
+        assert (recommend.stats()['running'], recommend.stats()['queued']) == (1, 1)
+        with pytest.raises(LaneFull):
+            await recommend.run(blocked_job(release), STATE, 2)
+        # /predict has its own workers, so it answers while /recommend is saturated
+        assert await asyncio.wait_for(predict.run(lambda state, x: x * 2, STATE, 21), 1) == 42
+        release.set()
+        assert await asyncio.gather(*running) == [0, 1]
+
+    asyncio.run(scenario())
+    assert recommend.stats()['rejected'] == 1 and recommend.stats()['completed'] == 2
+    assert recommend.stats()['max_queued_seen'] == 1 and recommend.stats()['in_flight'] == 0
+
+
+def test_full_lane_is_a_503_with_retry_after(lanes):
+    from app import main
+
+    predict, release = lanes['predict'], threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(predict.run(blocked_job(release), STATE, 0))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as rejected:
+            await main._run_in_lane(predict, lambda state: None, STATE)
+        release.set()
+        await running
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503 and int(rejected.headers["Retry-After"]) >= 1
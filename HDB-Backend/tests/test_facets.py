@@ -0,0 +1,84 @@
+"""Facet counts and relaxations must agree with the /recommend hard filters."""
+import pandas as pd
+import pytest
+
+from app.facets import FacetIndex
+from app.recommendation import generate_candidate_set
+from tests.data import FLAT_MODELS, fake_prices
+
+BASE = {'budget': [300000, 900000]}
+
+
+@pytest.fixture(scope="module")
+def index(hdb_data):
+    return FacetIndex(hdb_data)
+
+
+@pytest.fixture(scope="module")
+def priced_index(hdb_data):
+    return FacetIndex(hdb_data, {2026: pd.Series(fake_prices(hdb_data, 2026), index=hdb_data.index)})
+
+
+def candidate_set(user_input, hdb_data):
+    return generate_candidate_set(user_input, None, None, {}, hdb_data=hdb_data, predict_batch_fn=fake_prices)
+
+
+def filtered(user_input, hdb_data):
+    return candidate_set(user_input, hdb_data)['filtered']
+
+
+FILTERS = [
+    BASE,
+    {**BASE, 'towns': ['BEDOK', 'TAMPINES'], 'flatTypes': ['4 ROOM', '5 ROOM']},
+    {**BASE, 'flatModels': ['model a'], 'floorArea': [70, 120], 'leaseRange': [40, 80]},
+    {**BASE, 'storeyRanges': ['04 TO 06'], 'maxDistances': {'mrt': 1.0, 'mall': 1.5}},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS[:3])
+def test_total_without_price_tables_equals_hard_filter_count(index, hdb_data, filters):
+    assert index.counts(filters)['total'] == filtered(filters, hdb_data)
+
+
+def test_total_with_price_tables_at_a_budget_edge(priced_index, hdb_data):
+    prices = fake_prices(hdb_data, 2026)
+    # A flat whose unrounded price is just above the budget but rounds down onto it
+    edge = next(p for p in prices if 0 < p % 1 < 0.5 and 400000 < p < 800000)
+    filters = {'budget': [300000, int(edge)]}
+    assert priced_index.counts(filters)['total'] == len(candidate_set(filters, hdb_data)['candidates'])
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_total_with_price_tables_equals_recommend_total(priced_index, hdb_data, filters):
+    counts = priced_index.counts(filters)
+    assert counts['predicted_budget']
+    assert counts['total'] == len(candidate_set(filters, hdb_data)['candidates'])
+
+
+@pytest.mark.parametrize("model", FLAT_MODELS)
+def test_flat_model_counts_use_substring_match(index, hdb_data, model):
+    counts = index.counts(BASE)['facets']['flatModels']
+    assert counts.get(model, 0) == filtered({**BASE, 'flatModels': [model]}, hdb_data)
+
+
+def test_flat_model_relaxation_count_matches_recommend(index, hdb_data):
+    filters = {**BASE, 'flatModels': ['Maisonette']}
+    assert index.counts(filters)['total'] == 0
+    suggestion = next(s for s in index.relaxations(filters) if s['filter'] == 'flatModels')
+    assert suggestion['matches'] == filtered({**filters, **suggestion['change']}, hdb_data)
+
+
+@pytest.mark.parametrize("field", ["budget", "floorArea", "leaseRange"])
+@pytest.mark.parametrize("value", [[1], [1, 2, 3]])
+def test_facet_ranges_must_have_two_bounds(field, value):
+    import asyncio
+
+    import httpx
+    from app import main
+
+    async def post():
+        async with httpx.AsyncClient(app=main.app, base_url="http://t") as client:
+            return await client.post("/recommend/facets", json={field: value})
+    response = asyncio.run(post())
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', field]
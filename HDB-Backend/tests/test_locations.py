@@ -0,0 +1,85 @@
+"""LocationIndex.search must rank exactly like a linear scan over every name."""
+import pytest
+
+from app.locations import LocationIndex, SCHOOL_CATEGORY, WORK_AREA_CATEGORY
+from app.recommendation import haversine_distance, name_tokens
+
+LOCATION_DATA = {
+    'schools': [
+        {'school_name': 'Tampines Primary School', 'latitude': 1.3540, 'longitude': 103.9430},
+        {'school_name': 'Tampines North Primary School', 'latitude': 1.3620, 'longitude': 103.9510},
+        {'school_name': 'Bedok Green Primary School', 'latitude': 1.3270, 'longitude': 103.9380},
+        {'school_name': 'Broken Row', 'latitude': None, 'longitude': 103.9},
+    ],
+    'pois': {
+        'mall': [
+            {'name': 'Tampines Mall', 'lat': 1.3525, 'lon': 103.9447},
+            {'name': 'Our Tampines Hub', 'lat': 1.3532, 'lon': 103.9400},
+            {'name': 'Bedok Mall', 'lat': 1.3249, 'lon': 103.9297},
+        ],
+        'hospital': [
+            {'name': 'Changi General Hospital', 'lat': 1.3404, 'lon': 103.9496},
+            {'name': 'Raffles Hospital', 'lat': 1.3016, 'lon': 103.8577},
+        ],
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LocationIndex(LOCATION_DATA)
+
+
+def linear_search(index, query, limit=10, categories=None, lat=None, lon=None, radius_km=None):
+    """Reference ranking: scan every name, sort on the documented keys."""
+    prefix = name_tokens(query)
+    hits = []
+    for i, name in enumerate(index.names):
+        tokens = name_tokens(name)
+        starts = [j for j in range(len(tokens)) if ' '.join(tokens[j:]).startswith(' '.join(prefix))]
+        category = index.category_names[index.categories[i]]
+        if not prefix or not starts or (categories and category not in categories):
+            continue
+        distance = haversine_distance(index.lats[i], index.lons[i], lat, lon) if lat is not None else None
+        if radius_km is not None and distance > radius_km:
+            continue
+        second = distance if distance is not None else len(name)
+        hits.append((starts[0] != 0, second, name.lower(), i))
+    return [index.names[hit[-1]] for hit in sorted(hits)[:limit]]
+
+
+def names(results):
+    return [r['name'] for r in results]
+
+
+@pytest.mark.parametrize("query", ["t", "tamp", "TAMPINES", "tampines p", "mall", "raffles pl", "b", "prim", "zzz", " ", ""])
+def test_search_matches_linear_scan(index, query):
+    assert names(index.search(query, limit=50)) == linear_search(index, query, limit=50)
+
+
+def test_names_starting_with_the_query_rank_first(index):
+    # Then shorter names; 'Tampines' is a built-in work area
+    assert names(index.search("tampines")) == [
+        'Tampines', 'Tampines Mall', 'Tampines Primary School', 'Tampines North Primary School', 'Our Tampines Hub',
+    ]
+
+
+def test_category_filter(index):
+    assert names(index.search("tampines", categories=[SCHOOL_CATEGORY])) == \
+        ['Tampines Primary School', 'Tampines North Primary School']
+    assert all(r['category'] == WORK_AREA_CATEGORY for r in index.search("a", categories=[WORK_AREA_CATEGORY]))
+    assert index.search("tampines", categories=['no_such_category']) == []
+
+
+def test_distance_ranking_and_radius(index):
+    here = {'lat': 1.3530, 'lon': 103.9440}
+    results = index.search("tampines", **here, radius_km=1.0)
+    assert names(results) == linear_search(index, "tampines", **here, radius_km=1.0)
+    distances = [r['distance_km'] for r in results if r['name'].lower().startswith('tampines')]
+    assert distances == sorted(distances) and all(d <= 1.0 for d in distances)
+    assert 'Tampines North Primary School' not in names(results)
+    assert names(index.search("tampines", **here, limit=3)) == ['Tampines Mall', 'Tampines', 'Tampines Primary School']
+
+
+def test_rows_without_coordinates_are_skipped(index):
+    assert index.search("broken") == []
@@ -0,0 +1,56 @@
+"""Pricing on the partition pool must give the same candidates and ranking as pricing serially."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app.recommendation import DISTANCE_COLUMNS, generate_candidate_set, score_candidates
+from tests.data import DESTINATIONS, fake_prices
+
+# Under MAX_CANDIDATES_TO_PROCESS rows, so the per-row path prices every row
+FILTERS = {'budget': [300000, 900000], 'towns': ['BEDOK', 'TAMPINES', 'YISHUN', 'PUNGGOL', 'CLEMENTI']}
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        yield pool
+
+
+def distances(lat, lon):
+    return {column: abs(lat - 1.35) * 40 + abs(lon - 103.85) * (i + 1) for i, column in enumerate(DISTANCE_COLUMNS)}
+
+
+def price(town, flat_type, flat_model, floor_area_sqm, floor_level, lease_commence_year, year, lat, lon, distances):
+    return round(floor_area_sqm * 5200 + (lease_commence_year - 1960) * 1500 + floor_level * 900 - distances['mrt'] * 8000)
+
+
+def per_row(hdb_data, executor):
+    return generate_candidate_set(FILTERS, distances, price, {}, hdb_data=hdb_data.drop(columns=list(DISTANCE_COLUMNS)),
+                                  executor=executor, destinations=DESTINATIONS)
+
+
+def flats(candidates):
+    columns = ['town', 'block', 'latitude', 'longitude', 'predicted_price']
+    return candidates[columns].sort_values(columns).reset_index(drop=True)
+
+
+def test_town_partitions_price_the_same_flats(hdb_data, executor):
+    serial, parallel = per_row(hdb_data, None), per_row(hdb_data, executor)
+    assert serial['exact'] and parallel['exact']
+    assert serial['candidates']['town'].nunique() > 1
+    pd.testing.assert_frame_equal(flats(serial['candidates']), flats(parallel['candidates']))
+    assert sorted(parallel['candidates']['id']) == list(range(1, len(parallel['candidates']) + 1))
+
+    top_serial = score_candidates(serial['candidates'], DESTINATIONS, FILTERS, top_n=20)['recommendations']
+    top_parallel = score_candidates(parallel['candidates'], DESTINATIONS, FILTERS, top_n=20)['recommendations']
+    assert [r['matchScore'] for r in top_serial] == [r['matchScore'] for r in top_parallel]
+
+
+def test_parallel_batches_equal_serial_batches(hdb_data, executor):
+    def run(pool):
+        return generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, executor=pool,
+                                      predict_batch_fn=fake_prices, batch_rows=50)
+    serial, parallel = run(None), run(executor)
+    pd.testing.assert_frame_equal(serial['candidates'], parallel['candidates'])
+    assert (serial['filtered'], serial['evaluated']) == (parallel['filtered'], parallel['evaluated'])
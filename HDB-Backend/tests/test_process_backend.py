@@ -0,0 +1,44 @@
+"""On the process backend, candidate sets cached by workers must be visible to the API process."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT = '''
+import asyncio
+from app import main
+from app.artifacts import ArtifactState
+from app.cache import SQLiteCache
+from tests.data import fake_prices, make_hdb_data
+
+assert main.EXECUTION_BACKEND == "process"
+assert isinstance(main._candidate_cache, SQLiteCache), type(main._candidate_cache)
+# Forked workers inherit this stand-in for the model-backed price lookup
+main.candidate_prices = lambda rows, year, state=None: fake_prices(rows, year)
+state = ArtifactState(version="test", loaded_at="now", model=None, trend_multipliers={}, model_features=None,
+                      mappings={}, amenity_data={}, amenity_trees={}, location_data={}, hdb_data=make_hdb_data())
+user_input = {"budget": [300000, 900000]}
+
+async def run():
+    for _ in range(2):
+        result = await main.recommendation_engine.run(main._run_recommendations, state, user_input)
+        assert result["total_candidates"] > 0
+    main.recommendation_engine.shutdown()
+
+asyncio.run(run())
+stats = main._candidate_cache.stats()
+assert stats["entries"] == 1, stats
+assert asyncio.run(main.clear_recommendation_cache())["success"]
+assert main._candidate_cache.stats()["entries"] == 0
+print("ok")
+'''
+
+
+def test_candidate_cache_is_shared_with_process_workers(tmp_path):
+    env = {**os.environ, "EXECUTION_BACKEND": "process", "EXECUTION_WORKERS": "2",
+           "CACHE_BACKEND": "local", "CACHE_PATH": str(tmp_path / "cache.sqlite")}
+    env.pop("DISK_CACHE_DIR", None)
+    done = subprocess.run([sys.executable, "-c", SCRIPT], cwd=Path(__file__).parent.parent, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert done.returncode == 0, done.stdout[-2000:] + done.stderr[-2000:]
+    assert done.stdout.strip().endswith("ok")
@@ -0,0 +1,44 @@
+"""Partial-sort top N must equal a full stable sort, and pages must tile the ranking."""
+import numpy as np
+import pytest
+
+from app.recommendation import generate_candidate_set, ranking_page, score_candidates, top_n_indices
+from tests.data import DESTINATIONS, fake_prices
+
+FILTERS = {'budget': [300000, 900000]}
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size,levels", [(1000, 5), (1000, 100000), (7, 3)])
+@pytest.mark.parametrize("top_n", [0, 1, 10, 50, 2000])
+def test_top_n_equals_stable_sort_prefix(seed, size, levels, top_n):
+    scores = np.random.default_rng(seed).integers(0, levels, size)
+    expected = np.argsort(-scores, kind='stable')[:top_n]
+    assert list(top_n_indices(scores, top_n)) == list(expected)
+
+
+@pytest.fixture(scope="module")
+def candidates(hdb_data):
+    return generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, predict_batch_fn=fake_prices)['candidates']
+
+
+def test_top_n_is_sorted_and_beats_the_rest(candidates):
+    result = score_candidates(candidates, DESTINATIONS, FILTERS, top_n=25)
+    shown = [r['matchScore'] for r in result['recommendations']]
+    assert shown == sorted(shown, reverse=True)
+    everything = score_candidates(candidates, DESTINATIONS, FILTERS, top_n=len(candidates))
+    assert min(shown) >= max(r['matchScore'] for r in everything['recommendations'][25:])
+    assert [r['id'] for r in everything['recommendations'][:25]] == [r['id'] for r in result['recommendations']]
+
+
+def test_pages_tile_the_full_ranking(candidates):
+    first = score_candidates(candidates, DESTINATIONS, FILTERS, top_n=10, keep_ranking=True)
+    ranking = first['ranking']
+    assert len(ranking) == len(candidates)
+    pages = [ranking_page(ranking, offset, 7) for offset in range(0, len(ranking), 7)]
+    ids = [r['id'] for page in pages for r in page]
+    assert ids[:10] == [r['id'] for r in first['recommendations']]
+    assert sorted(ids) == sorted(candidates['id'])
+    everything = score_candidates(candidates, DESTINATIONS, FILTERS, top_n=len(candidates))
+    assert ids == [r['id'] for r in everything['recommendations']]
+    assert ranking_page(ranking, len(ranking), 7) == []
@@ -0,0 +1,41 @@
+"""Requests that differ only in scoring inputs re-score one cached candidate set."""
+from app.recommendation import generate_candidate_set, score_candidates
+from tests.data import DESTINATIONS, fake_prices
+
+FILTERS = {'budget': [300000, 900000]}
+
+
+def counting_prices(main, monkeypatch):
+    calls = []
+
+    def prices(rows, year, state=None):
+        calls.append(len(rows))
+        return fake_prices(rows, year)
+    monkeypatch.setattr(main, "candidate_prices", prices)
+    return calls
+
+
+def test_destination_changes_rescore_the_cached_candidate_set(main, hdb_data, monkeypatch):
+    calls = counting_prices(main, monkeypatch)
+    state = main.artifacts.current()
+    first = main._run_recommendations(state, FILTERS, DESTINATIONS[:1])
+    priced = len(calls)
+    second = main._run_recommendations(state, FILTERS, DESTINATIONS)
+    assert priced > 0 and len(calls) == priced  # Tier 1 hit: nothing priced again
+    assert len(main._candidate_cache) == 1
+
+    fresh = generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, predict_batch_fn=fake_prices)
+    expected = score_candidates(fresh['candidates'], DESTINATIONS, FILTERS, top_n=10)
+    assert second['recommendations'] == expected['recommendations']
+    assert second['recommendations'] != first['recommendations']
+    assert (second['filtered'], second['evaluated']) == (fresh['filtered'], fresh['evaluated'])
+
+
+def test_scoring_inputs_change_only_the_result_key(main):
+    state = main.artifacts.current()
+    weighted = {**FILTERS, 'scoreWeights': {'space': 1.0}}
+    assert main._get_candidate_cache_key(weighted, state) == main._get_candidate_cache_key(FILTERS, state)
+    keys = {main._get_cache_key(FILTERS, DESTINATIONS, state), main._get_cache_key(weighted, DESTINATIONS, state),
+            main._get_cache_key(FILTERS, DESTINATIONS[:1], state)}
+    assert len(keys) == 3
+    assert all(key.startswith(f"{state.version}:") for key in keys)
@@ -0,0 +1,62 @@
+"""Refining a cached candidate set must give exactly the set a fresh run would."""
+import pandas as pd
+import pytest
+
+from app.recommendation import (
+    canonical_filters, filters_subsume, generate_candidate_set, refine_candidate_set, score_candidates,
+)
+from tests.data import DESTINATIONS, fake_prices
+
+
+def fresh_set(user_input, hdb_data, destinations=None):
+    # Destinations only set the pricing order, which must not show in the result
+    return generate_candidate_set(user_input, None, None, {}, hdb_data=hdb_data, destinations=destinations,
+                                  predict_batch_fn=fake_prices)
+
+
+NESTED = [
+    # (outer, inner)
+    ({'budget': [300000, 800000]}, {'budget': [301000, 800000]}),
+    ({'budget': [300000, 900000]}, {'budget': [350000, 700000], 'floorArea': [70, 120], 'leaseRange': [30, 65]}),
+    ({'budget': [300000, 900000], 'floorArea': [60, 130]},
+     {'budget': [300000, 900000], 'floorArea': [80, 100], 'towns': ['BEDOK', 'TAMPINES']}),
+    ({'budget': [200000, 1200000], 'towns': ['BEDOK', 'TAMPINES', 'YISHUN']},
+     {'budget': [200000, 1200000], 'towns': ['yishun'], 'flatTypes': ['4 ROOM']}),
+    ({'budget': [200000, 1200000], 'flatModels': ['Model A']},
+     {'budget': [200000, 1200000], 'flatModels': ['Model A2'], 'storeyRanges': ['04 TO 06']}),
+    ({'budget': [200000, 1200000], 'maxDistances': {'mrt': 2.0}},
+     {'budget': [200000, 1200000], 'maxDistances': {'mrt': 1.0, 'mall': 1.5}}),
+    ({'targetYear': 2028, 'budget': [300000, 1000000]},
+     {'targetYear': 2028, 'budget': [400000, 900000], 'leaseRange': [50, 99]}),
+]
+
+
+@pytest.mark.parametrize("outer,inner", NESTED)
+def test_refined_set_equals_fresh_set(outer, inner, hdb_data):
+    assert filters_subsume(canonical_filters(outer), canonical_filters(inner))
+    cached = fresh_set(outer, hdb_data, DESTINATIONS[:1])
+    assert cached['exact'] and len(cached['candidates']) > 0
+    refined = refine_candidate_set(cached, inner, hdb_data)
+    fresh = fresh_set(inner, hdb_data, DESTINATIONS[1:])
+    # Same rows in the same order with the same ids, and the same counts
+    pd.testing.assert_frame_equal(refined['candidates'], fresh['candidates'])
+    for key in ('filtered', 'evaluated', 'exact', 'sampled', 'timed_out'):
+        assert refined[key] == fresh[key], key
+    ranked = [score_candidates(s['candidates'], DESTINATIONS, inner, top_n=50)['recommendations']
+              for s in (refined, fresh)]
+    assert ranked[0] == ranked[1]
+
+
+def test_candidate_set_does_not_depend_on_destinations(hdb_data):
+    user_input = {'budget': [450000, 650000]}
+    sets = [fresh_set(user_input, hdb_data, d) for d in (None, DESTINATIONS[:1], DESTINATIONS[1:])]
+    for other in sets[1:]:
+        pd.testing.assert_frame_equal(sets[0]['candidates'], other['candidates'])
+
+
+def test_omitted_filters_are_not_subsumed_by_explicit_ones():
+    # Leaving floorArea / leaseRange out means the wide defaults, not the UI defaults
+    explicit = canonical_filters({'budget': [300000, 800000], 'floorArea': [70, 120], 'leaseRange': [30, 65]})
+    omitted = canonical_filters({'budget': [301000, 800000]})
+    assert not filters_subsume(explicit, omitted)
+    assert filters_subsume(omitted, canonical_filters({'budget': [301000, 800000], 'floorArea': [70, 120]}))
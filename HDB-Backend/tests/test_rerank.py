@@ -0,0 +1,72 @@
+"""rerank() over a cached default-weight ranking must agree with scoring from scratch."""
+import pytest
+
+from app.recommendation import generate_candidate_set, rerank, score_candidates, skyline_candidates
+from tests.data import DESTINATIONS, fake_prices
+
+FILTERS = {'budget': [300000, 900000]}
+
+
+@pytest.fixture(scope="module")
+def candidates(hdb_data):
+    return generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, predict_batch_fn=fake_prices)['candidates']
+
+
+@pytest.fixture(scope="module")
+def ranking(candidates):
+    return score_candidates(candidates, DESTINATIONS, FILTERS, keep_ranking=True)['ranking']
+
+
+def ids(result):
+    return [r['id'] for r in result['recommendations']]
+
+
+def test_rerank_without_overrides_keeps_ranking(candidates, ranking):
+    assert ids(rerank(ranking, DESTINATIONS, FILTERS, top_n=20)) == \
+        ids(score_candidates(candidates, DESTINATIONS, FILTERS, top_n=20))
+
+
+@pytest.mark.parametrize("overrides", [
+    {'scoreWeights': {'space': 0.6, 'travel': 0.1}},
+    {'amenityWeights': {'mrt': 1.0}},
+    {'frequencyWeights': {'weekly': 5.0}},
+])
+def test_rerank_scores_match_fresh_scoring(candidates, ranking, overrides):
+    user_input = {**FILTERS, **overrides}
+    reranked = rerank(ranking, DESTINATIONS, user_input, top_n=25)
+    fresh = score_candidates(candidates, DESTINATIONS, user_input, top_n=25)
+    assert [r['matchScore'] for r in reranked['recommendations']] == \
+        [r['matchScore'] for r in fresh['recommendations']]
+    # A longer top N starts with the shorter one, so cursor pages line up
+    assert ids(rerank(ranking, DESTINATIONS, user_input, top_n=10)) == ids(reranked)[:10]
+
+
+@pytest.mark.parametrize("overrides", [{}, {'amenityWeights': {'hawker': 1.0}}])
+def test_rerank_pareto_returns_the_skyline(candidates, ranking, overrides):
+    user_input = {**FILTERS, **overrides, 'mode': 'pareto'}
+    reranked = rerank(ranking, DESTINATIONS, user_input, top_n=1000)
+    fresh = skyline_candidates(candidates, DESTINATIONS, user_input, limit=1000)
+    assert reranked['skyline_size'] == fresh['skyline_size'] == len(reranked['recommendations'])
+    assert sorted(ids(reranked)) == sorted(ids(fresh))
+
+
+def test_rerank_cursor_round_trip():
+    from app.main import RecommendationRequest, decode_cursor, encode_cursor
+    request = RecommendationRequest(budget=[300000, 900000], mode='pareto')
+    assert decode_cursor(encode_cursor(request, 20, kind='rerank')) == (request, 20, 'rerank')
+    assert decode_cursor(encode_cursor(request, 10))[2] == 'recommend'
+
+
+@pytest.mark.parametrize("weights", [{'weekly': -1.0}, {'fortnightly': 2.0}])
+def test_invalid_frequency_weights_are_rejected(weights):
+    from pydantic import ValidationError
+    from app.main import RecommendationRequest
+    with pytest.raises(ValidationError) as error:
+        RecommendationRequest(frequencyWeights=weights)
+    assert error.value.errors()[0]['loc'][0] == 'frequencyWeights'
+
+
+def test_known_frequency_weights_are_accepted():
+    from app.main import RecommendationRequest
+    weights = {'weekly': 0.0, 'Daily (5x per week)': 8.0}
+    assert RecommendationRequest(frequencyWeights=weights).frequencyWeights == weights
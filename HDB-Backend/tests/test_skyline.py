@@ -0,0 +1,48 @@
+"""The skyline is exactly the set of non-dominated points."""
+import numpy as np
+import pytest
+
+from app.recommendation import generate_candidate_set, score_frame, skyline_candidates, skyline_indices
+from tests.data import DESTINATIONS, fake_prices
+
+FILTERS = {'budget': [300000, 900000]}
+
+
+def brute_force_skyline(points):
+    no_worse = (points[None, :, :] >= points[:, None, :]).all(axis=2)
+    better = (points[None, :, :] > points[:, None, :]).any(axis=2)
+    dominated = (no_worse & better).any(axis=1)
+    return np.flatnonzero(~dominated)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("shape,levels", [((300, 2), 1000), ((500, 4), 20), ((200, 3), 3)])
+def test_skyline_matches_brute_force(seed, shape, levels):
+    # Few levels means many ties and duplicate points
+    points = np.random.default_rng(seed).integers(0, levels, size=shape).astype(float)
+    assert sorted(skyline_indices(points)) == list(brute_force_skyline(points))
+
+
+@pytest.mark.parametrize("block", [1, 3, 16, 1000])
+def test_skyline_does_not_depend_on_block_size(block):
+    points = np.random.default_rng(1).normal(size=(400, 4))
+    assert sorted(skyline_indices(points, block=block)) == sorted(skyline_indices(points))
+
+
+def test_skyline_edge_cases():
+    assert len(skyline_indices(np.empty((0, 3)))) == 0
+    assert list(skyline_indices(np.ones((5, 2)))) == [0, 1, 2, 3, 4]  # Equal points don't dominate
+
+
+def test_skyline_candidates_returns_the_frame_skyline_cheapest_first(hdb_data):
+    frame = generate_candidate_set(FILTERS, None, None, {}, hdb_data=hdb_data, predict_batch_fn=fake_prices)['candidates']
+    scores = score_frame(frame, DESTINATIONS, FILTERS)
+    price = frame['predicted_price'].to_numpy(float)
+    expected = brute_force_skyline(np.column_stack([-price, scores['travel'], scores['amenity'], scores['space']]))
+
+    result = skyline_candidates(frame, DESTINATIONS, FILTERS, limit=len(frame))
+    ids = [r['id'] for r in result['recommendations']]
+    assert result['skyline_size'] == len(expected) == len(ids)
+    assert sorted(ids) == sorted(frame['id'].to_numpy()[expected])
+    shown = frame.set_index('id').loc[ids, 'predicted_price'].to_numpy()
+    assert (np.diff(shown) >= 0).all()
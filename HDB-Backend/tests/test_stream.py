@@ -0,0 +1,60 @@
+"""/recommend/stream sends filtered, progress and final on every path: fresh, cached and refined."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+BASE = {'budget': [300000, 900000]}
+
+
+@pytest.fixture(autouse=True)
+def small_batches(main, monkeypatch):
+    monkeypatch.setattr(main, "STREAM_BATCH_ROWS", 500)
+
+
+def stream(main, body):
+    async def post():
+        async with httpx.AsyncClient(app=main.app, base_url="http://t") as client:
+            response = await client.post("/recommend/stream", json=body)
+            assert response.status_code == 200
+            return [json.loads(line) for line in response.text.splitlines()]
+    return asyncio.run(post())
+
+
+def check_sequence(events):
+    names = [e['event'] for e in events]
+    assert names[0] == 'filtered' and names[-1] == 'final'
+    assert 'progress' in names and set(names) <= {'filtered', 'progress', 'provisional', 'final'}
+    progress = [e for e in events if e['event'] == 'progress']
+    evaluated = [e['evaluated'] for e in progress]
+    assert evaluated == sorted(evaluated)
+    final = events[-1]
+    assert final['filtered'] == events[0]['filtered']
+    assert final['evaluated'] == evaluated[-1]
+    return progress
+
+
+def test_fresh_stream_reports_each_batch(main):
+    progress = check_sequence(stream(main, BASE))
+    assert len(progress) > 1
+
+
+def test_cached_and_refined_streams_report_progress(main):
+    fresh = stream(main, BASE)
+    check_sequence(fresh)
+
+    # Same request: cached result
+    cached = stream(main, BASE)
+    assert [e['event'] for e in cached] == ['filtered', 'progress', 'final']
+    assert cached[-1]['recommendations'] == fresh[-1]['recommendations']
+
+    # Same filters, different weights: cached candidate set
+    rescored = stream(main, {**BASE, 'scoreWeights': {'space': 0.6, 'travel': 0.1}})
+    assert len(check_sequence(rescored)) == 1
+    assert rescored[0]['filtered'] == fresh[0]['filtered']
+
+    # Narrower filters: refined from the cached set
+    refined = stream(main, {'budget': [400000, 800000]})
+    assert len(check_sequence(refined)) == 1
+    assert refined[0]['filtered'] < fresh[0]['filtered']
@@ -0,0 +1,63 @@
+"""The thread budget must split a fixed CPU count across the layers without oversubscribing it."""
+import pytest
+
+from app import threads
+from app.threads import detect_cpus, plan_thread_budget
+
+OVERRIDES = ("CPU_LIMIT", "EXECUTION_WORKERS", "PARTITION_WORKERS", "PREDICT_WORKERS", "MODEL_THREADS")
+
+
+@pytest.fixture(autouse=True)
+def no_overrides(monkeypatch):
+    for name in OVERRIDES:
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_thread_backend_budget():
+    budget = plan_thread_budget("thread", cpus=8)
+    assert budget.cpu_source == 'argument'
+    assert (budget.recommend_workers, budget.partition_workers, budget.predict_workers) == (16, 8, 8)
+    assert budget.model_threads == budget.blas_threads == 1
+    assert budget.io_workers == 8
+
+
+def test_process_backend_budget():
+    budget = plan_thread_budget("process", cpus=8)
+    assert (budget.recommend_workers, budget.partition_workers, budget.predict_workers) == (8, 1, 8)
+    assert budget.model_threads == 1
+
+
+def test_small_pools_leave_cores_to_xgboost(monkeypatch):
+    monkeypatch.setenv("EXECUTION_WORKERS", "2")
+    monkeypatch.setenv("PARTITION_WORKERS", "1")
+    monkeypatch.setenv("PREDICT_WORKERS", "2")
+    assert plan_thread_budget("thread", cpus=16).model_threads == 4
+    monkeypatch.setenv("MODEL_THREADS", "3")
+    assert plan_thread_budget("thread", cpus=16).model_threads == 3
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+@pytest.mark.parametrize("cpus", [1, 2, 3, 4, 8, 12, 32, 64])
+def test_predict_threads_never_exceed_the_cpus(backend, cpus):
+    budget = plan_thread_budget(backend, cpus=cpus)
+    if backend == "process":
+        callers = budget.recommend_workers * budget.partition_workers
+    else:
+        callers = max(budget.recommend_workers, budget.partition_workers)
+    callers += budget.predict_workers
+    # Every layer gets at least one thread; beyond that XGBoost only uses spare cores
+    assert budget.model_threads == 1 or callers * budget.model_threads <= cpus
+    assert min(budget.recommend_workers, budget.partition_workers, budget.predict_workers) >= 1
+
+
+def test_detect_cpus_takes_the_tightest_limit(monkeypatch):
+    monkeypatch.setattr(threads.os, "cpu_count", lambda: 16)
+    monkeypatch.setattr(threads.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    monkeypatch.setattr(threads, "_cgroup_cpu_quota", lambda: 2.5)
+    detected = detect_cpus()
+    assert (detected['effective'], detected['source']) == (3, 'cgroup_quota')
+    assert plan_thread_budget("thread").cpus == 3
+
+    monkeypatch.setenv("CPU_LIMIT", "6")
+    assert (detect_cpus()['effective'], detect_cpus()['source']) == (6, 'CPU_LIMIT')
+    assert plan_thread_budget("thread").cpu_source == 'CPU_LIMIT'
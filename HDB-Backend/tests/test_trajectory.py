@@ -0,0 +1,53 @@
+"""Trajectories must agree with the candidate's predicted price and with per-flat predictions."""
+from dataclasses import replace
+
+import pytest
+
+from app import main
+from app.recommendation import DISTANCE_COLUMNS, hard_filter
+
+FILTERS = {'budget': [200000, 2000000], 'towns': ['BEDOK', 'TAMPINES'], 'flatTypes': ['4 ROOM'],
+           'targetYear': 2027, 'trajectory': True}
+YEARS = list(main.RECOMMEND_YEARS)
+
+
+@pytest.fixture
+def state(model_state, hdb_data):
+    return replace(model_state, hdb_data=hdb_data)
+
+
+@pytest.fixture
+def result(state):
+    saved = main._price_tables
+    main._price_tables = (None, {})
+    try:
+        return main._run_recommendations(state, FILTERS, [])
+    finally:
+        main._price_tables = saved
+
+
+def test_trajectory_covers_every_year(result):
+    assert result['recommendations']
+    for rec in result['recommendations']:
+        points = rec['trajectory']
+        assert [p['year'] for p in points] == YEARS
+        assert points[0]['yoyChange'] is None
+        # Rounded to the nearest thousand, like the /predict trajectory
+        assert all(p['predictedPrice'] % 1000 == 0 for p in points)
+        # Same features as candidate pricing, so the target year is the listed price
+        assert points[YEARS.index(FILTERS['targetYear'])]['predictedPrice'] == rec['predictedPrice']
+
+
+def test_trajectory_matches_per_flat_predictions(state):
+    rows = hard_filter(state.hdb_data, FILTERS).head(3)
+    rows = rows.assign(floor_level=rows['storey_range'].str[:2].astype(int))
+    batched = main.price_trajectories(rows, YEARS, state)
+    assert batched.shape == (3, len(YEARS))
+    for i, row in enumerate(rows.itertuples()):
+        for j, year in enumerate(YEARS):
+            single = main.predict_price_for_recommendation(
+                town=row.town, flat_type=row.flat_type, flat_model=row.flat_model,
+                floor_area_sqm=row.floor_area_sqm, floor_level=row.floor_level,
+                lease_commence_year=row.lease_commence_year, year=year, lat=row.latitude, lon=row.longitude,
+                distances={column: getattr(row, column) for column in DISTANCE_COLUMNS}, state=state)
+            assert batched[i, j] == pytest.approx(single, rel=1e-6)